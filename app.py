@@ -1,7 +1,9 @@
 from flask import Flask
+import json
 import os
 from dotenv import load_dotenv
 from controllers.AppController import AppController
+from controllers.RetentionController import RetentionController
 from views.main import main_blueprint
 from controllers.helpers import upload_asset
 
@@ -17,11 +19,54 @@ def create_app():
     app.config['DOWNLOAD_FOLDER'] = os.path.join(BASE_DIR, 'public', 'downloads')
     app.config['CONFIG'] = os.path.join(BASE_DIR, 'public', 'config')
     app.config['ODOO'] = os.path.join(BASE_DIR, 'app', 'odoo')
+    app.config['JOBS_FOLDER'] = os.path.join(BASE_DIR, 'public', 'jobs')
+
+    # Nombre maximal d'imports exécutés simultanément en arrière-plan
+    app.config['IMPORT_MAX_WORKERS'] = int(os.getenv('IMPORT_MAX_WORKERS', 2))
+    # Nombre de lignes lues à la fois par la validation et la génération du fichier d'import (0 : fichier entier)
+    app.config['IMPORT_CHUNK_SIZE'] = int(os.getenv('IMPORT_CHUNK_SIZE', 100000))
+    # Nombre de processus des imports par lot (0 : nombre de cœurs)
+    app.config['IMPORT_BATCH_WORKERS'] = int(os.getenv('IMPORT_BATCH_WORKERS', 0))
+    # Mode multi-cœur d'un import : nombre de processus (0 ou 1 : désactivé) et taille minimale du fichier
+    app.config['IMPORT_PARALLEL_WORKERS'] = int(os.getenv('IMPORT_PARALLEL_WORKERS', 0))
+    app.config['IMPORT_PARALLEL_MIN_ROWS'] = int(os.getenv('IMPORT_PARALLEL_MIN_ROWS', 50000))
+
+    # Découpage des fichiers d'import à télécharger : format ('xlsx', 'zip', 'dir'), nombre maximal de lignes
+    # et taille maximale d'une partie (0 : pas de limite), colonnes identifiant le début d'une pièce
+    app.config['SPLIT_FORMAT'] = os.getenv('SPLIT_FORMAT', 'xlsx')
+    app.config['SPLIT_MAX_ROWS'] = int(os.getenv('SPLIT_MAX_ROWS', 5000))
+    app.config['SPLIT_MAX_BYTES'] = int(os.getenv('SPLIT_MAX_BYTES', 0))
+    app.config['SPLIT_KEY_COLUMNS'] = os.getenv('SPLIT_KEY_COLUMNS', 'partner_id/id').split(',')
+
+    # Durées de validité du cache des données de référence Odoo (en secondes)
+    app.config['REFERENCE_CACHE_TTL'] = int(os.getenv('REFERENCE_CACHE_TTL', 900))
+    app.config['REFERENCE_CACHE_FULL_TTL'] = int(os.getenv('REFERENCE_CACHE_FULL_TTL', 86400))
+
+    # Exports Odoo : délai maximal par export (en secondes) et nombre d'exports simultanés
+    app.config['ODOO_EXPORT_TIMEOUT'] = int(os.getenv('ODOO_EXPORT_TIMEOUT', 3600))
+    # 'rpc' : export JSON-RPC dans le processus ; 'subprocess' : odoo_export_thread.py
+    app.config['ODOO_EXPORT_BACKEND'] = os.getenv('ODOO_EXPORT_BACKEND', 'rpc')
+    app.config['ODOO_EXPORT_SIZE'] = int(os.getenv('ODOO_EXPORT_SIZE', 200))
+    app.config['ODOO_EXPORT_WORKERS'] = int(os.getenv('ODOO_EXPORT_WORKERS', 2))
+
+    # Ajustement automatique des exports : latence visée par lot, bornes et valeurs imposées par modèle
+    # ex. ODOO_EXPORT_OVERRIDES='{"res.partner": {"size": 2000, "worker": 4}}'
+    app.config['ODOO_EXPORT_TARGET_LATENCY'] = float(os.getenv('ODOO_EXPORT_TARGET_LATENCY', 5))
+    app.config['ODOO_EXPORT_MAX_SIZE'] = int(os.getenv('ODOO_EXPORT_MAX_SIZE', 5000))
+    app.config['ODOO_EXPORT_MAX_WORKERS'] = int(os.getenv('ODOO_EXPORT_MAX_WORKERS', 8))
+    app.config['ODOO_EXPORT_OVERRIDES'] = json.loads(os.getenv('ODOO_EXPORT_OVERRIDES', '{}'))
+    app.config['REFERENCE_EXPORT_WORKERS'] = int(os.getenv('REFERENCE_EXPORT_WORKERS', 3))
+
+    # Rétention des dossiers de travail : intervalle du balayage (en secondes, 0 : désactivé)
+    # et politiques par dossier, ex. RETENTION_POLICIES='{"UPLOAD_FOLDER": {"max_age_days": 10}}'
+    app.config['RETENTION_INTERVAL'] = int(os.getenv('RETENTION_INTERVAL', 3600))
+    app.config['RETENTION_POLICIES'] = json.loads(os.getenv('RETENTION_POLICIES', '{}'))
 
     # Ensure directories exist
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     os.makedirs(app.config['DOWNLOAD_FOLDER'], exist_ok=True)
     os.makedirs(app.config['CONFIG'], exist_ok=True)
+    os.makedirs(app.config['JOBS_FOLDER'], exist_ok=True)
 
     odoo_folder = app.config['ODOO']
     upload_asset(odoo_folder)
@@ -29,6 +74,8 @@ def create_app():
     # Register blueprints
     app.register_blueprint(main_blueprint)
 
+    RetentionController().start(app)
+
     return app
 
 if __name__ == '__main__':
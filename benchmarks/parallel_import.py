@@ -0,0 +1,168 @@
+"""
+Débit du mode multi-cœur de la génération du fichier d'import (process_import_files_parallel)
+selon le nombre de processus, comparé au traitement en un seul processus (process_import_files).
+
+Un fichier client nettoyé et des instantanés de référence (partenaires, produits, comptes
+analytiques, avec leurs index en projection mémoire) sont générés dans un dossier temporaire.
+Pour chaque nombre de processus, une première exécution démarre le pool (hors mesure), puis la
+meilleure durée de plusieurs exécutions est retenue. Le chargement du fichier dans le registre
+est fait avant la mesure, comme après la validation d'un import.
+
+Usage : python benchmarks/parallel_import.py [nombre de lignes] [processus ...]
+Par défaut : 300000 lignes, 1, 2, 4... processus jusqu'au nombre de cœurs.
+"""
+import contextlib
+import io
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from flask import Flask
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import controllers.FileConfigController as file_config_module  # noqa: E402
+from controllers.FileConfigController import FileConfigController  # noqa: E402
+from controllers.LookupIndexController import LookupIndexController  # noqa: E402
+from controllers.ReferenceCacheController import ReferenceCacheController  # noqa: E402
+
+file_config = FileConfigController()
+lookup_indexes = LookupIndexController()
+fields = file_config.get_fiedls_odoo('Clt')
+
+REPEAT = 3
+PARTNERS = 2000
+PRODUCTS = 5000
+ANALYTICS = 50
+
+
+def _silence():
+    # Processus du pool : les messages de traitement de chaque partition ne sont pas affichés
+    sys.stdout = open(os.devnull, 'w')
+
+
+def make_references(folder):
+    """Instantanés de référence (CSV ';') et leurs index, comme ReferenceCacheController."""
+    snapshots = {
+        'res_partner': pd.DataFrame({
+            'id': [f"__export__.res_partner_{index}" for index in range(PARTNERS)],
+            'ref': [f"C{index:05d}" for index in range(PARTNERS)],
+        }),
+        'product_template': pd.DataFrame({
+            'display_name': [f"[P{index:05d}] Article {index}" for index in range(PRODUCTS)],
+            'old_default_code': [f"P{index:05d}" for index in range(PRODUCTS)],
+        }),
+        'account_analytic_account': pd.DataFrame({
+            'id.id': [str((index + 1, f"AN{index}")) for index in range(ANALYTICS)],
+            'code': [f"AN{index}" for index in range(ANALYTICS)],
+        }),
+    }
+    references = {}
+    for entity, df in snapshots.items():
+        path = os.path.join(folder, f"{entity}.csv")
+        df.to_csv(path, index=False, sep=';', encoding='utf-8-sig')
+        lookup_indexes.build(path, ReferenceCacheController.ENTITIES[entity]['lookups'], df)
+        references[entity] = path
+    return references
+
+
+def make_file(folder, rows):
+    """Fichier client nettoyé : factures de trois lignes."""
+    rng = np.random.default_rng(0)
+    invoices = rows // 3 + 1
+    df = pd.DataFrame({
+        'Référence': np.repeat([f"F{index}" for index in range(invoices)], 3)[:rows],
+        'Date': '030125',
+        'Journal': 'VTE',
+        'Client': np.repeat([f"C{index:05d}" for index in rng.integers(0, PARTNERS, invoices)], 3)[:rows],
+        'Produit': [f"P{index:05d}" for index in rng.integers(0, PRODUCTS, rows)],
+        'Description': 'Ligne de facture',
+        'Prix unitaire': rng.integers(100, 100000, rows).astype(str),
+        'Quantité': rng.integers(1, 20, rows).astype(str),
+        'Remise': '0',
+        'Analytique': [f"AN{index}" for index in rng.integers(0, ANALYTICS, rows)],
+    })
+    path = os.path.join(folder, 'Clients_nettoye.csv')
+    df.to_csv(path, index=False, sep=',', encoding='utf-8-sig')
+    return path
+
+
+def run(file_configs, output_path, workers):
+    """Génère le fichier d'import et retourne la durée du traitement (chargement exclu)."""
+    plan = file_config.compile_transform_plan(fields['Column'], fields['Entete'], fields['Mapping'])
+    datasets = file_config.declare_datasets(file_configs, fields['Column'])
+    with contextlib.redirect_stdout(io.StringIO()):
+        datasets.load(file_configs[0]['file'])
+        started = time.perf_counter()
+        if workers:
+            result = file_config.process_import_files_parallel(
+                file_configs, output_path, plan, 'import.csv', 'Client', datasets, workers
+            )
+        else:
+            result = file_config.process_import_files(
+                file_configs, output_path, fields['Column'], fields['Entete'], fields['Mapping'],
+                'import.csv', 'Client', datasets
+            )
+        seconds = time.perf_counter() - started
+    if result['Type'] == 'Error':
+        raise RuntimeError(f"{result['Message']} : {result['Response']}")
+    return seconds
+
+
+def measure(file_configs, output_path, workers, rows):
+    if workers:
+        # Pool du mode multi-cœur remplacé pour chaque nombre de processus
+        file_config_module._process_pool = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context('spawn'), initializer=_silence
+        )
+        file_config_module._process_pool_workers = workers
+    try:
+        run(file_configs, output_path, workers)
+        seconds = min(run(file_configs, output_path, workers) for _ in range(REPEAT))
+    finally:
+        if workers:
+            file_config_module._process_pool.shutdown()
+            file_config_module._process_pool = None
+    with open(output_path, 'rb') as output:
+        content = output.read()
+    label = f"{workers} processus" if workers else "sans pool"
+    print(f"{label:<12} : {seconds:6.2f} s, {rows / seconds:10.0f} lignes/s")
+    return seconds, content
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 300000
+    if len(sys.argv) > 2:
+        counts = [int(count) for count in sys.argv[2:]]
+    else:
+        counts = [1]
+        while counts[-1] * 2 <= (os.cpu_count() or 1):
+            counts.append(counts[-1] * 2)
+
+    folder = tempfile.mkdtemp(prefix='bench_import_')
+    app = Flask(__name__)
+    app.config.update(IMPORT_PARALLEL_MIN_ROWS=0, IMPORT_PARALLEL_WORKERS=0, IMPORT_CHUNK_SIZE=0)
+    try:
+        with app.app_context():
+            references = make_references(folder)
+            file_configs = file_config.build_file_configs(make_file(folder, rows), 'Clt', references)
+            output_path = os.path.join(folder, 'import.csv')
+            print(f"{rows} lignes, {os.cpu_count()} cœur(s), meilleure de {REPEAT} exécutions")
+
+            baseline, expected = measure(file_configs, output_path, 0, rows)
+            for workers in counts:
+                seconds, content = measure(file_configs, output_path, workers, rows)
+                print(f"{'':<12}   accélération x{baseline / seconds:.2f}, sortie identique : {content == expected}")
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    # Les processus du pool sont démarrés en 'spawn' : ce module est réimporté par chacun
+    main()
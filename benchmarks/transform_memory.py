@@ -0,0 +1,93 @@
+"""
+Mémoire et durée de la transformation d'un fichier d'import : enchaînement historique
+(order_columns, mark_duplicates, delete_data_based_on_column, drop_columns, rename_columns,
+reproduit ici) comparé au plan de transformation en un seul passage (apply_transform_plan).
+
+Usage : python benchmarks/transform_memory.py [nombre de lignes] [--object]
+Le pic mesuré par tracemalloc couvre les allocations Python et numpy pendant la transformation ;
+les colonnes texte de pandas 3 sont stockées par pyarrow, hors de tracemalloc : la mémoire pyarrow
+encore allouée après la transformation est donc affichée à part. --object désactive le type texte
+pyarrow (colonnes object, comme pandas 2) : tout le pic est alors mesuré par tracemalloc.
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from controllers.FileConfigController import FileConfigController  # noqa: E402
+
+file_config = FileConfigController()
+fields = file_config.get_fiedls_odoo('Clt')
+
+
+def make_frame(rows):
+    """Fichier client nettoyé : trois lignes par pièce, deux colonnes inutiles."""
+    references = np.repeat([f"F{index}" for index in range(rows // 3 + 1)], 3)[:rows]
+    columns = {}
+    for column in fields['Column'] + ['X1', 'X2']:
+        if column == 'Référence':
+            values = references
+        elif column == 'Date':
+            values = np.full(rows, '030125')
+        else:
+            values = np.full(rows, f"v{column}")
+        columns[column] = values.astype(object)
+    return pd.DataFrame(columns)
+
+
+def legacy_transform(df):
+    """Étapes successives de la transformation avant le plan compilé (une copie par étape)."""
+    if "Date" in df.columns:
+        df["Date"] = pd.to_datetime(df["Date"], format="%d%m%y").dt.strftime("%Y-%m-%d")
+    df = df[[col for col in fields['Column'] if col in df.columns]]
+    duplicated = df.duplicated(subset=["Référence"], keep="first")
+    df["Doublon"] = duplicated.apply(lambda x: "OUI" if x else "NON")
+    df.loc[df["Doublon"] == "OUI", fields['Entete']] = None
+    df = df.drop(columns=["Doublon"])
+    return file_config.rename_columns(df, fields['Mapping'])
+
+
+def plan_transform(df):
+    plan = file_config.compile_transform_plan(fields['Column'], fields['Entete'], fields['Mapping'])
+    return file_config.apply_transform_plan(df, plan)
+
+
+def measure(name, transform, rows):
+    df = make_frame(rows)
+    arrow_base = pyarrow.default_memory_pool().bytes_allocated() if pyarrow else 0
+    tracemalloc.start()
+    started = time.perf_counter()
+    output = transform(df)
+    seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    arrow = (pyarrow.default_memory_pool().bytes_allocated() - arrow_base) / 2 ** 20 if pyarrow else 0.0
+    print(f"{name:<8} {rows} lignes : {seconds:.2f} s, pic {peak / 2 ** 20:.1f} MiB, pyarrow {arrow:.1f} MiB, sortie {output.shape}")
+    return output
+
+
+def main():
+    arguments = [argument for argument in sys.argv[1:] if argument != '--object']
+    rows = int(arguments[0]) if arguments else 300000
+    if '--object' in sys.argv:
+        pd.set_option("future.infer_string", False)
+    print(f"pandas {pd.__version__}, colonnes texte : {pd.Series(['a']).dtype}")
+    outputs = {}
+    # Deux mesures de chaque variante, en alternance
+    for name, transform in (('ancien', legacy_transform), ('plan', plan_transform)) * 2:
+        outputs[name] = measure(name, transform, rows)
+    print("Sorties identiques :", outputs['ancien'].equals(outputs['plan']))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,15 @@
 import os
 import logging
 import subprocess
+import time
 from flask import current_app
 from controllers.ToolController import ToolController
+from controllers.OdooRpcController import OdooRpcController
+from controllers.ExportSchedulerController import ExportSchedulerController
 
 tool = ToolController()
+odoo_rpc = OdooRpcController()
+scheduler = ExportSchedulerController()
 
 
 class AppController:
@@ -58,15 +63,18 @@ uid = {os.getenv('ODOO_UID', 2)}
         return connect_file
 
 
-    def export_odoo_data(self, modele, colonne, fichier, domain='[]'):
+    def export_odoo_data(self, modele, colonne, fichier, domain='[]', timeout=None):
         """
         Exporter les données depuis Odoo vers un fichier CSV.
+        Le délai maximal de l'export (en secondes) vaut ODOO_EXPORT_TIMEOUT par défaut.
         """
         if not modele or not colonne or not fichier:
             return tool.response_function(0, "Paramètres invalides", "Modele, colonne ou fichier manquant.")
 
         if not os.path.exists(fichier):
             self.initialize_directories()
+            timeout = timeout or current_app.config.get('ODOO_EXPORT_TIMEOUT', 3600)
+            plan = scheduler.plan(modele)
             
             # Commande de base pour l'exportation
             base_command = [
@@ -74,8 +82,8 @@ uid = {os.getenv('ODOO_UID', 2)}
                 "-c", self.connect_file_create(),
                 f"--file={fichier}",
                 f"--model={modele}",
-                "--worker=2",
-                "--size=200",
+                f"--worker={plan['worker']}",
+                f"--size={plan['size']}",
                 f"--domain={domain}",
                 f"--field={colonne}",
                 "--sep=;",
@@ -86,8 +94,9 @@ uid = {os.getenv('ODOO_UID', 2)}
 
             try:
                 logging.info(f"Exécution de la commande: {' '.join(base_command)} dans {execution_directory}")
+                started = time.perf_counter()
                 result = subprocess.run(
-                    base_command, cwd=execution_directory, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=3600
+                    base_command, cwd=execution_directory, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout
                 )
 
                 if result.returncode != 0:
@@ -95,11 +104,12 @@ uid = {os.getenv('ODOO_UID', 2)}
                     logging.error(f"Erreur lors de l'exportation: {error_details}")
                     return tool.response_function(0, "Erreurs lors de l'exportation", error_details)
                 else:
+                    self.record_export_file(modele, fichier, time.perf_counter() - started, plan, full=domain in ('[]', []))
                     logging.info(f"Exportation terminée avec succès. Fichier créé: {fichier}")
                     return tool.response_function(1, "Exportation terminée. Fichier créé", fichier)
 
             except subprocess.TimeoutExpired:
-                logging.error("L'exportation a dépassé le délai imparti.")
+                logging.error(f"L'exportation de {modele} a dépassé le délai imparti ({timeout} s).")
                 return tool.response_function(0, "L'exportation a dépassé le délai imparti.", 0)
 
             except Exception as e:
@@ -109,3 +119,36 @@ uid = {os.getenv('ODOO_UID', 2)}
         else:
             logging.info(f"Fichier existant: {fichier}")
             return tool.response_function(1, "Fichier existant", fichier)
+
+    def export_odoo_records(self, modele, colonne, domain='[]'):
+        """
+        Exporter les données depuis Odoo dans le processus (JSON-RPC), sans fichier intermédiaire.
+        Retourne les données en colonnes : {'columns': [...], 'data': {champ: [valeurs]}}.
+        """
+        if not modele or not colonne:
+            return tool.response_function(0, "Paramètres invalides", "Modele ou colonne manquant.")
+
+        self.initialize_directories()
+        plan = scheduler.plan(modele)
+        action = odoo_rpc.export_data(
+            self.connect_file_create(), modele, colonne, domain,
+            size=plan['size'], worker=plan['worker']
+        )
+        if action['Type'] != 'Error':
+            stats = action['Response']['stats']
+            scheduler.record(modele, stats['rows'], stats['seconds'], plan['size'], plan['worker'],
+                             stats['batches'], stats['batch_latency'], full=domain in ('[]', []))
+        return action
+
+    def record_export_file(self, modele, fichier, seconds, plan, full=True):
+        """
+        Enregistre le débit d'un export fait par odoo_export_thread.py, en comptant
+        les lignes du fichier produit (en-tête exclue).
+        """
+        try:
+            with open(fichier, 'rb') as file:
+                rows = max(sum(chunk.count(b'\n') for chunk in iter(lambda: file.read(1 << 20), b'')) - 1, 0)
+        except OSError:
+            return
+        batches = -(-rows // plan['size'])
+        scheduler.record(modele, rows, seconds, plan['size'], plan['worker'], batches, full=full)
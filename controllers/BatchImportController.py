@@ -0,0 +1,174 @@
+import codecs
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from flask import Flask, current_app
+from controllers.FileManagerController import FileManagerController
+from controllers.FileConfigController import FileConfigController
+from controllers.ToolController import ToolController
+
+file_manager = FileManagerController()
+file_config = FileConfigController()
+tool = ToolController()
+
+# Paramètres de l'application transmis aux processus de traitement
+WORKER_SETTINGS = ['UPLOAD_FOLDER', 'DOWNLOAD_FOLDER', 'CONFIG', 'IMPORT_CHUNK_SIZE']
+
+
+def _import_file(settings, data, references, output_path):
+    """
+    Point d'entrée d'un processus de traitement : importe un fichier chargé avec les
+    instantanés de référence déjà exportés par le processus principal.
+    Une application minimale porte la configuration (dossiers, taille des blocs).
+    """
+    app = Flask(__name__)
+    app.config.update(settings)
+    with app.app_context():
+        return BatchImportController().import_file(data, references, output_path)
+
+
+class BatchImportController:
+    """
+    Import d'un lot de fichiers chargés avec un même mouvement et une même correspondance
+    de colonnes (ex. les fichiers mensuels de plusieurs agences).
+
+    Les données de référence Odoo sont exportées une seule fois pour tout le lot ; chaque fichier
+    est ensuite nettoyé, validé et transformé dans un pool de processus (IMPORT_BATCH_WORKERS)
+    à partir des mêmes instantanés. Le résultat est un fichier d'import commun (mode 'combine')
+    ou un fichier d'import par fichier chargé (mode 'separe').
+    """
+
+    def import_file(self, data, references, output_path):
+        """Nettoie, valide et transforme un fichier chargé vers output_path."""
+        cleaned = file_config.cleaning_data(data)
+        if cleaned['Type'] == 'Error':
+            return cleaned
+
+        extract = data['extract']
+        fields = file_config.get_fiedls_odoo(extract)
+        file_configs = file_config.build_file_configs(cleaned['Response'], extract, references)
+        datasets = file_config.declare_datasets(file_configs, fields['Column'])
+
+        verif = file_config.validate_import(
+            file_configs, extract, datasets, rename=file_config.source_columns(data, fields['Column'])
+        )
+        if verif['Type'] == 'Error':
+            return verif
+
+        return file_config.process_import_files(
+            file_configs, output_path, fields['Column'], fields['Entete'], fields['Mapping'],
+            os.path.basename(output_path), file_config.move_label(extract), datasets
+        )
+
+    def run(self, data, files, names=None, progress=None):
+        """
+        Importe un lot de fichiers chargés.
+
+        :param data: Données du formulaire d'import (mouvement, séparateur, correspondances, mode).
+        :param files: Chemins des fichiers chargés, dans l'ordre du fichier d'import commun.
+        :param names: Noms d'origine des fichiers (les fichiers chargés sont nommés d'après leur contenu).
+        :param progress: Fonction optionnelle progress(etape, pourcentage).
+        """
+        progress = progress or (lambda stage, value: None)
+        extract = data.get('extract')
+        combine = data.get('mode', 'combine') != 'separe'
+        if not files:
+            return tool.response_function(0, "Aucun fichier trouvé.", files)
+
+        # Un seul export des données de référence pour tout le lot
+        progress('export', 0)
+        references = file_config.get_entities_odoo(file_config.reference_entities(extract))
+        if references['Type'] == 'Error':
+            return references
+        references = references['Response']
+        progress('export', 100)
+
+        download_folder = current_app.config['DOWNLOAD_FOLDER']
+        path_name = file_manager.generate_unique_filename('Import_du')
+        os.makedirs(os.path.join(download_folder, path_name), exist_ok=True)
+        move = file_config.move_label(extract)
+        names = names or [os.path.basename(file) for file in files]
+        outputs = []
+        for name in names:
+            source = os.path.splitext(name)[0]
+            outputs.append(os.path.join(download_folder, path_name, file_manager.generate_unique_filename(f'Import_{source}', 'csv', extract=move)))
+
+        settings = {key: current_app.config[key] for key in WORKER_SETTINGS if key in current_app.config}
+        workers = min(len(files), current_app.config.get('IMPORT_BATCH_WORKERS') or os.cpu_count() or 1)
+        results = [None] * len(files)
+
+        for stage in ('nettoyage', 'validation', 'traitement'):
+            progress(stage, 0)
+        # 'spawn' : les processus ne doivent pas hériter des verrous des threads du serveur
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            futures = {
+                executor.submit(_import_file, settings, dict(data, uploaded_file=file), references, output): index
+                for index, (file, output) in enumerate(zip(files, outputs))
+            }
+            for done, future in enumerate(as_completed(futures), start=1):
+                index = futures[future]
+                try:
+                    results[index] = future.result()
+                except Exception as e:
+                    results[index] = tool.response_function(0, "Erreur lors du traitement du fichier", str(e))
+                # Nettoyage, validation et transformation sont faits par fichier dans les processus
+                for stage in ('nettoyage', 'validation', 'traitement'):
+                    progress(stage, 100 * done / len(files))
+
+        errors = [
+            {"fichier": name, "message": result.get('Message'), "details": result['Response']}
+            for name, result in zip(names, results) if result['Type'] == 'Error'
+        ]
+        if errors:
+            # Le lot est importé en entier ou pas du tout
+            for output in outputs:
+                if os.path.exists(output):
+                    os.remove(output)
+            return tool.response_function(0, f"{len(errors)} fichier(s) sur {len(files)} n'ont pas pu être importés", errors)
+
+        if not combine:
+            for output in outputs:
+                file_manager.precompress(output)
+            return tool.response_function(1, "Lot importé", [f"{path_name}/{os.path.basename(output)}" for output in outputs])
+
+        file_name = file_manager.generate_unique_filename('Import', 'csv', extract=move)
+        combined = self.combine_outputs(outputs, os.path.join(download_folder, path_name, file_name))
+        if combined['Type'] == 'Error':
+            return combined
+        file_manager.precompress(combined['Response'])
+        return tool.response_function(1, "Lot importé", file_name)
+
+    def combine_outputs(self, outputs, output_path):
+        """
+        Concatène les fichiers d'import (même entête) dans l'ordre du lot, sans les relire
+        avec pandas : l'entête des fichiers suivants est comparée à celle du premier puis ignorée.
+        Les fichiers sources sont supprimés. En cas d'entêtes différentes, rien n'est écrit.
+        """
+        tmp_path = f"{output_path}.part"
+        header = None
+        with open(tmp_path, 'wb') as combined:
+            for output in outputs:
+                with open(output, 'rb') as file:
+                    line = file.readline()
+                    columns = line.removeprefix(codecs.BOM_UTF8).rstrip(b'\r\n')
+                    if header is None:
+                        header = columns
+                        combined.write(line)
+                    elif columns != header:
+                        break
+                    while True:
+                        block = file.read(1024 * 1024)
+                        if not block:
+                            break
+                        combined.write(block)
+        for source in outputs:
+            os.remove(source)
+        if header is not None and columns != header:
+            os.remove(tmp_path)
+            return tool.response_function(
+                0,
+                f"Entête différente de celle du premier fichier du lot : {os.path.basename(output)}",
+                {"attendu": header.decode('utf-8'), "trouve": columns.decode('utf-8')}
+            )
+        os.replace(tmp_path, output_path)
+        return tool.response_function(1, "Fichiers combinés", output_path)
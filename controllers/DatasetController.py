@@ -0,0 +1,239 @@
+import os
+import pandas as pd
+from controllers.SpreadsheetController import SpreadsheetController
+from controllers.LookupIndexController import LookupIndexController
+
+# pyarrow est facultatif : il accélère la lecture CSV et permet de stocker les fichiers
+# intermédiaires au format Parquet. Sans lui, on se rabat sur le moteur C de pandas et le CSV.
+try:
+    import pyarrow
+    import pyarrow.csv
+    import pyarrow.parquet
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+CSV_ENGINE = os.getenv('CSV_ENGINE', 'pyarrow' if HAS_PYARROW else 'c')
+INTERMEDIATE_FORMAT = os.getenv('INTERMEDIATE_FORMAT', 'parquet' if HAS_PYARROW else 'csv')
+
+# Colonnes à faible cardinalité stockées en catégories ; toutes les autres sont du texte
+CATEGORY_COLUMNS = ['Journal', 'Code journal']
+
+SUPPORTED_EXTENSIONS = ('.csv', '.xlsx', '.parquet')
+
+spreadsheet = SpreadsheetController()
+lookup_indexes = LookupIndexController()
+
+
+class DatasetController:
+    """
+    Registre des jeux de données d'un import.
+
+    Chaque fichier (fichier importé ou instantané de référence Odoo) est lu une seule fois,
+    avec un sous-ensemble de colonnes fixé à l'avance et des colonnes typées en texte,
+    puis partagé entre la validation et la transformation. Les DataFrames retournés par
+    `load` sont partagés : ils ne doivent pas être modifiés en place (utiliser `pop` pour
+    récupérer un DataFrame à transformer).
+    """
+
+    def __init__(self):
+        self.specs = {}
+        self.datasets = {}
+        self.lookups = {}
+
+    def _key(self, path):
+        return os.path.abspath(path)
+
+    def declare(self, path, columns=None, sep=","):
+        """
+        Déclare les colonnes utiles d'un fichier avant sa lecture.
+        Plusieurs déclarations pour un même fichier cumulent leurs colonnes.
+
+        :param path: Chemin du fichier (CSV ou Excel).
+        :param columns: Colonnes à charger (None pour toutes les colonnes).
+        :param sep: Séparateur du fichier CSV.
+        """
+        key = self._key(path)
+        spec = self.specs.get(key)
+        if spec is None:
+            self.specs[key] = {"columns": None if columns is None else list(columns), "sep": sep}
+        elif spec["columns"] is not None:
+            if columns is None:
+                spec["columns"] = None
+            else:
+                spec["columns"] += [col for col in columns if col not in spec["columns"]]
+        return self
+
+    def _read(self, path, columns, sep):
+        if path.endswith('.csv'):
+            df = self.read_csv(path, sep, columns)
+        elif path.endswith('.parquet'):
+            df = self.read_parquet(path, columns)
+        elif path.endswith('.xlsx'):
+            # Le classeur n'est jamais relu : on passe par sa copie convertie
+            return self._read(spreadsheet.convert(path), columns, ",")
+        else:
+            raise ValueError(f"Format de fichier non pris en charge : {path}")
+
+        df.columns = df.columns.str.strip()
+        return df
+
+    def match_columns(self, header, columns):
+        """Retourne les noms exacts des colonnes de l'en-tête correspondant aux colonnes demandées (espaces ignorés)."""
+        if columns is None:
+            return list(header)
+        wanted = {col.strip() for col in columns}
+        return [col for col in header if col.strip() in wanted]
+
+    def dtypes(self, columns):
+        """Types explicites : catégories pour les colonnes répétitives, texte pour les autres."""
+        return {col: 'category' if col.strip() in CATEGORY_COLUMNS else str for col in columns}
+
+    def read_csv(self, path, sep=",", columns=None, encoding=None):
+        """
+        Lit un fichier CSV en ne chargeant que les colonnes demandées, avec des types explicites
+        (aucune inférence), via le moteur pyarrow lorsqu'il est disponible.
+        """
+        header = pd.read_csv(path, sep=sep, nrows=0, encoding=encoding).columns
+        usecols = self.match_columns(header, columns)
+
+        if CSV_ENGINE != 'pyarrow':
+            return pd.read_csv(path, sep=sep, usecols=usecols, dtype=self.dtypes(usecols), encoding=encoding)
+
+        # Le moteur pyarrow de pandas infère les types avant de convertir (les zéros en tête
+        # sont perdus) : les colonnes sont donc déclarées en texte directement auprès de pyarrow.
+        table = pyarrow.csv.read_csv(
+            path,
+            read_options=pyarrow.csv.ReadOptions(
+                encoding='utf8' if encoding in (None, 'utf-8', 'utf-8-sig') else encoding
+            ),
+            parse_options=pyarrow.csv.ParseOptions(delimiter=sep),
+            convert_options=pyarrow.csv.ConvertOptions(
+                include_columns=usecols,
+                column_types={col: pyarrow.string() for col in usecols},
+                strings_can_be_null=True,
+            ),
+        )
+        df = table.to_pandas()
+        return df.astype({col: dtype for col, dtype in self.dtypes(usecols).items() if dtype == 'category'})
+
+    def read_parquet(self, path, columns=None):
+        header = pyarrow.parquet.read_schema(path).names
+        return pd.read_parquet(path, columns=self.match_columns(header, columns))
+
+    def intermediate_path(self, base_name):
+        """Chemin du fichier intermédiaire d'un nom de base (selon INTERMEDIATE_FORMAT)."""
+        return f"{base_name}.parquet" if INTERMEDIATE_FORMAT == 'parquet' else f"{base_name}.csv"
+
+    def write_intermediate(self, df, base_name):
+        """
+        Enregistre un fichier intermédiaire (Parquet si pyarrow est disponible, CSV sinon)
+        et retourne son chemin. L'écriture passe par un fichier temporaire : un fichier
+        intermédiaire présent est toujours complet.
+        """
+        output_file = self.intermediate_path(base_name)
+        tmp_file = f"{output_file}.tmp"
+        if INTERMEDIATE_FORMAT == 'parquet':
+            df.to_parquet(tmp_file, index=False)
+        else:
+            df.to_csv(tmp_file, index=False, encoding='utf-8')
+        os.replace(tmp_file, output_file)
+        return output_file
+
+    def header(self, path, sep=None):
+        """Retourne les noms de colonnes (sans espaces) d'un fichier, sans charger ses lignes."""
+        key = self._key(path)
+        if key in self.datasets:
+            return self.datasets[key].columns
+        sep = sep or (self.specs.get(key) or {}).get("sep", ",")
+        if path.endswith('.xlsx'):
+            path, sep = spreadsheet.convert(path), ","
+        if path.endswith('.csv'):
+            header = pd.read_csv(path, sep=sep, nrows=0).columns
+        elif path.endswith('.parquet'):
+            header = pd.Index(pyarrow.parquet.read_schema(path).names)
+        else:
+            raise ValueError(f"Format de fichier non pris en charge : {path}")
+        return header.str.strip()
+
+    def iter_chunks(self, path, chunk_size, columns=None, sep=None):
+        """
+        Parcourt un fichier par blocs d'au plus chunk_size lignes, avec les colonnes déclarées.
+        Le fichier est relu par blocs depuis le disque, sans passer par le registre : seul
+        un bloc est en mémoire à la fois. L'index des lignes est continu d'un bloc à l'autre.
+        """
+        key = self._key(path)
+        spec = self.specs.get(key) or {"columns": columns, "sep": sep or ","}
+        columns = spec["columns"] if columns is None else columns
+        sep = sep or spec["sep"]
+
+        if path.endswith('.xlsx'):
+            path = spreadsheet.convert(path)
+            sep = ","
+
+        if path.endswith('.csv'):
+            header = pd.read_csv(path, sep=sep, nrows=0).columns
+            usecols = self.match_columns(header, columns)
+            # Le moteur pyarrow ne sait pas lire par blocs : moteur C de pandas
+            chunks = pd.read_csv(path, sep=sep, usecols=usecols, dtype=self.dtypes(usecols), chunksize=chunk_size)
+        elif path.endswith('.parquet'):
+            parquet_file = pyarrow.parquet.ParquetFile(path)
+            usecols = self.match_columns(parquet_file.schema_arrow.names, columns)
+            chunks = self._parquet_chunks(parquet_file, usecols, chunk_size)
+        else:
+            raise ValueError(f"Format de fichier non pris en charge : {path}")
+
+        for df in chunks:
+            df.columns = df.columns.str.strip()
+            yield df
+
+    def _parquet_chunks(self, parquet_file, columns, chunk_size):
+        start = 0
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+            df = batch.to_pandas()
+            df.index = pd.RangeIndex(start, start + len(df))
+            start += len(df)
+            yield df
+
+    def load(self, path, columns=None, sep=None):
+        """
+        Retourne le DataFrame d'un fichier, lu au premier appel puis servi depuis le registre.
+        Les colonnes demandées qui n'ont pas été déclarées sont ajoutées à la déclaration.
+        """
+        key = self._key(path)
+        spec = self.specs.get(key)
+        if spec is None or columns is not None and spec["columns"] is not None \
+                and any(col not in spec["columns"] for col in columns):
+            self.declare(path, columns, sep or (spec or {}).get("sep", ","))
+            self.datasets.pop(key, None)
+            spec = self.specs[key]
+
+        if key not in self.datasets:
+            print(f"Chargement du fichier : {path}")
+            self.datasets[key] = self._read(path, spec["columns"], sep or spec["sep"])
+        return self.datasets[key]
+
+    def lookup(self, path, key_column, value_column=None, sep=None):
+        """
+        Retourne l'index de correspondance key_column -> value_column d'un fichier de référence
+        (clés sans espaces et en minuscules, valeurs sans espaces) : l'index persistant de
+        l'instantané s'il est à jour, sinon un index construit une seule fois par import.
+        Sans value_column, seul l'ensemble des clés est disponible (test de présence).
+        """
+        cache_key = (self._key(path), key_column, value_column)
+        if cache_key not in self.lookups:
+            index = lookup_indexes.load(path, key_column, value_column)
+            if index is None:
+                columns = [key_column] if value_column is None else [key_column, value_column]
+                index = lookup_indexes.from_frame(self.load(path, columns=columns, sep=sep), key_column, value_column)
+            self.lookups[cache_key] = index
+        return self.lookups[cache_key]
+
+    def pop(self, path):
+        """
+        Retire un DataFrame du registre et le retourne : l'appelant peut alors le modifier
+        sans copie, le fichier sera relu s'il est redemandé.
+        """
+        df = self.load(path)
+        self.datasets.pop(self._key(path), None)
+        return df
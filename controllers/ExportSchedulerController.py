@@ -0,0 +1,124 @@
+import json
+import logging
+import math
+import os
+import threading
+from datetime import datetime
+from flask import current_app
+
+_stats_lock = threading.Lock()
+
+
+class ExportSchedulerController:
+    """
+    Choix de la taille des lots et du nombre de travailleurs des exports Odoo.
+
+    Chaque export enregistre son débit (lignes/s) et la latence moyenne d'un lot dans
+    public/config/export_stats.json. Le plan du prochain export d'un modèle en est déduit :
+    la taille des lots double tant qu'un lot répond en moins de la moitié de
+    ODOO_EXPORT_TARGET_LATENCY et diminue de moitié au-delà ; si le débit chute par rapport
+    au meilleur export connu, la taille de ce dernier est reprise. Seuls les exports complets
+    (sans domaine) ajustent le plan : les exports incrémentaux ne portent que sur quelques lots,
+    et le nombre de travailleurs est calculé à partir du nombre de lignes du dernier export complet.
+    Les valeurs fixées dans ODOO_EXPORT_OVERRIDES pour un modèle sont toujours prioritaires.
+    """
+
+    MIN_SIZE = 50
+    HISTORY = 20
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(logging.INFO)
+
+    def stats_path(self):
+        return os.path.join(current_app.config['CONFIG'], 'export_stats.json')
+
+    def read_stats(self):
+        try:
+            with open(self.stats_path(), encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_stats(self, stats):
+        tmp_path = f"{self.stats_path()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(stats, file, indent=2)
+        os.replace(tmp_path, self.stats_path())
+
+    def plan(self, modele):
+        """
+        Retourne la taille des lots et le nombre de travailleurs à utiliser pour exporter un modèle.
+        """
+        config = current_app.config
+        model_stats = self.read_stats().get(modele, {})
+        overrides = config.get('ODOO_EXPORT_OVERRIDES', {}).get(modele, {})
+
+        return {
+            'size': int(overrides.get('size', model_stats.get('size', config.get('ODOO_EXPORT_SIZE', 200)))),
+            'worker': int(overrides.get('worker', model_stats.get('worker', config.get('ODOO_EXPORT_WORKERS', 2)))),
+        }
+
+    def record(self, modele, rows, seconds, size, worker, batches, batch_latency=None, full=True):
+        """
+        Enregistre les mesures d'un export et ajuste le plan des exports suivants du modèle.
+
+        :param rows: Nombre de lignes exportées.
+        :param seconds: Durée totale de l'export.
+        :param batches: Nombre de lots exportés.
+        :param batch_latency: Durée moyenne d'un lot (estimée à partir de la durée totale si absente).
+        :param full: Export complet du modèle (False pour un export incrémental).
+        """
+        if batch_latency is None:
+            batch_latency = seconds * min(worker, max(batches, 1)) / max(batches, 1)
+        rows_per_sec = rows / seconds if seconds > 0 else 0.0
+        entry = {
+            'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'rows': rows,
+            'seconds': round(seconds, 3),
+            'rows_per_sec': round(rows_per_sec, 1),
+            'size': size,
+            'worker': worker,
+            'batches': batches,
+            'batch_latency': round(batch_latency, 3),
+            'full': full,
+        }
+        self.logger.info(f"Export {modele} : {rows} lignes en {seconds:.1f} s ({rows_per_sec:.0f} lignes/s, lots de {size}, {worker} travailleur(s))")
+
+        with _stats_lock:
+            stats = self.read_stats()
+            model_stats = stats.setdefault(modele, {'size': size, 'worker': worker, 'history': []})
+            model_stats['history'] = (model_stats.get('history', []) + [entry])[-self.HISTORY:]
+
+            # Seuls les exports complets d'au moins deux lots renseignent sur l'effet de la taille des lots
+            if full:
+                model_stats['full_rows'] = rows
+                if batches >= 2:
+                    model_stats['size'], model_stats['worker'] = self._adapt(model_stats['history'], entry, rows)
+            stats[modele] = model_stats
+            self._write_stats(stats)
+        return entry
+
+    def _adapt(self, history, entry, full_rows):
+        config = current_app.config
+        target = config.get('ODOO_EXPORT_TARGET_LATENCY', 5.0)
+        max_size = config.get('ODOO_EXPORT_MAX_SIZE', 5000)
+        max_workers = config.get('ODOO_EXPORT_MAX_WORKERS', 8)
+        size, worker = entry['size'], entry['worker']
+
+        if entry['batch_latency'] < target / 2:
+            size = min(size * 2, max_size)
+        elif entry['batch_latency'] > target:
+            size = max(size // 2, self.MIN_SIZE)
+
+        # Revenir à la meilleure taille connue si le débit a nettement baissé
+        measured = [item for item in history if item['batches'] >= 2 and item.get('full', True)]
+        best = max(measured, key=lambda item: item['rows_per_sec'])
+        if best['size'] != entry['size'] and entry['rows_per_sec'] < 0.8 * best['rows_per_sec']:
+            size = best['size']
+
+        # Assez de travailleurs pour couvrir les lots d'un export complet, moins si le serveur sature
+        worker = max(1, min(math.ceil(full_rows / size), max_workers))
+        if entry['batch_latency'] > 2 * target:
+            worker = max(1, min(worker, entry['worker'] - 1))
+        return size, worker
@@ -1,83 +1,84 @@
 import ast
+import atexit
+import hashlib
+import json
+import math
+import multiprocessing
 import os
-import csv
 import re
+import threading
 import zipfile
 import openpyxl
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
 from datetime import datetime
-from flask import current_app, send_from_directory
+from flask import current_app, redirect, send_from_directory, url_for
 from controllers.FileManagerController import FileManagerController
 from controllers.AppController import AppController
 from controllers.ToolController import ToolController
+from controllers.ReferenceCacheController import ReferenceCacheController
+from controllers.DatasetController import DatasetController, SUPPORTED_EXTENSIONS
+from controllers.FileProbeController import FileProbeController
+from controllers.LookupIndexController import LookupIndex, LookupIndexController
+from controllers.SplitController import SplitController, DEFAULT_MAX_ROWS, DEFAULT_KEY_COLUMNS
+from controllers.ValidationController import ValidationController
 
 file_manager = FileManagerController()
 data_odoo = AppController()
 tool = ToolController()
+reference_cache = ReferenceCacheController()
+file_probe = FileProbeController()
+lookup_indexes = LookupIndexController()
+splitter = SplitController()
+validation = ValidationController()
+
+# Pool de processus du mode multi-cœur, créé au premier import parallèle puis réutilisé
+# tant que IMPORT_PARALLEL_WORKERS ne change pas
+_process_pool = None
+_process_pool_workers = 0
+_process_pool_lock = threading.Lock()
+
+
+@atexit.register
+def _shutdown_process_pool():
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(cancel_futures=True)
+            _process_pool = None
+
+
+def _transform_partition(df, duplicated, config, plan, move, part_path):
+    """
+    Point d'entrée d'un processus du mode multi-cœur : transforme une partition du fichier
+    (les index de référence sont ouverts en projection mémoire, en lecture seule) et l'écrit,
+    sans entête, dans part_path.
+    """
+    result = FileConfigController().transform_frame(df, config, DatasetController(), plan, move, duplicated=duplicated)
+    if result['Type'] == 'Error':
+        return result
+    df = result['Response']
+    df.to_csv(part_path, index=False, header=False, sep=",", encoding="utf-8")
+    return tool.response_function(1, "Partition traitée", df.columns.tolist())
 
 
 class FileConfigController:
     
-    def drop_columns(self, df, columns_to_drop):
-        """Supprime les colonnes spécifiques d'un DataFrame."""
-        df.columns = df.columns.str.strip()  # Nettoie les noms de colonnes
-        columns_to_drop = [col.strip() for col in columns_to_drop]  # Nettoie les noms à supprimer
-        df.drop(columns=[col for col in columns_to_drop if col in df.columns], inplace=True)
-        return df
-
-    def order_columns(self, df, column_order):
-        """
-        Réorganise les colonnes d'un DataFrame selon un ordre spécifié
-        et modifie la colonne "Date" en ajoutant un "-" après chaque 2 caractères.
-        
-        :param df: Le DataFrame à modifier.
-        :param column_order: La liste des colonnes dans l'ordre souhaité.
-        :return: Un DataFrame avec les colonnes réorganisées.
-        """
-        # Convertion de la Colonne Date au format date de Odoo
-        if "Date" in df.columns:
-            df["Date"] = pd.to_datetime(df["Date"], format="%d%m%y").dt.strftime("%Y-%m-%d")
-
-        # Garder uniquement les colonnes spécifiées dans column_order
-        new_order = [col for col in column_order if col in df.columns]
-        
-        # Retourner le DataFrame avec les colonnes dans le nouvel ordre
-        return df[new_order]
-
-    def delete_data_based_on_column(self, df, check_column, target_value, columns_to_clear):
-        """Supprime les données des colonnes spécifiées si une valeur cible est trouvée dans une colonne donnée."""
-        df.loc[df[check_column] == target_value, columns_to_clear] = None
-        return df
-
-    def keep_only_columns(self, df, columns_to_keep):
-        """Conserve uniquement les colonnes spécifiées dans un DataFrame."""
-        return df[[col for col in columns_to_keep if col in df.columns]]
-
-    def mark_duplicates(self, df, column_name, duplicate_col_name="Doublon", yes_value="OUI", no_value="NON"):
-        """Marque les doublons dans une colonne d'un DataFrame."""
-        if duplicate_col_name in df.columns:
-            df.drop(columns=[duplicate_col_name], inplace=True)
-        df[duplicate_col_name] = df.duplicated(subset=[column_name], keep="first").apply(lambda x: yes_value if x else no_value)
-        return df
-
     def add_comparison_results(self, df, additional_data, column2, column1, column3, result_column):
         """
         Ajoute les résultats de la comparaison entre deux DataFrames et retourne une liste des éléments non trouvés.
         Vérifie que les autres colonnes ne sont pas vides avant de considérer un élément comme manquant.
         """
         
-        additional_data.columns = additional_data.columns.str.strip()
-        df.columns = df.columns.str.strip()
-        # Supprimer les espaces dans les valeurs des colonnes concernées
-        additional_data[column1] = additional_data[column1].astype(str).str.strip().str.lower()
-        additional_data[column3] = additional_data[column3].astype(str).str.strip()
+        # additional_data peut être un index de correspondance déjà normalisé
+        # (voir DatasetController.lookup) ; un DataFrame partagé n'est pas modifié
+        if not isinstance(additional_data, LookupIndex):
+            additional_data = lookup_indexes.from_frame(additional_data, column1, column3)
+        # Les noms de colonnes sont déjà nettoyés à la lecture (DatasetController)
         df[column2] = df[column2].astype(str).str.strip().str.lower()
 
-        # Créer un dictionnaire de correspondance à partir de additional_data
-        lookup_dict = dict(zip(additional_data[column1], additional_data[column3]))
-
-        # Appliquer le dictionnaire de correspondance
-        df[result_column] = df[column2].map(lookup_dict)
+        # Appliquer l'index de correspondance (recherche sur les valeurs distinctes)
+        df[result_column] = additional_data.map(df[column2])
 
         # Créer un masque pour les lignes où result_column est NaN
         nan_mask = df[result_column].isna()
@@ -97,6 +98,55 @@ class FileConfigController:
         return df, missing_elements
 
 
+    def compile_transform_plan(self, column_order, entete, column_mapping, key_column="Référence"):
+        """
+        Prépare une fois par mouvement (Clt, Fni, PETROCI) les étapes finales de la transformation :
+        colonnes à conserver dans l'ordre, colonnes de dates, colonnes d'entête à vider sur les lignes
+        en double et noms des colonnes d'Odoo.
+        """
+        mapping = {key.strip(): value.strip() for key, value in column_mapping.items()}
+        return {
+            'columns': [col.strip() for col in column_order],
+            'dates': [col for col in ("Date",) if col in column_order],
+            'header': [col.strip() for col in entete],
+            'key': key_column,
+            'mapping': mapping,
+        }
+
+    def apply_transform_plan(self, df, plan, seen=None, duplicated=None):
+        """
+        Applique un plan de transformation en un seul passage, sans copie intermédiaire du DataFrame :
+        sélection et ordre des colonnes, conversion des dates, repérage des doublons (masque booléen),
+        effacement des colonnes d'entête des lignes en double et renommage.
+
+        :param seen: Références déjà rencontrées dans les blocs précédents (traitement par blocs).
+        :param duplicated: Masque des doublons calculé sur tout le fichier (mode multi-cœur).
+        """
+        columns = [col for col in plan['columns'] if col in df.columns]
+        # Nouveau DataFrame constitué des colonnes existantes, sans recopier leurs données
+        frame = pd.DataFrame({col: df[col] for col in columns}, copy=False)
+
+        for col in plan['dates']:
+            if col in frame.columns:
+                frame[col] = pd.to_datetime(frame[col], format="%d%m%y").dt.strftime("%Y-%m-%d")
+
+        # Doublons : seule la première ligne d'une référence conserve l'entête
+        key = frame[plan['key']]
+        if duplicated is not None:
+            duplicated = pd.Series(duplicated, index=frame.index)
+        else:
+            duplicated = key.duplicated(keep="first")
+        if seen is not None:
+            duplicated |= key.isin(seen)
+            seen.update(key.unique())
+        if duplicated.any():
+            for col in plan['header']:
+                if col in frame.columns:
+                    frame[col] = frame[col].mask(duplicated)
+
+        frame.columns = [plan['mapping'].get(col, col) for col in columns]
+        return frame
+
     def rename_columns(self, df, column_mapping):
         """
         Renomme les colonnes d'un DataFrame selon un dictionnaire de mappage, 
@@ -145,42 +195,34 @@ class FileConfigController:
 
 
     def get_entity_odoo(self, entity):
+        """
+        Retourne le chemin de l'instantané des données de référence Odoo de l'entité,
+        servi depuis le cache et rafraîchi de façon incrémentale si nécessaire.
+        """
+        action = reference_cache.get_snapshot(entity)
 
-        file_config = current_app.config['CONFIG']
-        
-        if entity == 'res_partner':
-            file = os.path.join(file_config, file_manager.generate_unique_filename('res_partner', 'csv', extract='du'))
-            action = data_odoo.export_odoo_data(entity.replace("_", "."), 'id,ref,customer_rank,supplier_rank', file)
-        elif entity == 'product_template':
-            file = os.path.join(file_config, file_manager.generate_unique_filename('product_template', 'csv', extract='du'))
-            action = data_odoo.export_odoo_data(entity.replace("_", "."), 'id,display_name,old_default_code', file)
-        
         if action['Type'] == 'Error':
             return tool.response_function(0, action['Message'], action['Response'])
         else:
-            return tool.response_function(1, action['Response'], file)
+            return tool.response_function(1, f"Données de référence {entity}", action['Response'])
 
     def get_headers(self, file_path, separator=None):
         """
         Retourne les entêtes (noms des colonnes) d'un fichier .xlsx ou .csv.
+        Seule la première ligne est lue (sans charger le classeur) et le résultat est mis en cache.
         
         :param file_path: Chemin du fichier (xlsx ou csv).
+        :param separator: Séparateur CSV ; détecté automatiquement s'il n'est pas fourni.
         :return: Liste des noms de colonnes ou un message d'erreur.
         """
         try:
             
             # Vérifier l'extension du fichier
-            if file_path.endswith('.csv'):
-                # Lire le fichier CSV
-                df = pd.read_csv(file_path, nrows=0, sep=separator)  # Charger uniquement les entêtes
-            elif file_path.endswith('.xlsx'):
-                # Lire le fichier Excel
-                df = pd.read_excel(file_path, nrows=0)  # Charger uniquement les entêtes
-            else:
+            if not file_path.endswith(('.csv', '.xlsx')):
                 return tool.response_function(0, 'Format non pris en charge', file_path)
             
             # Retourner les noms des colonnes
-            return tool.response_function(1, f'Les entete du fichier {file_path}', list(df.columns))
+            return tool.response_function(1, f'Les entete du fichier {file_path}', file_probe.probe(file_path, separator)['columns'])
         except Exception as e:
             return tool.response_function(0, 'Erreur lors de la lecture du fichier', str(e))
     
@@ -188,20 +230,37 @@ class FileConfigController:
 
 
 
-    def analytic_account(self, df):
-        modele = 'account.analytic.account'
-        file = os.path.join(current_app.config['CONFIG'], file_manager.generate_unique_filename(modele.replace(".","_"), 'csv', extract='du'))
-        
-        analytic = data_odoo.export_odoo_data(modele, 'id.id,code', file)
-        anal = pd.read_csv(analytic['Response'], sep=";")
-                
+    def analytic_account(self, df, datasets=None, analytic_file=None):
+        if not analytic_file:
+            analytic = self.get_entity_odoo('account_analytic_account')
+            if analytic['Type'] == 'Error':
+                return tool.response_function(0, analytic['Message'], analytic['Response'])
+            analytic_file = analytic['Response']
+        datasets = datasets or DatasetController()
+        anal = datasets.lookup(analytic_file, 'code', 'id.id', sep=";")
+
+        # Correspondance vectorisée code -> identifiant du compte analytique
         df, missing_elements = self.add_comparison_results(df, anal, 'Analytique', 'code', 'id.id', 'Analytique_result')
         if missing_elements:
             return tool.response_function(0, "Les Analytique suivants n'ont pas été trouvés, veuillez les mettre à jour dans Odoo", missing_elements)
         print(f"Missing elements: {missing_elements}")
-        df['Analytique'] = df['Analytique_result'].apply(self.extract_number)
+        df['Analytique'] = self.analytic_distributions(df.pop('Analytique_result'))
         
         return tool.response_function(1, "Les Analytique", df)
+
+    def analytic_distributions(self, identifiers):
+        """
+        Calcule la distribution analytique Odoo une seule fois par compte analytique distinct
+        puis la reporte sur toutes les lignes.
+
+        :param identifiers: Série des identifiants ('id.id') des comptes analytiques des lignes.
+        :return: Série des distributions analytiques au format Odoo.
+        """
+        codes, uniques = pd.factorize(identifiers)
+        distributions = [self.extract_number(identifier) if identifier != '' else None for identifier in uniques]
+        # Le code -1 (identifiant absent) pointe sur le dernier élément : aucune distribution
+        distributions = pd.Series(distributions + [None], dtype=object)
+        return pd.Series(distributions.to_numpy()[codes], index=identifiers.index, dtype=object)
         
     def extract_number(self, cell):
         if not pd.isna(cell):
@@ -261,142 +320,161 @@ class FileConfigController:
                 }
             }
             
+    def get_entities_odoo(self, entities):
+        """
+        Récupère en parallèle les instantanés de référence de plusieurs entités Odoo.
+        Les exports sont lancés simultanément (au plus REFERENCE_EXPORT_WORKERS à la fois),
+        chacun avec son propre délai, et toutes les erreurs sont regroupées dans une seule réponse.
+
+        :param entities: Liste des entités (ex. ['res_partner', 'product_template']).
+        :return: Réponse contenant le dictionnaire {entité: chemin de l'instantané}.
+        """
+        app = current_app._get_current_object()
+        timeout = app.config.get('ODOO_EXPORT_TIMEOUT', 3600)
+
+        def fetch(entity):
+            with app.app_context():
+                return self.get_entity_odoo(entity)
+
+        files = {}
+        errors = {}
+        executor = ThreadPoolExecutor(max_workers=max(1, min(len(entities), app.config.get('REFERENCE_EXPORT_WORKERS', 3))))
+        try:
+            futures = {executor.submit(fetch, entity): entity for entity in entities}
+            done, not_done = wait(futures, timeout=timeout)
+
+            for future in done:
+                entity = futures[future]
+                try:
+                    action = future.result()
+                except Exception as e:
+                    errors[entity] = str(e)
+                    continue
+                if action['Type'] == 'Error':
+                    errors[entity] = f"{action['Message']} : {action['Response']}"
+                else:
+                    files[entity] = action['Response']
+
+            for future in not_done:
+                errors[futures[future]] = f"L'exportation a dépassé le délai imparti ({timeout} s)."
+        finally:
+            executor.shutdown(wait=False)
+
+        if errors:
+            print(f"Erreurs lors de l'export des données de référence : {errors}")
+            return tool.response_function(0, "Erreurs lors de l'export des données de référence Odoo", errors)
+        return tool.response_function(1, "Données de référence Odoo", files)
+
     def get_congif(self, file, move):
 
-        if move == 'Clt':  
-            partner = "Client"
-        else :
-            partner = "Fournisseur"
+        # Les exports des données de référence sont indépendants : ils sont lancés en parallèle
+        entities = self.reference_entities(move)
+
+        references = self.get_entities_odoo(entities)
+        if references['Type'] == 'Error':
+            return references
+        return tool.response_function(1, "Configuration de l'import", self.build_file_configs(file, move, references['Response']))
 
+    def reference_entities(self, move):
+        """Entités de référence Odoo nécessaires à un type de mouvement."""
         if move == 'PETROCI':
-            file_configs = [
-                    {
-                        "file": file,
-                        "comparaison": [
-                            {
-                                "file": self.get_entity_odoo("res_partner")['Response'],
-                                "colonne1": "ref",
-                                "colonne2": partner,
-                                "colonne3": "id",
-                                "resultat": partner
-                            }
-                        ]
-                    }
-                ]
-        else:
-            file_configs = [
-                    {
-                        "file": file,
-                        "comparaison": [
-                            {
-                                "file": self.get_entity_odoo("res_partner")['Response'],
-                                "colonne1": "ref",
-                                "colonne2": partner,
-                                "colonne3": "id",
-                                "resultat": partner
-                            },
-                            {
-                                "file": self.get_entity_odoo("product_template")['Response'],
-                                "colonne1": "old_default_code",
-                                "colonne2": "Produit",
-                                "colonne3": "display_name",
-                                "resultat": "Produit"
-                            }
-                        ]
-                    }
-                ]
+            return ['res_partner', 'account_analytic_account']
+        elif move == 'Clt':
+            return ['res_partner', 'product_template', 'account_analytic_account']
+        return ['res_partner', 'product_template']
+
+    def build_file_configs(self, file, move, references):
+        """
+        Construit la configuration d'import d'un fichier nettoyé à partir des chemins des
+        instantanés de référence ({entité: chemin}).
+        """
+        partner = "Client" if move == 'Clt' else "Fournisseur"
+
+        comparaison = [
+            {
+                "file": references['res_partner'],
+                "colonne1": "ref",
+                "colonne2": partner,
+                "colonne3": "id",
+                "resultat": partner,
+                "regle": "partenaire_inconnu"
+            }
+        ]
+        if 'product_template' in references:
+            comparaison.append(
+                {
+                    "file": references['product_template'],
+                    "colonne1": "old_default_code",
+                    "colonne2": "Produit",
+                    "colonne3": "display_name",
+                    "resultat": "Produit",
+                    "regle": "produit_inconnu"
+                }
+            )
+
+        file_configs = [
+                {
+                    "file": file,
+                    "comparaison": comparaison,
+                    "analytique": references.get('account_analytic_account')
+                }
+            ]
         return file_configs
 
 
 
-    def verif_data_presence(self, file1, col1, file2, col2):
+    def declare_datasets(self, file_configs, column_order):
         """
-        Vérifie si les valeurs d'une colonne d'un fichier sont valides :
-        - Les valeurs de 'col1' dans le fichier 1 ne doivent pas être nulles.
-        - Les valeurs de 'col1' doivent exister dans 'col2' du fichier 2.
-        :param file1: Chemin vers le premier fichier (CSV ou Excel).
-        :param col1: Nom de la colonne dans le premier fichier.
-        :param file2: Chemin vers le second fichier (CSV ou Excel).
-        :param col2: Nom de la colonne dans le second fichier.
-        :return: Résultat avec les valeurs non valides et un statut.
+        Crée le registre des fichiers de l'import en déclarant les colonnes utiles de chacun :
+        colonnes du mouvement pour les fichiers importés, colonnes de correspondance pour les
+        instantanés de référence.
         """
-        # Chargement du premier fichier
-        if file1.endswith('.csv'):
-            df1 = pd.read_csv(file1, sep=",")
-        elif file1.endswith('.xlsx'):
-            df1 = pd.read_excel(file1, engine='openpyxl')
-        else:
-            return tool.response_function(0, 'Format de fichier 1 non pris en charge', file1)
-
-        # Chargement du second fichier
-        if file2.endswith('.csv'):
-            df2 = pd.read_csv(file2, sep=";")
-        elif file2.endswith('.xlsx'):
-            df2 = pd.read_excel(file2, engine='openpyxl')
-        else:
-            return tool.response_function(0, 'Format de fichier 2 non pris en charge', file2)
-
-        print("Colonnes disponibles dans le fichier 1 :", df1.columns.tolist())
-        print("Colonnes disponibles dans le fichier 2 :", df2.columns.tolist())
-
-        # Vérification de l'existence des colonnes dans les fichiers
-        missing_columns = []
-        if col1 not in df1.columns:
-            missing_columns.append(f"{col1} (fichier 1)")
-        if col2 not in df2.columns:
-            missing_columns.append(f"{col2} (fichier 2)")
-        if missing_columns:
-            return tool.response_function(
-                0,
-                f"Les colonnes suivantes sont absentes : {', '.join(missing_columns)}",
-                missing_columns
-            )
+        datasets = DatasetController()
+        for config in file_configs:
+            datasets.declare(config["file"], column_order, sep=",")
+            for comparison in config.get("comparaison", []):
+                datasets.declare(comparison["file"], [comparison["colonne1"], comparison["colonne3"]], sep=";")
+            if config.get("analytique"):
+                datasets.declare(config["analytique"], ['code', 'id.id'], sep=";")
+        return datasets
+
+    def run_import(self, data, progress=None):
+        """
+        Enchaîne toutes les étapes d'un import : nettoyage du fichier chargé, export des
+        données de référence Odoo, validation puis génération du fichier d'importation.
 
-        # Uniformisation des données
-        df1[col1] = df1[col1].dropna().astype(str).str.strip().str.lower()
-        df2[col2] = df2[col2].dropna().astype(str).str.strip().str.lower()
-
-        # Vérification des valeurs nulles dans col1
-        null_values = df1[df1[col1].isnull()]
-        if not null_values.empty:
-            print("Valeurs nulles détectées dans la colonne du fichier 1 :", null_values)
-            return tool.response_function(
-                0,
-                f"Certaines lignes de '{col1}' dans le fichier 1 contiennent des valeurs nulles.",
-                null_values.to_dict(orient='records')
-            )
+        :param data: Données du formulaire d'import (fichier chargé, mouvement, correspondances).
+        :param progress: Fonction optionnelle progress(etape, pourcentage) appelée à chaque étape.
+        """
+        progress = progress or (lambda stage, value: None)
 
-        # Recherche élément par élément dans col2
-        missing_values = set()  # Utiliser un ensemble pour éviter les doublons
-        for value in df1[col1]:
-            if value not in df2[col2].values:
-                missing_values.add(value)
-
-        # Vérification des valeurs manquantes
-        missing_values = list(missing_values)  # Convertir en liste pour le retour
-        if missing_values:  # Vérifie explicitement si la liste contient des éléments
-            print(f"Valeurs manquantes détectées : {missing_values}")
-            return tool.response_function(
-                0,
-                f"Les valeurs suivantes de '{col1}' ne sont pas présentes dans '{col2}' :",
-                missing_values
-            )
+        progress('nettoyage', 0)
+        file_path_result = self.cleaning_data(data)
+        if file_path_result['Type'] == 'Error':
+            return file_path_result
+        progress('nettoyage', 100)
 
-        # Si toutes les valeurs de col1 sont valides et présentes dans col2
-        return tool.response_function(1, f"Toutes les valeurs de '{col1}' sont valides et présentes dans '{col2}'.", 200)
+        rename = self.source_columns(data, self.get_fiedls_odoo(data['extract'])['Column'])
+        return self.transition(file_path_result['Response'], data.get('extract'), progress, rename)
 
+    def transition(self, file, extract, progress=None, rename=None):
+        """
+        Exporte les données de référence, valide le fichier nettoyé puis génère le fichier d'importation.
 
-    def transition(self, file, extract):
+        :param rename: Correspondances colonne du fichier chargé -> champ du mouvement (voir
+                       source_columns), pour nommer les colonnes du rapport de validation.
+        """
+        progress = progress or (lambda stage, value: None)
 
+        progress('export', 0)
         file_configs = self.get_congif(file, extract)
-        for file in file_configs:
-            comparisons = file.get("comparaison", [])
-            for comparison in comparisons:
-                print(f"{comparison['resultat']} \n {extract}")
-                verif = self.verif_data_presence(file["file"], comparison["colonne2"], comparison['file'], comparison['colonne1'])
-                if verif['Type'] != 'Succes':
-                    break
-            
+        if file_configs['Type'] == 'Error':
+            return file_configs
+        file_configs = file_configs['Response']
+        progress('export', 100)
+
+        datasets = self.declare_datasets(file_configs, self.get_fiedls_odoo(extract)['Column'])
+        verif = self.validate_import(file_configs, extract, datasets, progress, rename)
         
         if verif['Type'] == 'Succes':
             upload_folder = current_app.config['UPLOAD_FOLDER']
@@ -404,14 +482,7 @@ class FileConfigController:
             path_name = file_manager.generate_unique_filename('Import_du')
             os.makedirs(os.path.join(download_folder, path_name), exist_ok=True)
 
-            if extract == 'Fni':
-                move = 'Fournisseur'
-            elif extract == 'Clt':
-                move = 'Client'
-            elif extract == 'PETROCI':
-                move = 'Petroci'
-            else:
-                move = 'Autres'
+            move = self.move_label(extract)
 
             file_mane = file_manager.generate_unique_filename('Import','csv', extract=move)
             result = f"{path_name}/{file_mane}"
@@ -424,88 +495,74 @@ class FileConfigController:
             print(output_path)
             print(result)
             
-            procees = self.process_import_files(file_configs, output_path, column_order, entete, column_mapping, file_mane, move)
+            progress('traitement', 0)
+            procees = self.process_import_files(file_configs, output_path, column_order, entete, column_mapping, file_mane, move, datasets)
+            if procees['Type'] == 'Succes':
+                # Variantes compressées produites une fois, servies ensuite à chaque téléchargement
+                file_manager.precompress(output_path)
+                progress('traitement', 100)
             return procees
         elif verif['Type'] != 'Succes':
             return tool.response_function(0, verif['Message'], verif['Response'])
 
-    def process_import_files(self, file_configs, output_path, column_order, entete, column_mapping, filename, move):
+    def validate_import(self, file_configs, extract, datasets, progress=None, rename=None):
+        """
+        Vérifie en un seul passage toutes les règles du fichier importé (voir ValidationController) :
+        valeurs vides, partenaires, produits et comptes analytiques absents d'Odoo, dates invalides.
+        En cas d'erreur, la réponse contient le chemin du rapport des erreurs (ligne, colonne, règle),
+        avec les noms de colonnes du fichier chargé si les correspondances `rename` sont fournies.
+        """
+        date_columns = [col for col in ["Date"] if col in self.get_fiedls_odoo(extract)['Column']]
+        return validation.validate(file_configs, self.move_label(extract), datasets, date_columns, progress, rename)
+
+    def move_label(self, extract):
+        """Libellé du mouvement utilisé dans le nom du fichier d'import."""
+        if extract == 'Fni':
+            return 'Fournisseur'
+        elif extract == 'Clt':
+            return 'Client'
+        elif extract == 'PETROCI':
+            return 'Petroci'
+        return 'Autres'
+
+    def process_import_files(self, file_configs, output_path, column_order, entete, column_mapping, filename, move, datasets=None):
         """
         Traite un ou plusieurs fichiers Excel ou CSV, applique les transformations nécessaires,
         et exporte les résultats dans un seul fichier CSV.
+        Les fichiers déjà chargés lors de la validation sont repris depuis le registre `datasets`.
+        Si IMPORT_PARALLEL_WORKERS est supérieur à 1, les fichiers sont répartis entre plusieurs
+        processus (voir process_import_files_parallel) ; sinon, si IMPORT_CHUNK_SIZE est défini,
+        ils sont traités par blocs (voir process_import_files_chunked).
         """
+        datasets = datasets or self.declare_datasets(file_configs, column_order)
+        plan = self.compile_transform_plan(column_order, entete, column_mapping)
+        workers = current_app.config.get('IMPORT_PARALLEL_WORKERS', 0)
+        if workers > 1:
+            return self.process_import_files_parallel(file_configs, output_path, plan, filename, move, datasets, workers)
+        chunk_size = current_app.config.get('IMPORT_CHUNK_SIZE', 0)
+        if chunk_size:
+            return self.process_import_files_chunked(file_configs, output_path, plan, filename, move, datasets, chunk_size)
+
         all_dataframes = []  # Liste pour stocker tous les DataFrames à concaténer
 
         for config in file_configs:
             try:
                 file_path = config["file"]
-                comparisons = config.get("comparaison", [])
                 
-                # Charger le fichier principal
-                if file_path.endswith('.csv'):
-                    df = pd.read_csv(file_path)
-                elif file_path.endswith('.xlsx'):
-                    df = pd.read_excel(file_path)
+                # Charger le fichier principal (retiré du registre : il est transformé en place)
+                if file_path.endswith(SUPPORTED_EXTENSIONS):
+                    df = datasets.pop(file_path)
                 else:
                     return tool.response_function(0, "Format de fichier non pris en charge", file_path)
 
                 print(f"Traitement du fichier : {file_path}")
 
-                # Comparaisons multiples
-                for comparison in comparisons:
-                    comparison_file = comparison.get("file")
-                    print(f'{comparison_file} type {type(comparison_file)}')
-                    column1 = comparison.get("colonne1")
-                    column2 = comparison.get("colonne2")
-                    column3 = comparison.get("colonne3")
-                    result_column = comparison.get("resultat")
-
-                    if comparison_file:
-                        if comparison_file.endswith('.csv'):
-                            additional_data = pd.read_csv(comparison_file, sep=';')
-                        elif comparison_file.endswith('.xlsx'):
-                            additional_data = pd.read_excel(comparison_file)
-                        else:
-                            print(f"Fichier de comparaison non pris en charge : {comparison_file}")
-                            return tool.response_function(0, "Format de fichier non pris en charge", comparison_file)
-                        
-                        empty_rows = self.find_empty_values(df, column2)
-                        
-                        if not empty_rows.empty:
-                            print(f"Lignes avec des valeurs vides dans la colonne '{column2}':\n{empty_rows}")
-                            return tool.response_function(0, f"La colonne '{column2}' contient des lignes vides. Veuillez corriger ces lignes avant de continuer.", empty_rows.to_dict(orient="records"))
-                        df, missing_elements = self.add_comparison_results(df, additional_data, column2, column1, column3, result_column)
-                        if len(missing_elements) > 0:
-                            return tool.response_function(0, "Les Produits suivants n'ont pas été trouvés, veuillez les mettre à jour dans Odoo", missing_elements)
-                        
-                if move == 'Client' or move == 'Petroci':
-                    df = self.analytic_account(df)
-                    if df.get('Type') == 'Error':
-                        return tool.response_function(0, df['Message'], df['Response'])
-                    df = df['Response']
-
-
-                # Réorganiser les colonnes selon l'ordre souhaité
-                df = self.order_columns(df, column_order)
-                print(f"Colonnes réorganisées : {df.columns.tolist()}")
-
-                # Marquer les doublons
-                df = self.mark_duplicates(df, column_name="Référence", duplicate_col_name="Doublon")
-                print(f"Doublons marqués : {df['Doublon'].value_counts()}")
-
-                # Supprimer les données dans les colonnes spécifiées si "Doublon" est "OUI"
-                df = self.delete_data_based_on_column(df, check_column="Doublon", target_value="OUI", columns_to_clear=entete)
-                print(f"Données supprimées dans les colonnes : {entete}")
-
-                df = self.drop_columns(df, ["Doublon"])
-                print(f"Colonnes après suppression : {df.columns.tolist()}")
-
-                # Renommer les colonnes selon le mappage fourni
-                df = self.rename_columns(df, column_mapping)
-                print(f"Colonnes renommées : {df.columns.tolist()}")
+                df = self.transform_frame(df, config, datasets, plan, move)
+                if df['Type'] == 'Error':
+                    return df
 
                 # Ajouter le DataFrame traité à la liste
-                all_dataframes.append(df)
+                all_dataframes.append(df['Response'])
 
                 print(f"Fichier traité avec succès : {file_path}")
 
@@ -523,18 +580,242 @@ class FileConfigController:
             print("Aucune donnée valide n'a été trouvée.")
             return tool.response_function(0 ,"Aucune donnée valide n'a été trouvée.", 0)
 
+    def process_import_files_chunked(self, file_configs, output_path, plan, filename, move, datasets, chunk_size):
+        """
+        Variante de process_import_files qui lit chaque fichier par blocs de chunk_size lignes,
+        leur applique les mêmes étapes et les ajoute au fichier CSV de sortie au fur et à mesure :
+        la mémoire utilisée dépend de la taille des blocs et non de celle du fichier.
+        Les références déjà rencontrées sont conservées d'un bloc à l'autre pour marquer les doublons.
+        Le fichier est écrit sous un nom temporaire, supprimé en cas d'erreur.
+        """
+        tmp_path = f"{output_path}.part"
+        header = None
+        file_path = None
+
+        try:
+            with open(tmp_path, 'w', newline='', encoding='utf-8-sig') as output:
+                for config in file_configs:
+                    file_path = config["file"]
+                    if not file_path.endswith(SUPPORTED_EXTENSIONS):
+                        return tool.response_function(0, "Format de fichier non pris en charge", file_path)
+
+                    print(f"Traitement du fichier par blocs de {chunk_size} lignes : {file_path}")
+                    seen = set()
+                    for number, df in enumerate(datasets.iter_chunks(file_path, chunk_size)):
+                        df = self.transform_frame(df, config, datasets, plan, move, seen)
+                        if df['Type'] == 'Error':
+                            return df
+                        df = df['Response']
+
+                        # Mêmes colonnes (et dans le même ordre) pour tous les blocs
+                        if header is None:
+                            header = df.columns.tolist()
+                            df.to_csv(output, index=False, sep=",")
+                        else:
+                            df.reindex(columns=header).to_csv(output, index=False, header=False, sep=",")
+                        print(f"Bloc {number + 1} traité : {len(df)} lignes")
+
+                    print(f"Fichier traité avec succès : {file_path}")
+
+            if header is None:
+                print("Aucune donnée valide n'a été trouvée.")
+                return tool.response_function(0 ,"Aucune donnée valide n'a été trouvée.", 0)
+
+            os.replace(tmp_path, output_path)
+            print(f"Traitement terminé avec succès : {output_path}")
+            return tool.response_function(1, "Traitement terminé avec succès", filename)
+
+        except Exception as e:
+            print(f"Erreur lors du traitement du fichier {file_path} : {e}")
+            return tool.response_function(0, f"Erreur lors du traitement du fichier {file_path}", e)
 
+        finally:
+            # Pas de fichier d'import partiel en cas d'erreur
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
 
+    def _pool(self, workers):
+        """
+        Retourne le pool de processus du mode multi-cœur, recréé si le nombre de processus a changé.
+        L'ancien pool termine les partitions déjà soumises (imports en cours) avant de s'arrêter.
+        """
+        global _process_pool, _process_pool_workers
+        with _process_pool_lock:
+            if _process_pool is not None and _process_pool_workers != workers:
+                _process_pool.shutdown(wait=False)
+                _process_pool = None
+            if _process_pool is None:
+                # 'spawn' : les processus ne doivent pas hériter des verrous des threads du serveur
+                _process_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+                _process_pool_workers = workers
+            return _process_pool
+
+    def partition_bounds(self, keys, partitions):
+        """
+        Découpe les lignes en au plus `partitions` intervalles [début, fin) de tailles voisines,
+        chaque limite étant repoussée au début de la référence suivante : une facture n'est
+        jamais répartie sur deux partitions.
+        """
+        values = keys.to_numpy()
+        total = len(values)
+        size = max(1, math.ceil(total / partitions))
+        bounds = [0]
+        for target in range(size, total, size):
+            start = max(target, bounds[-1] + 1)
+            while start < total and values[start] == values[start - 1]:
+                start += 1
+            if start < total:
+                bounds.append(start)
+        bounds.append(total)
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def process_import_files_parallel(self, file_configs, output_path, plan, filename, move, datasets, workers):
+        """
+        Variante multi-cœur de process_import_files. Les doublons de 'Référence' sont repérés sur
+        tout le fichier dans le processus principal ; les lignes sont ensuite découpées en partitions
+        alignées sur les références et transformées par IMPORT_PARALLEL_WORKERS processus.
+        Chaque partition est écrite dans un fichier temporaire, puis les partitions sont
+        réunies dans l'ordre du fichier d'origine.
+        """
+        min_rows = current_app.config.get('IMPORT_PARALLEL_MIN_ROWS', 50000)
+        pool = self._pool(workers)
+        parts = []
+        futures = []
+        header = None
 
+        try:
+            for config in file_configs:
+                file_path = config["file"]
+                if not file_path.endswith(SUPPORTED_EXTENSIONS):
+                    return tool.response_function(0, "Format de fichier non pris en charge", file_path)
 
+                df = datasets.pop(file_path)
+                duplicated = df[plan['key']].duplicated(keep="first").to_numpy()
+                # Petits fichiers : le coût de la transmission aux processus dépasserait le gain
+                bounds = self.partition_bounds(df[plan['key']], workers * 2) if len(df) >= min_rows else [(0, len(df))]
+                print(f"Traitement du fichier en {len(bounds)} partition(s) sur {workers} processus : {file_path}")
+
+                futures = []
+                for start, stop in bounds:
+                    part_path = f"{output_path}.part{len(parts)}"
+                    parts.append(part_path)
+                    futures.append(pool.submit(
+                        _transform_partition, df.iloc[start:stop], duplicated[start:stop], config, plan, move, part_path
+                    ))
+                del df
+
+                for future in futures:
+                    result = future.result()
+                    if result['Type'] == 'Error':
+                        return result
+                    if header is None:
+                        header = result['Response']
+                    elif result['Response'] != header:
+                        return tool.response_function(0, "Les fichiers traités n'ont pas les mêmes colonnes", result['Response'])
 
+                print(f"Fichier traité avec succès : {file_path}")
 
+            if header is None:
+                print("Aucune donnée valide n'a été trouvée.")
+                return tool.response_function(0 ,"Aucune donnée valide n'a été trouvée.", 0)
+
+            # Réunion des partitions dans l'ordre, sans relecture par pandas
+            tmp_path = f"{output_path}.tmp"
+            with open(tmp_path, 'w', newline='', encoding='utf-8-sig') as output:
+                pd.DataFrame(columns=header).to_csv(output, index=False, sep=",")
+            with open(tmp_path, 'ab') as output:
+                for part_path in parts:
+                    with open(part_path, 'rb') as part:
+                        while True:
+                            block = part.read(1024 * 1024)
+                            if not block:
+                                break
+                            output.write(block)
+            os.replace(tmp_path, output_path)
+            print(f"Traitement terminé avec succès : {output_path}")
+            return tool.response_function(1, "Traitement terminé avec succès", filename)
 
+        except Exception as e:
+            print(f"Erreur lors du traitement du fichier {file_path} : {e}")
+            return tool.response_function(0, f"Erreur lors du traitement du fichier {file_path}", e)
+
+        finally:
+            # Après une erreur, les partitions restantes sont annulées ou attendues avant le nettoyage
+            for future in futures:
+                future.cancel()
+            wait(futures)
+            # Fichiers temporaires supprimés, y compris après une erreur
+            for part_path in parts + [f"{output_path}.tmp"]:
+                if os.path.exists(part_path):
+                    os.remove(part_path)
+
+    def transform_frame(self, df, config, datasets, plan, move, seen=None, duplicated=None):
+        """
+        Applique à un DataFrame (fichier entier ou bloc) les correspondances avec les données
+        de référence, la distribution analytique puis le plan de transformation du mouvement
+        (voir compile_transform_plan).
+
+        :param seen: Références déjà rencontrées dans les blocs précédents (traitement par blocs).
+        :param duplicated: Masque des doublons calculé sur tout le fichier (mode multi-cœur).
+        """
+        # Comparaisons multiples
+        for comparison in config.get("comparaison", []):
+            comparison_file = comparison.get("file")
+            print(f'{comparison_file} type {type(comparison_file)}')
+            column1 = comparison.get("colonne1")
+            column2 = comparison.get("colonne2")
+            column3 = comparison.get("colonne3")
+            result_column = comparison.get("resultat")
+
+            if comparison_file:
+                if comparison_file.endswith(SUPPORTED_EXTENSIONS):
+                    additional_data = datasets.lookup(comparison_file, column1, column3, sep=';')
+                else:
+                    print(f"Fichier de comparaison non pris en charge : {comparison_file}")
+                    return tool.response_function(0, "Format de fichier non pris en charge", comparison_file)
+                
+                empty_rows = self.find_empty_values(df, column2)
+                
+                if not empty_rows.empty:
+                    print(f"Lignes avec des valeurs vides dans la colonne '{column2}':\n{empty_rows}")
+                    return tool.response_function(0, f"La colonne '{column2}' contient des lignes vides. Veuillez corriger ces lignes avant de continuer.", empty_rows.to_dict(orient="records"))
+                df, missing_elements = self.add_comparison_results(df, additional_data, column2, column1, column3, result_column)
+                if len(missing_elements) > 0:
+                    return tool.response_function(0, "Les Produits suivants n'ont pas été trouvés, veuillez les mettre à jour dans Odoo", missing_elements)
+                
+        if move == 'Client' or move == 'Petroci':
+            df = self.analytic_account(df, datasets, config.get("analytique"))
+            if df.get('Type') == 'Error':
+                return tool.response_function(0, df['Message'], df['Response'])
+            df = df['Response']
+
+
+        # Ordre des colonnes, dates, doublons et renommage en un seul passage
+        df = self.apply_transform_plan(df, plan, seen, duplicated)
+        print(f"Colonnes de l'import : {df.columns.tolist()}")
+
+        return tool.response_function(1, "Fichier transformé", df)
+
+
+
+
+
+
+
+
+
+    def source_columns(self, data, columns):
+        """
+        Retourne les correspondances colonne du fichier chargé -> champ du mouvement
+        indiquées dans les données du formulaire d'import.
+        """
+        return {data[column]: column for column in columns if column in data}
 
     def cleaning_data(self, data):
         """
         Nettoie et renomme les colonnes d'un fichier CSV/XLSX selon les noms dans 'Column'.
-        La sortie est toujours un fichier CSV.
+        Seules les colonnes associées à un champ du mouvement sont lues, en texte (sans inférence
+        de types). La sortie est un fichier Parquet (ou CSV si pyarrow n'est pas installé).
         """
         try:
             input_file = data['uploaded_file']
@@ -559,23 +840,33 @@ class FileConfigController:
             if not os.path.exists(input_file):
                 raise FileNotFoundError(f"Le fichier spécifié n'existe pas : {input_file}")
 
+            # Colonnes à renommer, spécifiées dans les données
+            rename = self.source_columns(data, columns_to_process)
+            if not rename:
+                raise ValueError("Aucune colonne à renommer n'a été spécifiée dans les données d'entrée.")
+
+            # Le fichier chargé est nommé d'après l'empreinte de son contenu : le fichier nettoyé
+            # l'est aussi d'après les paramètres du nettoyage, et il est réutilisé s'il existe déjà
+            # (un nouveau chargement du même contenu ne le rend pas obsolète)
+            datasets = DatasetController()
+            base_name, _ = os.path.splitext(input_file)
+            settings = json.dumps({'extract': data['extract'], 'sep': data.get('sep'), 'rename': rename}, sort_keys=True)
+            cleaned_name = f"{base_name}_{hashlib.sha256(settings.encode('utf-8')).hexdigest()[:12]}_cleaned"
+            output_file = datasets.intermediate_path(cleaned_name)
+            if os.path.exists(output_file):
+                print(f"Fichier nettoyé déjà disponible : {output_file}")
+                file_manager.touch(input_file, output_file)
+                return tool.response_function(1, f"Fichier nettoyé sauvegardé sous : {output_file}", output_file)
+
+            # Lecture des seules colonnes utiles, typées explicitement
             if input_file.endswith('.csv'):
-                df = pd.read_csv(input_file, sep=data['sep'])
+                encoding = file_probe.probe(input_file, data['sep'])['encoding']
+                df = datasets.read_csv(input_file, data['sep'], list(rename), encoding=encoding)
             elif input_file.endswith('.xlsx'):
-                df = pd.read_excel(input_file, engine='openpyxl')
+                df = datasets.load(input_file, columns=list(rename))
             else:
                 return tool.response_function(0, "Format de fichier non pris en charge", input_file)
 
-            # Boucle pour renommer les colonnes spécifiées
-            rename = {}
-            for column in columns_to_process:
-                if column in data:  # Vérifie si une nouvelle colonne est spécifiée dans les données
-                    rename[data[column]] = column
-             
-             
-            if not rename:
-                raise ValueError("Aucune colonne à renommer n'a été spécifiée dans les données d'entrée.")
-
             self.rename_columns(df, rename)
 
 
@@ -610,10 +901,8 @@ class FileConfigController:
 
 
 
-            # Déterminer le chemin de sortie pour le fichier CSV
-            base_name, _ = os.path.splitext(input_file)
-            output_file = f"{base_name}_cleaned.csv"
-            df.to_csv(output_file, index=False, encoding='utf-8')
+            # Enregistrer le fichier intermédiaire
+            output_file = datasets.write_intermediate(df, cleaned_name)
             print(f"Fichier nettoyé sauvegardé sous : {output_file}")
 
             return tool.response_function(1, f"Fichier nettoyé sauvegardé sous : {output_file}", output_file)
@@ -632,120 +921,58 @@ class FileConfigController:
 
 
 
-    def subdivide_csv_sheet(self, input_file, output_file_prefix, interval, required_columns):
+    def subdivide_csv_sheet(self, input_file, output_file_prefix, interval, required_columns, fmt='xlsx', max_bytes=None, keep_parts=False):
         """
-        Divise un fichier CSV en plusieurs sous-fichiers selon un intervalle de lignes.
+        Divise un fichier CSV en parties d'au plus `interval` lignes (et `max_bytes` octets),
+        sans couper une pièce, en un seul passage (voir SplitController), puis lance le téléchargement.
 
         :param input_file: Chemin du fichier CSV d'entrée.
         :param output_file_prefix: Préfixe pour les fichiers de sortie.
-        :param interval: Intervalle de lignes pour chaque sous-fichier.
-        :param required_columns: Colonnes requises pour vérifier les lignes vides.
+        :param interval: Nombre maximal de lignes par partie.
+        :param required_columns: Colonnes identifiant le début d'une pièce.
+        :param fmt: Format de sortie : 'xlsx' (une feuille par partie), 'zip' ou 'dir' (fichiers CSV).
+        :param max_bytes: Taille maximale d'une partie en octets.
+        :param keep_parts: Écrire aussi, dans le même passage, un fichier CSV par partie
+            (dossier <préfixe>_parts).
         """
         download_folder = current_app.config['DOWNLOAD_FOLDER']
-        # Charger le fichier CSV
-        with open(os.path.join(download_folder, input_file), mode='r', newline='', encoding='ISO-8859-1') as file:
-            reader = csv.reader(file, delimiter=',')
-            data = list(reader)
-
-        header = data[0]  # La première ligne est l'en-tête
-        required_column_indices = [header.index(col_name) for col_name in required_columns]
-
-        # Variables pour suivre les lignes et les fichiers
-        current_row = 1  # Commence après l'en-tête
-        file_counter = 1
-        output_files = []  # Liste pour stocker les fichiers créés
-
-        # Parcourir les lignes en blocs définis par l'intervalle
-        while current_row < len(data):
-            end_row = min(current_row + interval, len(data))
-
-            # Réduire l'intervalle tant que les cellules des colonnes définies sont vides
-            while end_row > current_row:
-                if all(data[end_row - 1][col_index] is not None and data[end_row - 1][col_index] != '' 
-                       for col_index in required_column_indices):
-                    end_row -= 1
-                    break
-                end_row -= 1
-
-            # Si end_row est inférieur à current_row, cela signifie qu'il n'a pas trouvé de ligne non vide
-            if end_row <= current_row:
-                end_row = current_row + interval
-
-            # Créer un nouveau fichier CSV pour chaque intervalle
-            output_file = f"{output_file_prefix}_{file_counter}.csv"
-            output_files.append(output_file)
-            with open(os.path.join(download_folder, output_file), mode='w', newline='', encoding='utf-8') as new_file:
-                writer = csv.writer(new_file, delimiter=',')
-
-                # Ajouter l'en-tête principal
-                writer.writerow(header)
-
-                # Copier les données de la plage sélectionnée
-                for row in data[current_row:end_row - 1]:
-                    writer.writerow(row)
-
-                # Copier la ligne de référence pour le prochain intervalle, si nécessaire
-                if end_row < len(data):
-                    next_row_data = data[end_row - 1]
-                    writer.writerow(next_row_data)
-
-            # Mettre à jour les compteurs pour le prochain intervalle
-            current_row = end_row
-            file_counter += 1
-        file_download = f"{output_file_prefix}_combined.xlsx"
-        # Appeler la fonction pour regrouper les fichiers en un fichier ZIP
-        self.combine_csv_files_to_excel(output_files, file_download)
-
+        file_download = f"{output_file_prefix}_parts" if fmt == 'dir' else f"{output_file_prefix}_combined.{fmt}"
+        outputs = {fmt: os.path.join(download_folder, file_download)}
+        if keep_parts and fmt != 'dir':
+            outputs['dir'] = os.path.join(download_folder, f"{output_file_prefix}_parts")
+        splitter.split(
+            os.path.join(download_folder, input_file), outputs,
+            max_rows=interval, max_bytes=max_bytes, key_columns=required_columns, force=True
+        )
+        if fmt == 'dir':
+            return redirect(url_for('main.browse_directory', path=file_download))
         return file_manager.download_file(file_download)
 
-    def for_import(self, input_file):
+    def for_import(self, input_file, fmt='xlsx', interval=DEFAULT_MAX_ROWS, max_bytes=None, required_columns=None, keep_parts=False):
         """
         Vérifie si le fichier contient plus de lignes que l'intervalle.
         - Si oui : subdivise le fichier CSV.
         - Sinon : lance le téléchargement du fichier.
+        Les lignes sont comptées sur les fins de ligne, sans analyser le CSV ; la subdivision
+        écrit ensuite les feuilles directement depuis une seule lecture du fichier.
 
         :param input_file: Le chemin du fichier CSV à traiter.
         """
         download_folder = current_app.config['DOWNLOAD_FOLDER']
         output_file = input_file.replace('.csv', '')  # Correction de "remplace" -> "replace"
-        interval = 5000
-        required_columns = ["partner_id/id"]
+        required_columns = required_columns or DEFAULT_KEY_COLUMNS
 
-        # Lire le fichier CSV pour compter les lignes
+        # Compter les lignes du fichier CSV
         try:
-            df = pd.read_csv(os.path.join(download_folder, input_file))
-            total_rows = len(df)
+            total_rows = splitter.count_rows(os.path.join(download_folder, input_file))
 
             # Vérifier si le nombre de lignes dépasse l'intervalle
-            if total_rows > interval:
-                print(f"Le fichier contient {total_rows} lignes, ce qui dépasse l'intervalle de {interval}.")
-                return self.subdivide_csv_sheet(input_file, output_file, interval, required_columns)
+            too_big = max_bytes and os.path.getsize(os.path.join(download_folder, input_file)) > max_bytes
+            if total_rows > interval or too_big:
+                print(f"Le fichier contient {total_rows} lignes, ce qui dépasse l'intervalle de {interval} (ou la taille maximale).")
+                return self.subdivide_csv_sheet(input_file, output_file, interval, required_columns, fmt, max_bytes, keep_parts)
             else:
                 print(f"Le fichier contient seulement {total_rows} lignes. Téléchargement en cours...")
                 return file_manager.download_file(input_file)
         except Exception as e:
             return f"Erreur lors de la lecture du fichier : {e}"
-
-    def combine_csv_files_to_excel(self, file_list, excel_filename):
-        """
-        Combine une liste de fichiers CSV dans un fichier Excel avec plusieurs feuilles.
-
-        :param file_list: Liste des fichiers CSV à regrouper.
-        :param excel_filename: Nom du fichier Excel de sortie.
-        """
-        download_folder = current_app.config['DOWNLOAD_FOLDER']
-        
-        print(f"Création du fichier Excel : {excel_filename}")
-        
-        # Créer un objet ExcelWriter pour écrire plusieurs feuilles
-        with pd.ExcelWriter(os.path.join(download_folder, excel_filename), engine='openpyxl') as writer:
-            for file in file_list:
-                file_path = os.path.join(download_folder, file)
-                # Lire le fichier CSV
-                df = pd.read_csv(file_path)
-                # Ajouter le DataFrame à une feuille Excel avec le nom du fichier CSV comme nom de la feuille
-                sheet_name = os.path.splitext(file)[0]  # Utilise le nom du fichier sans extension comme nom de feuille
-                df.to_excel(writer, sheet_name=sheet_name, index=False)
-                print(f"Ajout du fichier CSV dans la feuille Excel : {file}")
-
-        print(f"Le fichier Excel {excel_filename} est prêt pour le téléchargement.")
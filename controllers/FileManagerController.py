@@ -1,12 +1,45 @@
-import csv
+import gzip
+import hashlib
+import json
 import os
-from flask import current_app, send_from_directory
-from openpyxl import Workbook
+import shutil
+import uuid
+import threading
+from collections import OrderedDict
+from flask import current_app, redirect, request, send_file, url_for
+from werkzeug.security import safe_join
 from werkzeug.utils import secure_filename
 from datetime import datetime
-from controllers.ToolController import ToolController
+from controllers.ToolController import ToolController, KeyedLock
+from controllers.SpreadsheetController import SpreadsheetController
+from controllers.SplitController import SplitController, DEFAULT_MAX_ROWS, DEFAULT_KEY_COLUMNS
+
+# zstandard est facultatif : sans lui, seule la variante gzip des fichiers d'import est produite
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 tool = ToolController()
+spreadsheet = SpreadsheetController()
+splitter = SplitController()
+
+# Contenu des derniers dossiers listés, invalidé par la date de modification du dossier
+_listing_cache = OrderedDict()
+_listing_lock = threading.Lock()
+LISTING_CACHE_SIZE = 64
+LISTING_SORTS = {'name': 'name', 'size': 'size', 'last_modified': 'mtime'}
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Variantes précompressées des fichiers téléchargeables (Content-Encoding, extension),
+# par ordre de préférence lorsque le client accepte plusieurs encodages
+DOWNLOAD_ENCODINGS = [('zstd', '.zst'), ('gzip', '.gz')]
+
+# Découpages mémorisés : métadonnées <fichier CSV>.split.json (taille et date du CSV,
+# paramètres et sortie de chaque format) et une construction à la fois par fichier
+SPLIT_META_SUFFIX = '.split.json'
+_split_locks = KeyedLock()
 
 class FileManagerController:
 
@@ -26,9 +59,49 @@ class FileManagerController:
         
         return secure_filename(filename)
 
-    def list_files(self, path=""):
+    def scan_directory(self, full_path):
+        """
+        Retourne les entrées d'un dossier (nom, type, taille, date de modification) lues avec
+        os.scandir. Le résultat est mis en cache et réutilisé tant que la date de modification
+        du dossier (ajout, suppression ou renommage d'une entrée) ne change pas.
+        """
+        directory_mtime = os.stat(full_path).st_mtime_ns
+        with _listing_lock:
+            cached = _listing_cache.get(full_path)
+            if cached and cached[0] == directory_mtime:
+                _listing_cache.move_to_end(full_path)
+                return cached[1]
+
+        entries = []
+        with os.scandir(full_path) as iterator:
+            for entry in iterator:
+                try:
+                    is_dir = entry.is_dir()
+                    if not is_dir and not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                except OSError:
+                    # Entrée supprimée pendant le parcours
+                    continue
+                entries.append({
+                    'name': entry.name,
+                    'is_dir': is_dir,
+                    'size': 0 if is_dir else stat.st_size,
+                    'mtime': stat.st_mtime,
+                })
+
+        with _listing_lock:
+            _listing_cache[full_path] = (directory_mtime, entries)
+            _listing_cache.move_to_end(full_path)
+            while len(_listing_cache) > LISTING_CACHE_SIZE:
+                _listing_cache.popitem(last=False)
+        return entries
+
+    def list_files(self, path="", page=1, per_page=20, sort='last_modified', order='desc', search=''):
         """
-        Liste les fichiers et répertoires dans le dossier de téléchargement.
+        Liste les fichiers et répertoires dans le dossier de téléchargement, page par page.
+        Les répertoires sont listés avant les fichiers ; le tri (name, size, last_modified),
+        la recherche sur le nom et la pagination sont faits côté serveur.
         """
         try:
             download_folder = current_app.config['DOWNLOAD_FOLDER']
@@ -37,27 +110,53 @@ class FileManagerController:
             if not full_path.startswith(download_folder) or not os.path.exists(full_path):
                 return {"error": f"Path {path} not found."}, 404
 
-            items = os.listdir(full_path)
+            entries = self.scan_directory(full_path)
+            # Les variantes précompressées et métadonnées de découpage d'un fichier d'import ne sont pas listées
+            names = {entry['name'] for entry in entries}
+            entries = [entry for entry in entries if entry['is_dir'] or not self.is_derived(entry['name'], names)]
+            if search:
+                search = search.lower()
+                entries = [entry for entry in entries if search in entry['name'].lower()]
+
+            sort = sort if sort in LISTING_SORTS else 'last_modified'
+            order = 'asc' if order == 'asc' else 'desc'
+            entries = sorted(entries, key=lambda entry: (entry[LISTING_SORTS[sort]], entry['name']), reverse=order == 'desc')
+            # Répertoires en premier, quel que soit l'ordre du tri (tri stable)
+            entries.sort(key=lambda entry: not entry['is_dir'])
+
+            per_page = max(1, min(per_page, 500))
+            total = len(entries)
+            pages = max(1, (total + per_page - 1) // per_page)
+            page = max(1, min(page, pages))
+            start = (page - 1) * per_page
+
             files = []
             directories = []
-
-            for item in items:
-                item_path = os.path.join(full_path, item)
-                if os.path.isdir(item_path):
-                    directories.append(item)
-                elif os.path.isfile(item_path):
-                    file_size = os.path.getsize(item_path)
-                    last_modified_time = os.path.getmtime(item_path)
-                    last_modified_date = datetime.fromtimestamp(last_modified_time).strftime('%Y-%m-%d %H:%M:%S')
-                    file_extension = os.path.splitext(item_path)[1]
+            for entry in entries[start:start + per_page]:
+                last_modified_date = datetime.fromtimestamp(entry['mtime']).strftime('%Y-%m-%d %H:%M:%S')
+                if entry['is_dir']:
+                    directories.append({'name': entry['name'], 'last_modified': last_modified_date})
+                else:
                     files.append({
-                        'name': item,
-                        'size': file_size,
+                        'name': entry['name'],
+                        'size': entry['size'],
                         'last_modified': last_modified_date,
-                        'extension': file_extension,
+                        'extension': os.path.splitext(entry['name'])[1],
                     })
 
-            return {"directories": directories, "files": files, "current_path": path}
+            return {
+                "directories": directories,
+                "files": files,
+                "current_path": path,
+                "offset": start,
+                "page": page,
+                "pages": pages,
+                "per_page": per_page,
+                "total": total,
+                "sort": sort,
+                "order": order,
+                "search": search,
+            }
         except Exception as e:
             print(f"Erreur lors de la liste des fichiers : {e}")
             return {"error": "Une erreur s'est produite lors de l'accès au chemin."}, 500
@@ -65,6 +164,9 @@ class FileManagerController:
     def upload_file(self, file):
         """
         Gère le téléchargement de fichiers.
+        Le fichier est écrit par blocs pendant le calcul de son empreinte SHA-256 et enregistré sous
+        le nom <empreinte><extension> : un fichier déjà chargé n'est pas recopié, et les résultats
+        déjà calculés pour ce contenu (copie convertie, entêtes, fichier nettoyé) sont réutilisés.
         """
         try:
             if not file or file.filename == '':
@@ -77,30 +179,129 @@ class FileManagerController:
             if file_extension.lower() not in ['.csv', '.xlsx']:
                 return tool.response_function(0, "Seuls les fichiers .csv et .xlsx sont autorisés.", 401)
 
-            # Générer un nom unique et sauvegarder
-            filename = self.generate_unique_filename(file_name, file_extension)
-            save_path = os.path.join(upload_folder, filename)
+            # Écriture en flux dans un fichier temporaire, avec calcul de l'empreinte du contenu
+            tmp_path = os.path.join(upload_folder, f".upload_{uuid.uuid4().hex}.tmp")
+            digest = hashlib.sha256()
+            try:
+                with open(tmp_path, 'wb') as destination:
+                    while True:
+                        chunk = file.stream.read(UPLOAD_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        digest.update(chunk)
+                        destination.write(chunk)
 
-            file.save(save_path)
+                save_path = os.path.join(upload_folder, f"{digest.hexdigest()}{file_extension.lower()}")
+                if os.path.exists(save_path):
+                    print(f"Fichier déjà chargé, copie existante réutilisée : {save_path}")
+                    self.touch(save_path)
+                    return tool.response_function(1, "Fichier déjà chargé.", save_path)
+                os.replace(tmp_path, save_path)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+            # Conversion unique du classeur, en arrière-plan pour ne pas retarder la lecture des entêtes :
+            # les étapes suivantes relisent la copie convertie
+            if file_extension.lower() == '.xlsx':
+                spreadsheet.convert_in_background(save_path)
             return tool.response_function(1, "Fichier téléchargé avec succès.", save_path)
         except Exception as e:
             print(f"Erreur lors de l'upload du fichier : {e}")
             return tool.response_function(0, str(e), 500)
 
+    def touch(self, path, *derived):
+        """
+        Marque un fichier chargé comme utilisé à l'instant, pour la rétention (âge calculé sur la
+        date de modification), ainsi que sa copie convertie (<nom>_xlsx.*) et les fichiers dérivés
+        indiqués (fichier nettoyé) : leurs noms sont connus, le dossier n'est pas parcouru.
+        Les fichiers dérivés sont marqués après le fichier chargé : ils restent à jour.
+        """
+        os.utime(path)
+        candidates = spreadsheet.converted_candidates(path) if path.endswith('.xlsx') else []
+        for candidate in candidates + list(derived):
+            try:
+                os.utime(candidate)
+            except OSError:
+                # Copie absente, ou supprimée entre-temps
+                pass
+
+    def is_derived(self, name, names):
+        """
+        Indique si name est un fichier dérivé d'un fichier présent dans names : variante
+        précompressée (.gz, .zst) ou métadonnées de découpage (.split.json).
+        """
+        suffixes = [extension for _, extension in DOWNLOAD_ENCODINGS] + [SPLIT_META_SUFFIX]
+        return any(name.endswith(suffix) and name[:-len(suffix)] in names for suffix in suffixes)
+
+    def precompress(self, path):
+        """
+        Produit une seule fois, à l'écriture d'un fichier d'import, ses variantes compressées
+        (gzip, et zstd si zstandard est installé) servies par download_file aux clients qui les acceptent.
+        Chaque variante est écrite dans un fichier temporaire puis renommée.
+        """
+        variants = []
+        for encoding, extension in DOWNLOAD_ENCODINGS:
+            if encoding == 'zstd' and zstandard is None:
+                continue
+            target = f"{path}{extension}"
+            tmp_path = f"{target}.tmp"
+            try:
+                with open(path, 'rb') as source:
+                    if encoding == 'zstd':
+                        with open(tmp_path, 'wb') as destination:
+                            zstandard.ZstdCompressor(level=10, threads=-1).copy_stream(source, destination)
+                    else:
+                        with gzip.open(tmp_path, 'wb', compresslevel=6) as destination:
+                            shutil.copyfileobj(source, destination, UPLOAD_CHUNK_SIZE)
+                os.replace(tmp_path, target)
+                variants.append(target)
+            except OSError as e:
+                print(f"Erreur lors de la compression de {path} : {e}")
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+        return variants
+
+    def compressed_variant(self, path):
+        """
+        Retourne (encodage, chemin) de la variante précompressée à jour préférée parmi celles
+        acceptées par le client (en-tête Accept-Encoding), sinon (None, path).
+        """
+        mtime = os.path.getmtime(path)
+        for encoding, extension in DOWNLOAD_ENCODINGS:
+            variant = f"{path}{extension}"
+            if request.accept_encodings[encoding] and os.path.isfile(variant) and os.path.getmtime(variant) >= mtime:
+                return encoding, variant
+        return None, path
+
     def download_file(self, filename):
         """
         Gère le téléchargement de fichiers.
+        La réponse est envoyée en flux et conditionnelle : ETag, If-None-Match et requêtes Range
+        (reprise d'un téléchargement interrompu). Si le client l'accepte, la variante précompressée
+        du fichier est envoyée avec l'en-tête Content-Encoding (la plage porte alors sur la variante).
         """
         try:
             download_folder = current_app.config['DOWNLOAD_FOLDER']
-            return send_from_directory(download_folder, filename, as_attachment=True)
+            path = safe_join(download_folder, filename)
+            if path is None or not os.path.isfile(path):
+                raise FileNotFoundError(filename)
+
+            encoding, variant = self.compressed_variant(path)
+            response = send_file(
+                variant, as_attachment=True, download_name=os.path.basename(path), conditional=True, etag=True
+            )
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+            response.vary.add('Accept-Encoding')
+            return response
         except Exception as e:
             print(f"Erreur lors du téléchargement du fichier : {e}")
             return {"error": "Le fichier n'existe pas ou une erreur s'est produite."}, 404
 
     def delete_file(self, filename):
         """
-        Gère la suppression de fichiers.
+        Gère la suppression de fichiers (et de leurs variantes précompressées et métadonnées de découpage).
         """
         try:
             filename = secure_filename(filename)
@@ -109,6 +310,9 @@ class FileManagerController:
 
             if os.path.exists(file_path):
                 os.remove(file_path)
+                for suffix in [extension for _, extension in DOWNLOAD_ENCODINGS] + [SPLIT_META_SUFFIX]:
+                    if os.path.exists(f"{file_path}{suffix}"):
+                        os.remove(f"{file_path}{suffix}")
                 return {"message": f"Fichier {filename} supprimé."}, 200
             return {"error": f"Fichier {filename} non trouvé."}, 404
         except Exception as e:
@@ -125,78 +329,83 @@ class FileManagerController:
         else:
             return tool.response_function(0, 'Fichier inexistant', 404)
         
-    def subdivide_csv_sheet(self, input_file, interval=5000, required_columns=["partner_id/id"]):
+    def cached_split(self, input_path, fmt, params):
+        """
+        Retourne le découpage mémorisé d'un fichier CSV pour un format, ou None s'il est absent
+        ou périmé (taille ou date du CSV, paramètres différents, sortie supprimée).
+        """
+        try:
+            with open(f"{input_path}{SPLIT_META_SUFFIX}", encoding='utf-8') as file:
+                meta = json.load(file).get(fmt) or {}
+            stat = os.stat(input_path)
+        except (OSError, ValueError, AttributeError):
+            return None
+        if meta.get('source') != [stat.st_size, stat.st_mtime_ns] or meta.get('params') != params:
+            return None
+        if meta.get('output') and not os.path.exists(os.path.join(os.path.dirname(input_path), meta['output'])):
+            return None
+        return meta
+
+    def remember_split(self, input_path, fmt, meta):
+        """Enregistre (écriture atomique) le découpage d'un format dans les métadonnées du CSV."""
+        meta_path = f"{input_path}{SPLIT_META_SUFFIX}"
+        try:
+            with open(meta_path, encoding='utf-8') as file:
+                formats = json.load(file)
+            if not isinstance(formats, dict) or 'source' in formats:
+                formats = {}
+        except (OSError, ValueError):
+            formats = {}
+        formats[fmt] = meta
+        with open(f"{meta_path}.tmp", 'w', encoding='utf-8') as file:
+            json.dump(formats, file)
+        os.replace(f"{meta_path}.tmp", meta_path)
+
+    def subdivide_csv_sheet(self, input_file, fmt='xlsx', max_rows=DEFAULT_MAX_ROWS, max_bytes=None, key_columns=None):
         """
-        Divise un fichier CSV en sous-intervalles et génère un fichier XLSX 
-        avec plusieurs feuilles représentant chaque sous-intervalle.
+        Divise un fichier CSV en parties importables séparément (voir SplitController), sans
+        couper une pièce, et lance le téléchargement du résultat : classeur multi-feuilles ('xlsx')
+        ou archive de CSV ('zip'). Le format 'dir' écrit un dossier de CSV, affiché dans l'explorateur.
+        Le résultat (ou le CSV servi tel quel s'il n'y a rien à diviser) est mémorisé par format,
+        selon la taille et la date du CSV et les paramètres du découpage : il n'est reconstruit que
+        si le CSV a changé. Les demandes simultanées pour un même fichier attendent une construction unique.
         """
         download_folder = current_app.config['DOWNLOAD_FOLDER']
-        file_output = input_file.replace('.csv', '.xlsx')
-        files = input_file
-        input_file = os.path.join(download_folder, input_file)
+        input_path = os.path.join(download_folder, input_file)
+        key_columns = list(key_columns or DEFAULT_KEY_COLUMNS)
+        params = {'max_rows': max_rows, 'max_bytes': max_bytes, 'key_columns': key_columns}
         try:
-            # Charger le fichier CSV
-            with open(input_file, mode='r', newline='', encoding='utf-8') as file:
-                reader = csv.reader(file)
-                data = list(reader)
-            
-            nombre_de_lignes_sans_entete = len(data) - 1
-
-            if nombre_de_lignes_sans_entete < interval:
-                return self.download_file(files)
-
-            header = data[0]  # La première ligne est l'en-tête
-            print(f"En-têtes détectées : {header}")
-            required_column_indices = [header.index(col_name) for col_name in required_columns]
-            
-            # Créer un nouveau fichier XLSX
-            workbook = Workbook()
-            del workbook["Sheet"]  # Supprimer la feuille par défaut
-
-            current_row = 1  # Commence après l'en-tête
-            sheet_counter = 1
-
-            # Parcourir les lignes en blocs définis par l'intervalle
-            while current_row < len(data):
-                end_row = min(current_row + interval, len(data))
-                
-                # Réduire l'intervalle tant que les cellules des colonnes définies sont vides
-                while end_row > current_row:
-                    if all(data[end_row - 1][col_index] is not None and data[end_row - 1][col_index].strip() != '' for col_index in required_column_indices):
-                        end_row -= 1
-                        break
-                    end_row -= 1
-
-                # Si end_row est inférieur à current_row, cela signifie qu'il n'a pas trouvé de ligne non vide
-                if end_row <= current_row:
-                    end_row = current_row + interval
-
-                # Ajouter une nouvelle feuille pour chaque intervalle
-                sheet_name = f"Part_{sheet_counter}"
-                worksheet = workbook.create_sheet(title=sheet_name)
-
-                # Ajouter l'en-tête principal
-                worksheet.append(header)
-
-                # Copier les données de la plage sélectionnée
-                for row in data[current_row:end_row-1]:
-                    worksheet.append(row)
-
-                # Copier la ligne de référence pour le prochain intervalle, si nécessaire
-                if end_row < len(data):
-                    next_row_data = data[end_row-1]
-                    worksheet.append(next_row_data)
-
-                # Mettre à jour les compteurs pour le prochain intervalle
-                current_row = end_row
-                sheet_counter += 1
-
-            output_file = input_file.replace('.csv', '.xlsx')       # Sauvegarder le fichier XLSX final
-            workbook.save(output_file)
-            print(f"Fichier généré : {output_file}")
-            print(file_output)
-            return self.download_file(file_output)
+            with _split_locks.hold(os.path.abspath(input_path)):
+                meta = self.cached_split(input_path, fmt, params)
+                if meta is None:
+                    # Date relevée avant la lecture : un CSV modifié pendant le découpage sera redécoupé
+                    stat = os.stat(input_path)
+                    output_path = splitter.output_path(input_path, fmt)
+                    parts = splitter.split(input_path, {fmt: output_path}, max_rows, max_bytes, key_columns)
+                    if parts <= 1 and os.path.exists(output_path):
+                        # Sortie d'un ancien contenu du CSV : périmée
+                        if os.path.isdir(output_path):
+                            shutil.rmtree(output_path)
+                        else:
+                            os.remove(output_path)
+                    meta = {
+                        'source': [stat.st_size, stat.st_mtime_ns],
+                        'params': params,
+                        'output': os.path.basename(output_path) if parts > 1 else None,
+                    }
+                    self.remember_split(input_path, fmt, meta)
+                else:
+                    print(f"Découpage à jour réutilisé : {input_path}")
+
+            if meta['output'] is None:
+                return self.download_file(input_file)
+            output_file = os.path.join(os.path.dirname(input_file), meta['output'])
+            if fmt == 'dir':
+                return redirect(url_for('main.browse_directory', path=output_file))
+            return self.download_file(output_file)
         except ValueError as e:
             print(f"Erreur de validation : {e}")
+            return {"error": str(e)}, 400
         except Exception as e:
             print(f"Une erreur est survenue : {e}")
+            return {"error": "Une erreur s'est produite lors du découpage du fichier."}, 500
@@ -0,0 +1,179 @@
+import codecs
+import csv
+import io
+import os
+import posixpath
+import re
+import threading
+import zipfile
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+
+# Résultats des sondages, par fichier (chemin, taille, date de modification)
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+CACHE_SIZE = 256
+
+SAMPLE_BYTES = 64 * 1024
+DELIMITERS = ',;\t|'
+REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+
+
+class FileProbeController:
+    """
+    Lecture rapide des métadonnées d'un fichier chargé (entêtes, séparateur, encodage).
+
+    Pour un classeur .xlsx, seule la première ligne de la première feuille est lue,
+    directement dans le XML de l'archive, avec les chaînes partagées strictement nécessaires.
+    Pour un CSV, l'encodage et le séparateur sont déduits d'un échantillon des premiers octets.
+    Le résultat est mis en cache par fichier : les vérifications suivantes sont instantanées.
+    """
+
+    def probe(self, path, separator=None):
+        """
+        Retourne {'columns': [...], 'sep': ..., 'encoding': ...} pour un fichier .csv ou .xlsx.
+        """
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns, separator)
+        with _cache_lock:
+            if key in _cache:
+                _cache.move_to_end(key)
+                return _cache[key]
+
+        if path.endswith('.xlsx'):
+            result = {'columns': self.xlsx_header(path), 'sep': None, 'encoding': None}
+        elif path.endswith('.csv'):
+            result = self.csv_header(path, separator)
+        else:
+            raise ValueError(f"Format non pris en charge : {path}")
+
+        with _cache_lock:
+            _cache[key] = result
+            while len(_cache) > CACHE_SIZE:
+                _cache.popitem(last=False)
+        return result
+
+    # --- CSV -----------------------------------------------------------------
+
+    def detect_encoding(self, sample):
+        if sample.startswith(codecs.BOM_UTF8):
+            return 'utf-8-sig'
+        # L'échantillon peut couper un caractère multi-octets en fin de lecture
+        for cut in range(4):
+            try:
+                sample[:len(sample) - cut].decode('utf-8')
+                return 'utf-8'
+            except UnicodeDecodeError as e:
+                if e.start < len(sample) - 4:
+                    break
+        return 'cp1252'
+
+    def detect_separator(self, text):
+        lines = [line for line in text.splitlines()[:20] if line.strip()]
+        try:
+            return csv.Sniffer().sniff('\n'.join(lines), delimiters=DELIMITERS).delimiter
+        except csv.Error:
+            # À défaut, le caractère le plus fréquent de la ligne d'entête
+            first_line = lines[0] if lines else ''
+            return max(DELIMITERS, key=first_line.count)
+
+    def csv_header(self, path, separator=None):
+        with open(path, 'rb') as file:
+            sample = file.read(SAMPLE_BYTES)
+
+        encoding = self.detect_encoding(sample)
+        text = sample.decode(encoding, errors='ignore')
+        separator = separator or self.detect_separator(text)
+        header = next(csv.reader(io.StringIO(text), delimiter=separator), [])
+        return {'columns': header, 'sep': separator, 'encoding': encoding}
+
+    # --- XLSX ----------------------------------------------------------------
+
+    def _local(self, tag):
+        return tag.rsplit('}', 1)[-1]
+
+    def _first_sheet_path(self, archive):
+        workbook = ET.fromstring(archive.read('xl/workbook.xml'))
+        sheet = next(element for element in workbook.iter() if self._local(element.tag) == 'sheet')
+        rel_id = sheet.get(f'{REL_NS}id') or next(value for name, value in sheet.attrib.items() if name.endswith('}id'))
+
+        rels = ET.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+        target = next(element.get('Target') for element in rels if element.get('Id') == rel_id)
+        if target.startswith('/'):
+            return target.lstrip('/')
+        return posixpath.normpath(posixpath.join('xl', target))
+
+    def _column_index(self, reference, default):
+        letters = re.match(r'[A-Z]+', reference or '')
+        if not letters:
+            return default
+        index = 0
+        for letter in letters.group():
+            index = index * 26 + ord(letter) - ord('A') + 1
+        return index - 1
+
+    def _text(self, element):
+        # Texte d'une chaîne (éventuellement enrichie), sans les annotations phonétiques
+        parts = []
+        for child in element:
+            name = self._local(child.tag)
+            if name == 't':
+                parts.append(child.text or '')
+            elif name == 'r':
+                parts.extend(t.text or '' for t in child if self._local(t.tag) == 't')
+        return ''.join(parts)
+
+    def _shared_strings(self, archive, indices):
+        """Lit les chaînes partagées jusqu'au plus grand indice utile, sans parcourir le reste du fichier."""
+        if not indices or 'xl/sharedStrings.xml' not in archive.namelist():
+            return {}
+        wanted = max(indices)
+        strings = {}
+        position = 0
+        with archive.open('xl/sharedStrings.xml') as file:
+            for event, element in ET.iterparse(file, events=('end',)):
+                if self._local(element.tag) != 'si':
+                    continue
+                if position in indices:
+                    strings[position] = self._text(element)
+                element.clear()
+                if position >= wanted:
+                    break
+                position += 1
+        return strings
+
+    def xlsx_header(self, path):
+        """Lit la première ligne de la première feuille d'un classeur."""
+        with zipfile.ZipFile(path) as archive:
+            cells = {}
+            with archive.open(self._first_sheet_path(archive)) as file:
+                for event, element in ET.iterparse(file, events=('end',)):
+                    name = self._local(element.tag)
+                    if name == 'c':
+                        index = self._column_index(element.get('r'), len(cells))
+                        cell_type = element.get('t')
+                        value = None
+                        for child in element:
+                            child_name = self._local(child.tag)
+                            if child_name == 'v':
+                                value = child.text
+                            elif child_name == 'is':
+                                value = self._text(child)
+                        if value not in (None, ''):
+                            cells[index] = (cell_type, value)
+                    elif name == 'row':
+                        break
+
+            strings = self._shared_strings(archive, {int(value) for cell_type, value in cells.values() if cell_type == 's'})
+
+        width = max(cells) + 1 if cells else 0
+        header = []
+        for index in range(width):
+            cell_type, value = cells.get(index, (None, None))
+            if cell_type == 's':
+                value = strings.get(int(value))
+            elif cell_type == 'b' and value is not None:
+                value = 'True' if value == '1' else 'False'
+            # Mêmes noms que pandas pour les colonnes sans en-tête
+            header.append(value if value not in (None, '') else f"Unnamed: {index}")
+        return header
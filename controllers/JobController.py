@@ -0,0 +1,243 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from flask import current_app
+from controllers.ToolController import ToolController
+
+tool = ToolController()
+
+# Pool de travailleurs partagé par l'application : il limite le nombre d'imports simultanés
+_executor = None
+_executor_lock = threading.Lock()
+_state_lock = threading.Lock()
+# Tâches exécutées par ce processus : identifiant -> dossier des tâches
+_active_jobs = {}
+_heartbeat = None
+
+# Identité du processus propriétaire des tâches qu'il exécute : plusieurs processus du serveur
+# (ou un processus redémarré avec le même pid) partagent le dossier des tâches
+_process_token = uuid.uuid4().hex
+
+# Battement des tâches en cours (en secondes) : une tâche d'un autre processus dont le
+# battement date de plus de HEARTBEAT_TIMEOUT secondes est considérée comme interrompue
+HEARTBEAT_INTERVAL = 30
+HEARTBEAT_TIMEOUT = 120
+
+
+class JobController:
+    """
+    File d'attente des imports exécutés en arrière-plan.
+
+    Chaque tâche est persistée dans un fichier JSON sous public/jobs, avec son statut,
+    la progression de chaque étape et le résultat final. Les tâches sont exécutées par un
+    pool local de IMPORT_MAX_WORKERS travailleurs ; les suivantes restent en attente.
+    Chaque tâche enregistre son processus propriétaire (hôte, pid, jeton) et un battement
+    mis à jour toutes les HEARTBEAT_INTERVAL secondes : une tâche non terminée n'est déclarée
+    interrompue que si son propriétaire a disparu.
+    """
+
+    STAGES = ['nettoyage', 'export', 'validation', 'traitement']
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(logging.INFO)
+
+    def jobs_folder(self):
+        folder = current_app.config['JOBS_FOLDER']
+        os.makedirs(folder, exist_ok=True)
+        return folder
+
+    def _executor(self):
+        global _executor
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=current_app.config.get('IMPORT_MAX_WORKERS', 2),
+                    thread_name_prefix='import'
+                )
+            return _executor
+
+    def _job_path(self, job_id, folder=None):
+        return os.path.join(folder or self.jobs_folder(), f"{job_id}.json")
+
+    def _write(self, job, folder=None):
+        path = self._job_path(job['id'], folder)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(job, file, ensure_ascii=False, default=str)
+        os.replace(tmp_path, path)
+
+    def _read(self, job_id, folder=None):
+        try:
+            with open(self._job_path(job_id, folder), encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def _update(self, job_id, folder, **changes):
+        with _state_lock:
+            job = self._read(job_id, folder)
+            if job is None:
+                return
+            job.update(changes)
+            job['updated_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            self._write(job, folder)
+
+    def _progress(self, job_id, folder):
+        """Retourne la fonction de rappel qui met à jour la progression d'une étape."""
+        def progress(stage, value):
+            with _state_lock:
+                job = self._read(job_id, folder)
+                if job is None:
+                    return
+                job['stage'] = stage
+                job['stages'][stage] = {
+                    'statut': 'terminé' if value >= 100 else 'en cours',
+                    'progression': round(min(value, 100), 1),
+                }
+                job['updated_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                self._write(job, folder)
+        return progress
+
+    def submit(self, kind, func, *args, files=()):
+        """
+        Enregistre une tâche et la confie au pool de travailleurs.
+
+        :param kind: Type de tâche (ex. 'import').
+        :param func: Fonction à exécuter ; elle reçoit un argument nommé `progress(stage, value)`
+                     et retourne une réponse au format de ToolController.response_function.
+        :param files: Fichiers chargés utilisés par la tâche (protégés de la rétention tant
+                      que la tâche n'est pas terminée, voir referenced_files).
+        :return: Réponse contenant l'identifiant de la tâche.
+        """
+        job_id = uuid.uuid4().hex
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        job = {
+            'id': job_id,
+            'kind': kind,
+            'status': 'en attente',
+            'stage': None,
+            'stages': {stage: {'statut': 'en attente', 'progression': 0} for stage in self.STAGES},
+            'result': None,
+            'files': [os.path.abspath(path) for path in files],
+            'owner': {'host': socket.gethostname(), 'pid': os.getpid(), 'token': _process_token},
+            'heartbeat': time.time(),
+            'created_at': now,
+            'updated_at': now,
+        }
+        folder = self.jobs_folder()
+        self._write(job, folder)
+
+        with _state_lock:
+            _active_jobs[job_id] = folder
+        self._start_heartbeat()
+        app = current_app._get_current_object()
+        self._executor().submit(self._run, app, job_id, folder, func, args)
+        return tool.response_function(1, "Tâche enregistrée", job_id)
+
+    def _run(self, app, job_id, folder, func, args):
+        try:
+            with app.app_context():
+                self._update(job_id, folder, status='en cours')
+                result = func(*args, progress=self._progress(job_id, folder))
+                status = 'terminé' if result.get('Type') == 'Succes' else 'erreur'
+                self._update(job_id, folder, status=status, result=result)
+        except Exception as e:
+            self.logger.exception(f"Erreur lors de l'exécution de la tâche {job_id}")
+            self._update(job_id, folder, status='erreur',
+                         result=tool.response_function(0, "Erreur imprévue", str(e)))
+        finally:
+            with _state_lock:
+                _active_jobs.pop(job_id, None)
+
+    def heartbeat(self):
+        """Met à jour le battement des tâches exécutées par ce processus."""
+        with _state_lock:
+            for job_id, folder in list(_active_jobs.items()):
+                job = self._read(job_id, folder)
+                if job is not None:
+                    job['heartbeat'] = time.time()
+                    self._write(job, folder)
+
+    def _start_heartbeat(self):
+        global _heartbeat
+        with _executor_lock:
+            if _heartbeat is None or not _heartbeat.is_alive():
+                _heartbeat = threading.Thread(target=self._beat, name='job-heartbeat', daemon=True)
+                _heartbeat.start()
+
+    def _beat(self):
+        while True:
+            time.sleep(HEARTBEAT_INTERVAL)
+            try:
+                self.heartbeat()
+            except Exception:
+                self.logger.exception("Mise à jour du battement des tâches impossible")
+
+    def _pid_alive(self, pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except OSError:
+            # Processus existant d'un autre utilisateur, ou vérification impossible
+            return True
+        return True
+
+    def owner_gone(self, job):
+        """
+        Indique si le processus propriétaire d'une tâche non terminée a disparu : tâche inconnue
+        de ce processus s'il en est le propriétaire, processus absent ou remplacé sur le même hôte,
+        ou battement trop ancien.
+        """
+        owner = job.get('owner') or {}
+        if owner.get('token') == _process_token:
+            return job['id'] not in _active_jobs
+        if owner.get('host') == socket.gethostname():
+            # Même pid avec un autre jeton : processus redémarré (pid 1 d'un conteneur, par exemple)
+            if owner.get('pid') == os.getpid() or not owner.get('pid') or not self._pid_alive(owner['pid']):
+                return True
+        return time.time() - job.get('heartbeat', 0) > HEARTBEAT_TIMEOUT
+
+    def referenced_files(self):
+        """
+        Retourne les fichiers chargés des tâches en attente ou en cours dont le propriétaire est
+        toujours actif, d'après les fichiers des tâches (valables aussi pour les tâches d'un autre
+        processus du serveur).
+        """
+        files = set()
+        folder = self.jobs_folder()
+        with os.scandir(folder) as iterator:
+            for entry in iterator:
+                if not entry.name.endswith('.json'):
+                    continue
+                job = self._read(entry.name[:-len('.json')], folder)
+                if job and job.get('status') in ('en attente', 'en cours') and not self.owner_gone(job):
+                    files.update(job.get('files', []))
+        return files
+
+    def get(self, job_id):
+        """Retourne l'état d'une tâche."""
+        if not job_id.isalnum():
+            return tool.response_function(0, "Identifiant de tâche invalide", job_id)
+
+        folder = self.jobs_folder()
+        with _state_lock:
+            job = self._read(job_id, folder)
+            if job is None:
+                return tool.response_function(0, "Tâche introuvable", job_id)
+
+            # Une tâche non terminée dont le processus propriétaire a disparu a été interrompue
+            # (redémarrage du serveur) ; celle d'un autre processus actif suit son cours
+            if job['status'] in ('en attente', 'en cours') and self.owner_gone(job):
+                job['status'] = 'interrompu'
+                job['result'] = tool.response_function(0, "La tâche a été interrompue", job_id)
+                self._write(job, folder)
+
+        return tool.response_function(1, "État de la tâche", job)
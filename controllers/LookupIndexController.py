@@ -0,0 +1,152 @@
+import os
+import shutil
+import numpy as np
+import pandas as pd
+
+
+class LookupIndex:
+    """
+    Table de correspondance triée : clés normalisées (sans espaces, en minuscules) et valeurs
+    associées, sous forme de tableaux numpy (éventuellement projetés en mémoire depuis le disque).
+    Les clés sont des chaînes UTF-8 de largeur fixe (codes courts), triées dans l'ordre des octets ;
+    les valeurs, de longueurs très variables (libellés), sont concaténées dans un seul tableau
+    d'octets UTF-8 avec leurs positions de début (offsets, une de plus que de valeurs).
+    Une recherche porte sur les valeurs distinctes de la série interrogée (recherche dichotomique).
+    """
+
+    def __init__(self, keys, offsets=None, data=None):
+        self.keys = keys
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _positions(self, uniques):
+        queries = np.array([str(value).encode('utf-8') for value in uniques], dtype=bytes)
+        if not len(self.keys) or not len(queries):
+            return np.zeros(len(queries), dtype=np.intp), np.zeros(len(queries), dtype=bool)
+        positions = np.searchsorted(self.keys, queries)
+        positions[positions == len(self.keys)] = 0
+        return positions, self.keys[positions] == queries
+
+    def value(self, position):
+        """Retourne la valeur associée à la clé de rang `position`."""
+        return bytes(self.data[self.offsets[position]:self.offsets[position + 1]]).decode('utf-8')
+
+    def contains(self, series):
+        """Retourne un masque booléen des valeurs (déjà normalisées) présentes dans l'index."""
+        codes, uniques = pd.factorize(series)
+        _, found = self._positions(uniques)
+        return pd.Series(np.append(found, False)[codes], index=series.index)
+
+    def map(self, series):
+        """Retourne la valeur associée à chaque élément (déjà normalisé) de la série, NaN si absent."""
+        codes, uniques = pd.factorize(series)
+        positions, found = self._positions(uniques)
+        # Le code -1 (valeur nulle) pointe sur le dernier élément : une valeur absente
+        matches = np.array([self.value(position) if hit else None for position, hit in zip(positions, found)] + [None],
+                           dtype=object)
+        return pd.Series(matches[codes], index=series.index, dtype=object)
+
+    def items(self):
+        return ((key.decode('utf-8'), self.value(position)) for position, key in enumerate(self.keys.tolist()))
+
+
+class LookupIndexController:
+    """
+    Index de correspondance persistants des instantanés de référence Odoo.
+
+    Pour chaque comparaison (ref -> id, old_default_code -> display_name, code -> id.id),
+    les clés normalisées sont triées et enregistrées avec leurs valeurs dans des fichiers .npy
+    placés dans le dossier <instantané>_index (<clé>.keys.npy, <clé>.<valeur>.offsets.npy et
+    <clé>.<valeur>.data.npy, voir LookupIndex). Ils sont construits une fois, à l'enregistrement
+    de l'instantané, puis ouverts en projection mémoire (mmap) : un import ne paie que la recherche.
+    """
+
+    def normalize(self, series):
+        """Même normalisation que les valeurs du fichier importé : texte sans espaces, en minuscules."""
+        return series.astype(str).str.strip().str.lower()
+
+    def from_frame(self, df, key_column, value_column=None):
+        """
+        Construit un index en mémoire à partir d'un DataFrame.
+        Pour une clé présente plusieurs fois, la dernière occurrence est conservée.
+        """
+        df = df[df[key_column].notna()]
+        keys = self.normalize(df[key_column]).str.encode('utf-8')
+        if value_column is None:
+            return LookupIndex(np.unique(np.asarray(keys, dtype=bytes)))
+
+        values = df[value_column].where(df[value_column].notna(), '').astype(str).str.strip()
+        table = pd.Series(values.to_numpy(), index=keys.to_numpy())
+        table = table[~table.index.duplicated(keep='last')].sort_index()
+        encoded = [value.encode('utf-8') for value in table.tolist()]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        data = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        return LookupIndex(np.asarray(table.index, dtype=bytes), offsets, data)
+
+    def index_folder(self, snapshot_path):
+        return f"{os.path.splitext(snapshot_path)[0]}_index"
+
+    def _paths(self, folder, key_column, value_column):
+        return (
+            os.path.join(folder, f"{key_column}.keys.npy"),
+            os.path.join(folder, f"{key_column}.{value_column}.offsets.npy"),
+            os.path.join(folder, f"{key_column}.{value_column}.data.npy"),
+        )
+
+    def build(self, snapshot_path, lookups, df=None):
+        """
+        Construit et enregistre les index d'un instantané.
+
+        :param snapshot_path: Chemin de l'instantané (CSV ';').
+        :param lookups: Liste de couples (colonne clé, colonne valeur).
+        :param df: Contenu de l'instantané s'il est déjà en mémoire (évite une relecture).
+        """
+        if df is None:
+            columns = {column for lookup in lookups for column in lookup}
+            df = pd.read_csv(snapshot_path, sep=';', dtype=str, encoding='utf-8-sig', usecols=lambda col: col.strip() in columns)
+            df.columns = df.columns.str.strip()
+
+        folder = self.index_folder(snapshot_path)
+        tmp_folder = f"{folder}.tmp"
+        shutil.rmtree(tmp_folder, ignore_errors=True)
+        os.makedirs(tmp_folder)
+        for key_column, value_column in lookups:
+            index = self.from_frame(df, key_column, value_column)
+            keys_path, offsets_path, data_path = self._paths(tmp_folder, key_column, value_column)
+            np.save(keys_path, index.keys)
+            np.save(offsets_path, index.offsets)
+            np.save(data_path, index.data)
+
+        # Remplacement du dossier complet : les lecteurs voient l'ancien ou le nouvel index
+        shutil.rmtree(folder, ignore_errors=True)
+        os.replace(tmp_folder, folder)
+        return folder
+
+    def load(self, snapshot_path, key_column, value_column=None):
+        """
+        Ouvre l'index d'un instantané en projection mémoire.
+        Retourne None si l'index n'existe pas ou est plus ancien que l'instantané.
+        """
+        keys_path, offsets_path, data_path = self._paths(self.index_folder(snapshot_path), key_column, value_column)
+        try:
+            if os.path.getmtime(keys_path) < os.path.getmtime(snapshot_path):
+                return None
+            keys = np.load(keys_path, mmap_mode='r')
+            if value_column is None:
+                offsets = data = None
+            else:
+                offsets = np.load(offsets_path, mmap_mode='r')
+                data = np.load(data_path, mmap_mode='r')
+        except (OSError, ValueError):
+            return None
+        # Index d'un format antérieur (clés UTF-32) : reconstruit à partir de l'instantané
+        if keys.dtype.kind != 'S':
+            return None
+        return LookupIndex(keys, offsets, data)
+
+    def remove(self, snapshot_path):
+        shutil.rmtree(self.index_folder(snapshot_path), ignore_errors=True)
@@ -0,0 +1,186 @@
+import ast
+import configparser
+import http.client
+import itertools
+import json
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from controllers.ToolController import ToolController
+
+tool = ToolController()
+
+# Connexions authentifiées partagées, une réserve par serveur/base/utilisateur
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class OdooRpcError(Exception):
+    """Erreur retournée par le serveur Odoo lors d'un appel JSON-RPC."""
+
+
+class OdooRpcController:
+    """
+    Export des données Odoo dans le processus, via JSON-RPC.
+
+    Les paramètres de connexion sont lus dans connection.conf (le même fichier que celui
+    utilisé par odoo_export_thread.py). L'authentification est faite une seule fois par
+    serveur et les connexions HTTP sont conservées dans une réserve pour être réutilisées
+    d'un export à l'autre. Les enregistrements sont exportés par lots avec `export_data`,
+    qui accepte les mêmes chemins de champs que l'export CSV (id, id.id, ref...).
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(logging.INFO)
+
+    def read_connection(self, conf_file):
+        """Lit les paramètres de connexion depuis le fichier connection.conf."""
+        config = configparser.ConfigParser()
+        if not config.read(conf_file, encoding='utf-8') or not config.has_section('Connection'):
+            raise ValueError(f"Fichier de connexion invalide : {conf_file}")
+
+        section = config['Connection']
+        protocol = section.get('protocol', 'jsonrpcs')
+        return {
+            'hostname': section.get('hostname'),
+            'port': section.getint('port', 443 if protocol == 'jsonrpcs' else 8069),
+            'secure': protocol == 'jsonrpcs',
+            'database': section.get('database'),
+            'login': section.get('login'),
+            'password': section.get('password'),
+        }
+
+    def _pool(self, params):
+        key = (params['hostname'], params['port'], params['secure'], params['database'], params['login'])
+        with _pools_lock:
+            if key not in _pools:
+                _pools[key] = {'uid': None, 'connections': queue.LifoQueue(), 'lock': threading.Lock()}
+            return _pools[key]
+
+    def _connect(self, params, timeout):
+        connection_class = http.client.HTTPSConnection if params['secure'] else http.client.HTTPConnection
+        return connection_class(params['hostname'], params['port'], timeout=timeout)
+
+    def _call(self, params, service, method, *args, timeout=300):
+        """Appelle une méthode JSON-RPC en réutilisant une connexion de la réserve."""
+        pool = self._pool(params)
+        payload = json.dumps({
+            'jsonrpc': '2.0',
+            'method': 'call',
+            'params': {'service': service, 'method': method, 'args': args},
+            'id': 1,
+        })
+
+        try:
+            connection = pool['connections'].get_nowait()
+            reused = True
+        except queue.Empty:
+            connection = self._connect(params, timeout)
+            reused = False
+
+        while True:
+            try:
+                connection.request('POST', '/jsonrpc', body=payload, headers={'Content-Type': 'application/json'})
+                response = connection.getresponse()
+                body = response.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                connection.close()
+                if not reused:
+                    raise
+                # Connexion de la réserve fermée par le serveur entre deux appels : une nouvelle
+                # tentative, sur une nouvelle connexion
+                connection = self._connect(params, timeout)
+                reused = False
+            except (http.client.HTTPException, OSError):
+                # Délai dépassé ou autre erreur : l'appel n'est pas renvoyé (il a pu être exécuté)
+                connection.close()
+                raise
+
+        pool['connections'].put(connection)
+
+        if response.status != 200:
+            raise OdooRpcError(f"Réponse HTTP {response.status} du serveur Odoo")
+        result = json.loads(body)
+        if result.get('error'):
+            error = result['error']
+            raise OdooRpcError(error.get('data', {}).get('message') or error.get('message'))
+        return result.get('result')
+
+    def login(self, params):
+        """Retourne l'identifiant de l'utilisateur, authentifié une seule fois par réserve."""
+        pool = self._pool(params)
+        with pool['lock']:
+            if pool['uid'] is None:
+                uid = self._call(params, 'common', 'login', params['database'], params['login'], params['password'])
+                if not uid:
+                    raise OdooRpcError("Authentification Odoo refusée")
+                pool['uid'] = uid
+            return pool['uid']
+
+    def execute_kw(self, params, modele, method, args, kwargs=None):
+        uid = self.login(params)
+        return self._call(
+            params, 'object', 'execute_kw',
+            params['database'], uid, params['password'], modele, method, args, kwargs or {}
+        )
+
+    def export_data(self, conf_file, modele, colonne, domain='[]', size=200, worker=2):
+        """
+        Exporte les enregistrements d'un modèle Odoo et les retourne en colonnes.
+
+        :param conf_file: Chemin du fichier connection.conf.
+        :param modele: Modèle Odoo (ex. 'res.partner').
+        :param colonne: Champs à exporter, séparés par des virgules.
+        :param domain: Domaine de recherche Odoo (chaîne).
+        :param size: Nombre d'enregistrements par lot (équivalent de --size).
+        :param worker: Nombre de lots exportés simultanément (équivalent de --worker).
+        :return: Réponse contenant {'columns': [...], 'data': {champ: [valeurs]}, 'stats': {...}},
+                 où stats donne le nombre de lignes et de lots, la durée totale et la latence moyenne d'un lot.
+        """
+        started = time.perf_counter()
+        try:
+            params = self.read_connection(conf_file)
+            fields = [field.strip() for field in colonne.split(',')]
+            domain = ast.literal_eval(domain) if isinstance(domain, str) else domain
+
+            ids = self.execute_kw(params, modele, 'search', [domain], {'order': 'id'})
+            batches = [ids[start:start + size] for start in range(0, len(ids), size)]
+
+            latencies = []
+
+            def export_batch(batch):
+                batch_started = time.perf_counter()
+                datas = self.execute_kw(params, modele, 'export_data', [batch, fields])['datas']
+                latencies.append(time.perf_counter() - batch_started)
+                return datas
+
+            with ThreadPoolExecutor(max_workers=max(1, worker)) as executor:
+                rows = list(itertools.chain.from_iterable(executor.map(export_batch, batches)))
+
+            data = {field: [row[index] for row in rows] for index, field in enumerate(fields)}
+            stats = {
+                'rows': len(rows),
+                'batches': len(batches),
+                'seconds': time.perf_counter() - started,
+                'batch_latency': sum(latencies) / len(latencies) if latencies else 0.0,
+            }
+            self.logger.info(f"{len(rows)} enregistrement(s) {modele} exportés en {len(batches)} lot(s)")
+            return tool.response_function(1, "Exportation terminée", {'columns': fields, 'data': data, 'stats': stats})
+        except (OdooRpcError, ValueError, SyntaxError, OSError, http.client.HTTPException) as e:
+            self.logger.error(f"Erreur lors de l'exportation de {modele} : {e}")
+            return tool.response_function(0, "Erreurs lors de l'exportation", str(e))
+
+    def to_dataframe(self, export):
+        """
+        Construit un DataFrame texte (comme une lecture CSV avec dtype=str) à partir du
+        résultat en colonnes de export_data ; les valeurs vides d'Odoo (False) deviennent nulles.
+        """
+        return pd.DataFrame({
+            field: [None if value is False or value is None else str(value) for value in export['data'][field]]
+            for field in export['columns']
+        }, columns=export['columns'], dtype=object)
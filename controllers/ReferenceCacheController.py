@@ -0,0 +1,258 @@
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+import pandas as pd
+from flask import current_app
+from controllers.AppController import AppController
+from controllers.OdooRpcController import OdooRpcController
+from controllers.ToolController import ToolController
+from controllers.LookupIndexController import LookupIndexController
+
+data_odoo = AppController()
+odoo_rpc = OdooRpcController()
+tool = ToolController()
+lookup_indexes = LookupIndexController()
+
+# Un verrou par entité pour éviter deux rafraîchissements simultanés du même instantané
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+class ReferenceCacheController:
+    """
+    Cache des données de référence Odoo (partenaires, articles, comptes analytiques).
+
+    Chaque entité est conservée dans un instantané CSV au nom stable, accompagné d'un fichier
+    de métadonnées. Tant que l'instantané a moins de REFERENCE_CACHE_TTL secondes, il est
+    réutilisé tel quel. Au-delà, seules les lignes modifiées depuis la dernière synchronisation
+    (write_date > last_sync) sont exportées et fusionnées. Un export complet est refait après
+    REFERENCE_CACHE_FULL_TTL secondes pour prendre en compte les suppressions.
+    Les index de correspondance de l'instantané (voir LookupIndexController) sont reconstruits
+    à chaque enregistrement.
+    """
+
+    ENTITIES = {
+        'res_partner': {
+            'model': 'res.partner',
+            'fields': 'id,ref,customer_rank,supplier_rank',
+            'lookups': [('ref', 'id')],
+        },
+        'product_template': {
+            'model': 'product.template',
+            'fields': 'id,display_name,old_default_code',
+            'lookups': [('old_default_code', 'display_name')],
+        },
+        'account_analytic_account': {
+            'model': 'account.analytic.account',
+            'fields': 'id.id,code',
+            'lookups': [('code', 'id.id')],
+        },
+    }
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(logging.INFO)
+
+    def cache_folder(self):
+        folder = os.path.join(current_app.config['CONFIG'], 'reference')
+        os.makedirs(folder, exist_ok=True)
+        return folder
+
+    def snapshot_path(self, entity):
+        return os.path.join(self.cache_folder(), f"{entity}.csv")
+
+    def meta_path(self, entity):
+        return os.path.join(self.cache_folder(), f"{entity}.json")
+
+    def read_meta(self, entity):
+        try:
+            with open(self.meta_path(entity), encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def write_meta(self, entity, meta):
+        tmp_path = f"{self.meta_path(entity)}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(meta, file)
+        os.replace(tmp_path, self.meta_path(entity))
+
+    def _lock(self, entity):
+        with _locks_guard:
+            return _locks.setdefault(entity, threading.Lock())
+
+    def _is_fresh(self, entity, meta, now):
+        return (
+            meta is not None
+            and os.path.exists(self.snapshot_path(entity))
+            and now - meta.get('refreshed_at', 0) < current_app.config.get('REFERENCE_CACHE_TTL', 900)
+        )
+
+    def get_snapshot(self, entity):
+        """
+        Retourne le chemin de l'instantané à jour d'une entité, en le rafraîchissant si nécessaire.
+        """
+        if entity not in self.ENTITIES:
+            return tool.response_function(0, "Entité de référence inconnue", entity)
+
+        if self._is_fresh(entity, self.read_meta(entity), time.time()):
+            return tool.response_function(1, "Instantané en cache", self.snapshot_path(entity))
+
+        with self._lock(entity):
+            # Un autre import a pu rafraîchir l'instantané pendant l'attente du verrou
+            meta = self.read_meta(entity)
+            now = time.time()
+            if self._is_fresh(entity, meta, now):
+                return tool.response_function(1, "Instantané en cache", self.snapshot_path(entity))
+
+            fields = self.ENTITIES[entity]['fields']
+            full_ttl = current_app.config.get('REFERENCE_CACHE_FULL_TTL', 86400)
+            full = (
+                meta is None
+                or not os.path.exists(self.snapshot_path(entity))
+                or meta.get('fields') != fields
+                or now - meta.get('full_sync_at', 0) >= full_ttl
+            )
+
+            result = self.refresh_full(entity, now) if full else self.refresh_incremental(entity, meta, now)
+            if result['Type'] == 'Error' and os.path.exists(self.snapshot_path(entity)):
+                # L'instantané précédent reste exploitable si Odoo ne répond pas
+                self.logger.warning(f"Rafraîchissement de {entity} impossible, instantané précédent conservé : {result.get('Message')}")
+                return tool.response_function(1, "Instantané précédent", self.snapshot_path(entity))
+            return result
+
+    def _sync_date(self):
+        # Les dates write_date d'Odoo sont exprimées en UTC
+        return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+    def _use_rpc(self):
+        return current_app.config.get('ODOO_EXPORT_BACKEND', 'rpc') == 'rpc'
+
+    def _export(self, entity, file, domain='[]'):
+        if os.path.exists(file):
+            os.remove(file)
+        entity_info = self.ENTITIES[entity]
+        return data_odoo.export_odoo_data(entity_info['model'], entity_info['fields'], file, domain)
+
+    def _fetch(self, entity, domain='[]'):
+        """
+        Exporte les enregistrements d'une entité correspondant au domaine et les retourne
+        dans un DataFrame texte : directement en mémoire avec l'export JSON-RPC, via un
+        fichier temporaire avec odoo_export_thread.py.
+        """
+        entity_info = self.ENTITIES[entity]
+        if self._use_rpc():
+            action = data_odoo.export_odoo_records(entity_info['model'], entity_info['fields'], domain)
+            if action['Type'] == 'Error':
+                return action
+            return tool.response_function(1, "Exportation terminée", odoo_rpc.to_dataframe(action['Response']))
+
+        tmp_file = os.path.join(self.cache_folder(), f"{entity}_delta.tmp.csv")
+        action = self._export(entity, tmp_file, domain)
+        if action['Type'] == 'Error':
+            return action
+        try:
+            if os.path.exists(tmp_file):
+                df = pd.read_csv(tmp_file, sep=';', dtype=str, encoding='utf-8-sig')
+            else:
+                df = pd.DataFrame(columns=entity_info['fields'].split(','), dtype=str)
+        finally:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+        return tool.response_function(1, "Exportation terminée", df)
+
+    def _write_snapshot(self, entity, df):
+        tmp_file = f"{self.snapshot_path(entity)}.tmp"
+        df.to_csv(tmp_file, index=False, sep=';', encoding='utf-8-sig')
+        os.replace(tmp_file, self.snapshot_path(entity))
+        self.build_indexes(entity, df)
+
+    def build_indexes(self, entity, df=None):
+        """Construit les index de correspondance de l'instantané (relu depuis le disque si df est absent)."""
+        try:
+            lookup_indexes.build(self.snapshot_path(entity), self.ENTITIES[entity]['lookups'], df)
+        except Exception:
+            # Sans index, les imports construisent la correspondance à partir de l'instantané
+            self.logger.exception(f"Construction des index de {entity} impossible")
+
+    def refresh_full(self, entity, now):
+        """Exporte intégralement l'entité et remplace l'instantané."""
+        sync_date = self._sync_date()
+
+        if self._use_rpc():
+            action = self._fetch(entity)
+            if action['Type'] == 'Error':
+                return tool.response_function(0, action['Message'], action['Response'])
+            self._write_snapshot(entity, action['Response'])
+        else:
+            # Le fichier exporté est déjà au format de l'instantané : pas de relecture
+            tmp_file = os.path.join(self.cache_folder(), f"{entity}_full.tmp.csv")
+            action = self._export(entity, tmp_file)
+            if action['Type'] == 'Error':
+                return tool.response_function(0, action['Message'], action['Response'])
+            os.replace(tmp_file, self.snapshot_path(entity))
+            self.build_indexes(entity)
+
+        self.write_meta(entity, {
+            'fields': self.ENTITIES[entity]['fields'],
+            'last_sync': sync_date,
+            'refreshed_at': now,
+            'full_sync_at': now,
+        })
+        self.logger.info(f"Instantané complet de {entity} créé")
+        return tool.response_function(1, "Instantané complet", self.snapshot_path(entity))
+
+    def refresh_incremental(self, entity, meta, now):
+        """Exporte uniquement les enregistrements modifiés depuis la dernière synchronisation et les fusionne."""
+        sync_date = self._sync_date()
+        domain = f"[('write_date', '>', '{meta['last_sync']}')]"
+
+        action = self._fetch(entity, domain)
+        if action['Type'] == 'Error':
+            return tool.response_function(0, action['Message'], action['Response'])
+
+        delta = action['Response']
+        try:
+            if not delta.empty:
+                key = self.ENTITIES[entity]['fields'].split(',')[0]
+                snapshot = pd.read_csv(self.snapshot_path(entity), sep=';', dtype=str, encoding='utf-8-sig')
+                merged = pd.concat([snapshot, delta], ignore_index=True)
+                merged.drop_duplicates(subset=[key], keep='last', inplace=True)
+                self._write_snapshot(entity, merged)
+            self.logger.info(f"{len(delta)} enregistrement(s) de {entity} mis à jour")
+        except Exception as e:
+            self.logger.exception(f"Fusion de l'instantané {entity} impossible")
+            return tool.response_function(0, "Erreur lors de la fusion de l'instantané", str(e))
+
+        meta.update({'last_sync': sync_date, 'refreshed_at': now})
+        self.write_meta(entity, meta)
+        return tool.response_function(1, "Instantané mis à jour", self.snapshot_path(entity))
+
+    def invalidate(self, entity=None, full=True):
+        """
+        Invalide le cache d'une entité (ou de toutes).
+        - full=True : l'instantané est supprimé, le prochain accès refait un export complet.
+        - full=False : l'instantané est marqué périmé, le prochain accès fait un export incrémental.
+        """
+        entities = [entity] if entity else list(self.ENTITIES)
+        unknown = [name for name in entities if name not in self.ENTITIES]
+        if unknown:
+            return tool.response_function(0, "Entité de référence inconnue", unknown)
+
+        for name in entities:
+            with self._lock(name):
+                if full:
+                    for path in (self.snapshot_path(name), self.meta_path(name)):
+                        if os.path.exists(path):
+                            os.remove(path)
+                    lookup_indexes.remove(self.snapshot_path(name))
+                else:
+                    meta = self.read_meta(name)
+                    if meta:
+                        meta['refreshed_at'] = 0
+                        self.write_meta(name, meta)
+
+        return tool.response_function(1, "Cache invalidé", entities)
@@ -0,0 +1,286 @@
+import gzip
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+from flask import current_app
+from controllers.JobController import JobController
+from controllers.ToolController import ToolController
+
+# fcntl (POSIX) : verrou de balayage partagé entre les processus du serveur.
+# Sans lui (Windows), seul le verrou du processus s'applique.
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+tool = ToolController()
+job_controller = JobController()
+
+# Politiques par défaut, par dossier de l'application (clé de configuration).
+# max_age_days : suppression au-delà de cet âge ; max_size_mb : taille totale maximale du dossier
+# (les entrées les plus anciennes sont supprimées d'abord) ; keep_last : nombre d'entrées récentes
+# toujours conservées ; compress_after_days : compression gzip des fichiers plus anciens (None : jamais).
+DEFAULT_POLICIES = {
+    # Les fichiers chargés et leurs dérivés (<empreinte>_xlsx.parquet, <empreinte>_<paramètres>_cleaned.parquet)
+    # sont relus sous leur nom exact (dédoublonnage, caches) : pas de compression
+    'UPLOAD_FOLDER': {'max_age_days': 30, 'max_size_mb': 2048, 'keep_last': 50, 'compress_after_days': None},
+    # Les fichiers d'import restent téléchargeables tels quels : pas de compression
+    'DOWNLOAD_FOLDER': {'max_age_days': 180, 'max_size_mb': 10240, 'keep_last': 100, 'compress_after_days': None},
+    'CONFIG': {'max_age_days': 7, 'max_size_mb': 1024, 'keep_last': 20, 'compress_after_days': 1},
+    'JOBS_FOLDER': {'max_age_days': 30, 'max_size_mb': 100, 'keep_last': 200, 'compress_after_days': None},
+}
+
+# Entrées jamais supprimées ni compressées : paramètres de connexion, statistiques d'export
+# et instantanés de référence en cours d'utilisation
+PROTECTED = {
+    'CONFIG': {'connection.conf', 'export_stats.json', 'reference', 'retention.lock'},
+}
+
+# Fichier verrou du balayage, dans le dossier CONFIG
+LOCK_FILE = 'retention.lock'
+
+# Les entrées modifiées récemment peuvent appartenir à un import en cours
+MIN_AGE_SECONDS = 3600
+
+_sweep_lock = threading.Lock()
+_sweeper = None
+_sweeper_lock = threading.Lock()
+_last_sweep = {}
+
+
+class RetentionController:
+    """
+    Rétention et compactage des dossiers de travail (public/uploads, public/downloads,
+    public/config, public/jobs).
+
+    Chaque entrée de premier niveau d'un dossier (fichier ou dossier Import_du_*) est soumise
+    à la politique du dossier (RETENTION_POLICIES, complétée par DEFAULT_POLICIES) : les plus
+    récentes sont conservées, les trop anciennes ou en excès de taille sont supprimées et les
+    fichiers anciens sont compressés en .gz. Un balayage est lancé en arrière-plan toutes les
+    RETENTION_INTERVAL secondes. Dans public/uploads, les fichiers chargés d'une tâche en attente
+    ou en cours (et leurs fichiers nettoyés) ne sont jamais supprimés ni compressés, quel que soit
+    leur âge.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self.logger.setLevel(logging.INFO)
+
+    def policies(self):
+        configured = current_app.config.get('RETENTION_POLICIES', {})
+        return {
+            key: dict(policy, **configured.get(key, {}))
+            for key, policy in DEFAULT_POLICIES.items()
+            if current_app.config.get(key)
+        }
+
+    def _size(self, path):
+        if not os.path.isdir(path):
+            return os.path.getsize(path)
+        total = 0
+        for root, _, files in os.walk(path):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return total
+
+    def scan(self, folder, protected=()):
+        """Retourne les entrées de premier niveau d'un dossier, des plus récentes aux plus anciennes."""
+        entries = []
+        with os.scandir(folder) as iterator:
+            for entry in iterator:
+                if entry.name in protected:
+                    continue
+                try:
+                    entries.append({
+                        'name': entry.name,
+                        'path': entry.path,
+                        'is_dir': entry.is_dir(),
+                        'size': self._size(entry.path),
+                        'mtime': entry.stat().st_mtime,
+                    })
+                except OSError:
+                    continue
+        return sorted(entries, key=lambda entry: entry['mtime'], reverse=True)
+
+    def _remove(self, entry):
+        if entry['is_dir']:
+            shutil.rmtree(entry['path'], ignore_errors=True)
+        else:
+            os.remove(entry['path'])
+
+    def _compress(self, entry):
+        """Compresse un fichier en .gz (écriture atomique, date de modification conservée)."""
+        target = f"{entry['path']}.gz"
+        with open(entry['path'], 'rb') as source, gzip.open(f"{target}.tmp", 'wb') as destination:
+            shutil.copyfileobj(source, destination, 1024 * 1024)
+        os.utime(f"{target}.tmp", (entry['mtime'], entry['mtime']))
+        os.replace(f"{target}.tmp", target)
+        os.remove(entry['path'])
+        return os.path.getsize(target)
+
+    def in_use(self, entry, referenced):
+        """
+        Indique si une entrée est un fichier chargé référencé par une tâche, ou un fichier
+        nettoyé qui en est dérivé (<nom du fichier chargé>_<empreinte>_cleaned.*).
+        """
+        path = os.path.abspath(entry['path'])
+        for file in referenced:
+            if path == file or path.startswith(f"{os.path.splitext(file)[0]}_"):
+                return True
+        return False
+
+    def sweep_folder(self, key, folder, policy, now=None, dry_run=False, referenced=()):
+        """
+        Applique la politique de rétention à un dossier.
+
+        :param referenced: Chemins absolus des fichiers utilisés par des tâches non terminées.
+        :return: Résumé des entrées supprimées et compressées et des octets libérés.
+        """
+        now = now or time.time()
+        entries = self.scan(folder, PROTECTED.get(key, ()))
+        removed, compressed, freed = [], [], 0
+        total = sum(entry['size'] for entry in entries)
+
+        max_age = policy.get('max_age_days')
+        max_size = policy.get('max_size_mb')
+        compress_after = policy.get('compress_after_days')
+        # Les entrées utilisées par une tâche comptent dans la taille du dossier mais ne sont jamais candidates
+        candidates = [
+            entry for entry in entries[policy.get('keep_last', 0):]
+            if now - entry['mtime'] >= MIN_AGE_SECONDS and not self.in_use(entry, referenced)
+        ]
+
+        # Des plus anciennes aux plus récentes : âge maximal puis taille totale maximale
+        for entry in reversed(candidates):
+            too_old = max_age is not None and now - entry['mtime'] > max_age * 86400
+            too_big = max_size is not None and total > max_size * 1024 * 1024
+            if not (too_old or too_big):
+                continue
+            try:
+                if not dry_run:
+                    self._remove(entry)
+            except OSError as e:
+                self.logger.warning(f"Suppression de {entry['path']} impossible : {e}")
+                continue
+            removed.append(entry['name'])
+            freed += entry['size']
+            total -= entry['size']
+            entry['removed'] = True
+
+        if compress_after is not None:
+            for entry in candidates:
+                if entry.get('removed') or entry['is_dir'] or entry['name'].endswith('.gz') \
+                        or now - entry['mtime'] <= compress_after * 86400:
+                    continue
+                try:
+                    size = entry['size'] if dry_run else self._compress(entry)
+                except OSError as e:
+                    self.logger.warning(f"Compression de {entry['path']} impossible : {e}")
+                    continue
+                compressed.append(entry['name'])
+                freed += entry['size'] - size
+
+        return {'supprimes': removed, 'compresses': compressed, 'octets_liberes': freed}
+
+    def _lock(self):
+        """
+        Verrouille le fichier LOCK_FILE (plusieurs processus du serveur, rechargement automatique).
+        Retourne le fichier ouvert, à fermer pour libérer le verrou, ou None s'il est déjà pris.
+        """
+        handle = open(os.path.join(current_app.config['CONFIG'], LOCK_FILE), 'a')
+        if fcntl is not None:
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                handle.close()
+                return None
+        return handle
+
+    def sweep(self, dry_run=False):
+        """Applique les politiques de rétention à tous les dossiers."""
+        if not _sweep_lock.acquire(blocking=False):
+            return tool.response_function(0, "Un balayage est déjà en cours", None)
+        handle = None
+        try:
+            handle = self._lock()
+            if handle is None:
+                return tool.response_function(0, "Un balayage est déjà en cours", None)
+            report = {}
+            for key, policy in self.policies().items():
+                folder = current_app.config[key]
+                if not os.path.isdir(folder):
+                    continue
+                # L'âge d'un fichier chargé ne dit pas s'il est encore utilisé par une tâche
+                referenced = job_controller.referenced_files() if key == 'UPLOAD_FOLDER' else ()
+                report[key] = self.sweep_folder(key, folder, policy, dry_run=dry_run, referenced=referenced)
+                if report[key]['supprimes'] or report[key]['compresses']:
+                    self.logger.info(
+                        f"Rétention {key} : {len(report[key]['supprimes'])} supprimé(s), "
+                        f"{len(report[key]['compresses'])} compressé(s), {report[key]['octets_liberes']} octets libérés"
+                    )
+            if not dry_run:
+                _last_sweep.update({'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'rapport': report})
+            return tool.response_function(1, "Balayage terminé", report)
+        finally:
+            if handle is not None:
+                handle.close()
+            _sweep_lock.release()
+
+    def stats(self):
+        """Occupation disque de chaque dossier suivi et résultat du dernier balayage."""
+        folders = {}
+        for key, policy in self.policies().items():
+            folder = current_app.config[key]
+            if not os.path.isdir(folder):
+                continue
+            entries = self.scan(folder)
+            folders[key] = {
+                'dossier': folder,
+                'entrees': len(entries),
+                'octets': sum(entry['size'] for entry in entries),
+                'octets_compresses': sum(entry['size'] for entry in entries if entry['name'].endswith('.gz')),
+                'plus_ancienne': datetime.fromtimestamp(entries[-1]['mtime']).strftime('%Y-%m-%d %H:%M:%S') if entries else None,
+                'politique': policy,
+            }
+        usage = shutil.disk_usage(current_app.config['UPLOAD_FOLDER'])
+        return tool.response_function(1, "Occupation disque", {
+            'dossiers': folders,
+            'disque': {'total': usage.total, 'utilise': usage.used, 'libre': usage.free},
+            'dernier_balayage': dict(_last_sweep) or None,
+        })
+
+    def start(self, app):
+        """
+        Prépare le balayage périodique en arrière-plan, lancé à la première requête servie
+        (une seule fois par processus) : avec le rechargement automatique (python app.py en
+        mode debug), create_app est aussi appelé dans le processus de surveillance, qui ne sert
+        aucune requête et ne doit pas balayer les dossiers.
+        """
+        interval = app.config.get('RETENTION_INTERVAL', 0)
+        if not interval:
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    with app.app_context():
+                        self.sweep()
+                except Exception:
+                    self.logger.exception("Erreur lors du balayage de rétention")
+
+        @app.before_request
+        def start_sweeper():
+            global _sweeper
+            if _sweeper is not None:
+                return
+            with _sweeper_lock:
+                if _sweeper is None:
+                    _sweeper = threading.Thread(target=run, name='retention', daemon=True)
+                    _sweeper.start()
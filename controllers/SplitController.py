@@ -0,0 +1,267 @@
+import csv
+import io
+import os
+import shutil
+import threading
+import zipfile
+from openpyxl import Workbook
+
+# Formats de sortie : classeur multi-feuilles, archive de CSV, dossier de CSV
+SPLIT_FORMATS = ('xlsx', 'zip', 'dir')
+
+DEFAULT_MAX_ROWS = 5000
+DEFAULT_KEY_COLUMNS = ["partner_id/id"]
+
+
+class _XlsxSink:
+    """Classeur en écriture seule : une feuille Part_N par partie."""
+
+    def __init__(self, path, stem):
+        self.path = path
+        self.tmp_path = f"{path}.{os.getpid()}.tmp"
+        self.workbook = Workbook(write_only=True)
+        self.sheet = None
+
+    def start(self, number, header):
+        self.sheet = self.workbook.create_sheet(title=f"Part_{number}")
+        self.sheet.append(header)
+
+    def write(self, rows):
+        for row in rows:
+            self.sheet.append(row)
+
+    def close(self):
+        self.workbook.save(self.tmp_path)
+        os.replace(self.tmp_path, self.path)
+
+    def discard(self):
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+class _ZipSink:
+    """Archive ZIP : un fichier <nom>_part_N.csv par partie, compressé au fil de l'écriture."""
+
+    def __init__(self, path, stem):
+        self.path = path
+        self.stem = stem
+        self.tmp_path = f"{path}.{os.getpid()}.tmp"
+        self.archive = zipfile.ZipFile(self.tmp_path, 'w', compression=zipfile.ZIP_DEFLATED)
+        self.member = None
+        self.writer = None
+
+    def _close_member(self):
+        if self.member is not None:
+            self.member.close()
+            self.member = None
+
+    def start(self, number, header):
+        self._close_member()
+        self.member = io.TextIOWrapper(
+            self.archive.open(f"{self.stem}_part_{number}.csv", 'w', force_zip64=True),
+            encoding='utf-8-sig', newline=''
+        )
+        self.writer = csv.writer(self.member)
+        self.writer.writerow(header)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self._close_member()
+        self.archive.close()
+        os.replace(self.tmp_path, self.path)
+
+    def discard(self):
+        self._close_member()
+        self.archive.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+class _DirSink:
+    """Dossier de fichiers <nom>_part_N.csv, remplacé en entier à la fin de l'écriture."""
+
+    def __init__(self, path, stem):
+        self.path = path
+        self.stem = stem
+        self.tmp_path = f"{path}.{os.getpid()}.tmp"
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+        os.makedirs(self.tmp_path)
+        self.file = None
+        self.writer = None
+
+    def _close_file(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def start(self, number, header):
+        self._close_file()
+        self.file = open(os.path.join(self.tmp_path, f"{self.stem}_part_{number}.csv"), 'w', newline='', encoding='utf-8-sig')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(header)
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self._close_file()
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.replace(self.tmp_path, self.path)
+
+    def discard(self):
+        self._close_file()
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+
+
+SINKS = {'xlsx': _XlsxSink, 'zip': _ZipSink, 'dir': _DirSink}
+
+
+class SplitController:
+    """
+    Découpage des fichiers d'import CSV en parties importables séparément dans Odoo.
+
+    Le fichier est lu une seule fois, en flux, et regroupé en pièces : une pièce commence à une
+    ligne dont les colonnes clés (partner_id/id par défaut) sont renseignées et comprend les lignes
+    suivantes sans clé. Les pièces sont ajoutées à la partie courante tant qu'elle ne dépasse pas
+    max_rows lignes ou max_bytes octets : une pièce n'est jamais coupée (une pièce plus grande que
+    la limite forme une partie à elle seule). Les parties sont écrites directement dans une ou
+    plusieurs sorties (classeur multi-feuilles, archive ZIP ou dossier de CSV), chacune dans un
+    fichier temporaire renommé en fin d'écriture.
+    """
+
+    def __init__(self):
+        # Tampon réutilisé pour mesurer les lignes telles que le module csv les écrit,
+        # propre à chaque thread (l'instance est partagée par les requêtes)
+        self._local = threading.local()
+
+    def output_path(self, input_path, fmt):
+        """Chemin de sortie par défaut d'un format : <nom>.xlsx, <nom>.zip ou le dossier <nom>_parts."""
+        base_name = os.path.splitext(input_path)[0]
+        return f"{base_name}_parts" if fmt == 'dir' else f"{base_name}.{fmt}"
+
+    def count_rows(self, input_path, block_size=1024 * 1024):
+        """
+        Compte les lignes de données d'un fichier CSV (entête exclue) en comptant les fins de ligne
+        par blocs binaires, sans analyser le CSV. Une valeur entre guillemets contenant un saut de
+        ligne est comptée deux fois : le résultat est un majorant.
+        """
+        lines = 0
+        last = b'\n'
+        with open(input_path, 'rb') as file:
+            while True:
+                block = file.read(block_size)
+                if not block:
+                    break
+                lines += block.count(b'\n')
+                last = block[-1:]
+        # Dernière ligne sans fin de ligne
+        if last != b'\n':
+            lines += 1
+        return max(lines - 1, 0)
+
+    def _row_bytes(self, row):
+        # Taille de la ligne écrite par les sorties CSV (guillemets, échappements et fin de ligne compris)
+        local = self._local
+        if not hasattr(local, 'buffer'):
+            local.buffer = io.StringIO()
+            local.writer = csv.writer(local.buffer)
+        local.buffer.seek(0)
+        local.buffer.truncate()
+        local.writer.writerow(row)
+        return len(local.buffer.getvalue().encode('utf-8'))
+
+    def iter_groups(self, reader, key_indices):
+        """Regroupe les lignes d'un lecteur CSV par pièce (ligne clé et lignes suivantes sans clé)."""
+        group = []
+        for row in reader:
+            is_key = all(index < len(row) and row[index].strip() != '' for index in key_indices)
+            if is_key and group:
+                yield group
+                group = []
+            group.append(row)
+        if group:
+            yield group
+
+    def iter_parts(self, reader, key_indices, max_rows=DEFAULT_MAX_ROWS, max_bytes=None, header_bytes=0):
+        """
+        Produit les parties sous forme de listes de pièces, avec au plus max_rows lignes (hors entête)
+        et max_bytes octets par partie (entête de header_bytes octets comprise).
+        Seule la partie courante est gardée en mémoire.
+        """
+        part, rows, size = [], 0, header_bytes
+        for group in self.iter_groups(reader, key_indices):
+            group_size = sum(self._row_bytes(row) for row in group) if max_bytes else 0
+            too_many = max_rows and rows + len(group) > max_rows
+            too_big = max_bytes and size + group_size > max_bytes
+            if part and (too_many or too_big):
+                yield part
+                part, rows, size = [], 0, header_bytes
+            part.append(group)
+            rows += len(group)
+            size += group_size
+        if part:
+            yield part
+
+    def split(self, input_path, outputs, max_rows=DEFAULT_MAX_ROWS, max_bytes=None, key_columns=None, force=False):
+        """
+        Découpe un fichier CSV en un seul passage.
+
+        :param input_path: Chemin du fichier CSV (entête sur la première ligne).
+        :param outputs: Dictionnaire format ('xlsx', 'zip', 'dir') -> chemin de sortie.
+        :param max_rows: Nombre maximal de lignes par partie (None : pas de limite).
+        :param max_bytes: Taille maximale d'une partie en octets (None : pas de limite).
+        :param key_columns: Colonnes identifiant le début d'une pièce.
+        :param force: Écrire les sorties même si le fichier tient en une seule partie.
+        :return: Nombre de parties ; 1 sans force signifie qu'aucune sortie n'a été écrite.
+        """
+        if not max_rows and not max_bytes:
+            raise ValueError("Une limite de lignes ou de taille est requise.")
+        unknown = [fmt for fmt in outputs if fmt not in SINKS]
+        if unknown:
+            raise ValueError(f"Format de découpage non pris en charge : {', '.join(unknown)}")
+
+        stem = os.path.splitext(os.path.basename(input_path))[0]
+        sinks = []
+        count = 0
+        with open(input_path, mode='r', newline='', encoding='utf-8-sig') as file:
+            reader = csv.reader(file)
+            header = next(reader, None)
+            if header is None:
+                return 0
+            key_columns = key_columns or DEFAULT_KEY_COLUMNS
+            missing = [column for column in key_columns if column not in header]
+            if missing:
+                raise ValueError(f"Colonne(s) absente(s) de l'entête : {', '.join(missing)}")
+            key_indices = [header.index(column) for column in key_columns]
+
+            # Entête répétée dans chaque partie, précédée de la marque d'ordre des octets UTF-8
+            parts = self.iter_parts(reader, key_indices, max_rows, max_bytes, self._row_bytes(header) + 3)
+            pending = None if force else next(parts, None)
+            try:
+                for part in parts:
+                    if not sinks:
+                        # Deuxième partie (ou force) : le fichier est bien découpé, les sorties sont ouvertes
+                        sinks = [SINKS[fmt](path, stem) for fmt, path in outputs.items()]
+                        if pending is not None:
+                            count = self._write_part(sinks, count + 1, header, pending)
+                    count = self._write_part(sinks, count + 1, header, part)
+                for sink in sinks:
+                    sink.close()
+            except BaseException:
+                for sink in sinks:
+                    sink.discard()
+                raise
+
+        if not sinks:
+            return 0 if pending is None else 1
+        print(f"Fichier découpé en {count} partie(s) : {input_path}")
+        return count
+
+    def _write_part(self, sinks, number, header, part):
+        for sink in sinks:
+            sink.start(number, header)
+            for group in part:
+                sink.write(group)
+        return number
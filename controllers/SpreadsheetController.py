@@ -0,0 +1,139 @@
+import csv
+import itertools
+import os
+import threading
+import openpyxl
+from controllers.ToolController import KeyedLock
+
+# Moteurs facultatifs : python-calamine (lecture native, bien plus rapide qu'openpyxl)
+# et pyarrow (copie convertie au format Parquet plutôt qu'en CSV).
+try:
+    from python_calamine import CalamineWorkbook
+except ImportError:
+    CalamineWorkbook = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+SPREADSHEET_BACKEND = os.getenv('SPREADSHEET_BACKEND', 'auto')
+BATCH_ROWS = 50000
+
+# Une conversion à la fois par classeur : les autres appelants attendent la copie
+_locks = KeyedLock()
+
+
+class SpreadsheetController:
+    """
+    Lecture des classeurs Excel (.xlsx) chargés.
+
+    La première feuille est lue ligne par ligne, avec python-calamine s'il est installé,
+    sinon avec openpyxl en mode lecture seule (sans charger tout le classeur en mémoire).
+    Elle est convertie une seule fois, au chargement du fichier, en une copie Parquet
+    (ou CSV sans pyarrow) que toutes les étapes suivantes relisent à la place du classeur.
+    """
+
+    def backend(self):
+        if SPREADSHEET_BACKEND == 'calamine' or SPREADSHEET_BACKEND == 'auto' and CalamineWorkbook is not None:
+            return 'calamine'
+        return 'openpyxl'
+
+    def converted_candidates(self, path):
+        """Chemins possibles de la copie convertie d'un classeur (Parquet puis CSV)."""
+        base_name, _ = os.path.splitext(path)
+        return [f"{base_name}_xlsx{extension}" for extension in ('.parquet', '.csv')]
+
+    def converted_path(self, path):
+        """Retourne le chemin de la copie convertie d'un classeur si elle est à jour, sinon None."""
+        for candidate in self.converted_candidates(path):
+            if os.path.exists(candidate) and os.path.getmtime(candidate) >= os.path.getmtime(path):
+                return candidate
+        return None
+
+    def iter_rows(self, path):
+        """Parcourt les lignes de la première feuille d'un classeur, sous forme de tuples de valeurs."""
+        if self.backend() == 'calamine':
+            workbook = CalamineWorkbook.from_path(path)
+            yield from workbook.get_sheet_by_index(0).iter_rows()
+            return
+
+        workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            yield from workbook.worksheets[0].iter_rows(values_only=True)
+        finally:
+            workbook.close()
+
+    def _data_rows(self, rows):
+        """Ignore les lignes vides en fin de feuille (les lignes vides intermédiaires sont conservées)."""
+        pending = 0
+        for row in rows:
+            if all(value is None or value == '' for value in row):
+                pending += 1
+                continue
+            for _ in range(pending):
+                yield ()
+            pending = 0
+            yield row
+
+    def _cell(self, value):
+        if value is None or value == '':
+            return None
+        if isinstance(value, float) and value.is_integer():
+            return str(int(value))
+        return str(value)
+
+    def _header(self, row):
+        # Mêmes noms que pandas pour les colonnes sans en-tête
+        return [str(value) if value not in (None, '') else f"Unnamed: {index}" for index, value in enumerate(row)]
+
+    def convert(self, path):
+        """
+        Convertit la première feuille d'un classeur en une copie Parquet (ou CSV) en un seul passage,
+        par lots de lignes, et retourne le chemin de la copie. Une copie à jour est réutilisée.
+        """
+        with _locks.hold(os.path.abspath(path)):
+            return self._convert(path)
+
+    def convert_in_background(self, path):
+        """Lance la conversion d'un classeur sans attendre sa fin."""
+        threading.Thread(target=self.convert, args=(path,), daemon=True).start()
+
+    def _convert(self, path):
+        converted = self.converted_path(path)
+        if converted:
+            return converted
+
+        base_name, _ = os.path.splitext(path)
+        rows = self.iter_rows(path)
+        header = self._header(next(rows, ()))
+        rows = self._data_rows(rows)
+        width = len(header)
+
+        if pyarrow is not None:
+            output_file = f"{base_name}_xlsx.parquet"
+            schema = pyarrow.schema([(name, pyarrow.string()) for name in header])
+            with pyarrow.parquet.ParquetWriter(f"{output_file}.tmp", schema) as writer:
+                while True:
+                    batch = list(itertools.islice(rows, BATCH_ROWS))
+                    if not batch:
+                        break
+                    columns = [[] for _ in range(width)]
+                    for row in batch:
+                        for index in range(width):
+                            columns[index].append(self._cell(row[index]) if index < len(row) else None)
+                    writer.write_table(pyarrow.Table.from_arrays(
+                        [pyarrow.array(column, type=pyarrow.string()) for column in columns], schema=schema
+                    ))
+        else:
+            output_file = f"{base_name}_xlsx.csv"
+            with open(f"{output_file}.tmp", 'w', newline='', encoding='utf-8') as file:
+                writer = csv.writer(file)
+                writer.writerow(header)
+                for row in rows:
+                    writer.writerow([self._cell(row[index]) if index < len(row) else None for index in range(width)])
+
+        os.replace(f"{output_file}.tmp", output_file)
+        print(f"Classeur converti : {path} -> {output_file}")
+        return output_file
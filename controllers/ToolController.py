@@ -1,5 +1,7 @@
 from flask import current_app, send_from_directory
+from contextlib import contextmanager
 import os 
+import threading
 
 
 
@@ -21,4 +23,33 @@ class ToolController:
             return{
                 'Type' : 'Error',
                 'Response': 'Reponse non prise en charge'
-            }
\ No newline at end of file
+            }
+
+
+class KeyedLock:
+    """
+    Verrous indexés par une clé (chemin de fichier) : une opération à la fois par clé.
+    Le verrou d'une clé n'existe que tant qu'il est détenu ou attendu : il est retiré au départ
+    de son dernier utilisateur, le dictionnaire ne grossit pas avec le nombre de fichiers traités.
+    """
+
+    def __init__(self):
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def __len__(self):
+        return len(self._locks)
+
+    @contextmanager
+    def hold(self, key):
+        with self._guard:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._guard:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._locks[key]
@@ -0,0 +1,173 @@
+import os
+import uuid
+import pandas as pd
+from flask import current_app
+from controllers.FileManagerController import FileManagerController
+from controllers.ToolController import ToolController
+
+file_manager = FileManagerController()
+tool = ToolController()
+
+# Règles vérifiées, dans l'ordre du rapport
+RULES = {
+    'colonne_absente': "colonne absente du fichier",
+    'valeur_vide': "valeur obligatoire vide",
+    'partenaire_inconnu': "partenaire absent d'Odoo",
+    'produit_inconnu': "produit absent d'Odoo",
+    'analytique_inconnu': "compte analytique absent d'Odoo",
+    'date_invalide': "date invalide (format JJMMAA attendu)",
+}
+
+# Nombre d'erreurs reprises dans la réponse (le rapport complet est téléchargeable)
+PREVIEW_SIZE = 20
+
+
+class ValidationController:
+    """
+    Validation complète d'un fichier nettoyé avant la génération du fichier d'import.
+
+    Toutes les règles sont vérifiées en un seul passage sur le fichier (clés vides, partenaires,
+    produits et comptes analytiques absents des données de référence, dates invalides), au lieu
+    de s'arrêter à la première erreur. Si IMPORT_CHUNK_SIZE est défini, le fichier est lu par
+    blocs, comme pour la génération du fichier d'import.
+    Les erreurs sont enregistrées dans un index (ligne, colonne, règle, valeur) au format CSV,
+    sous le dossier de téléchargement : un seul aller-retour suffit pour corriger le fichier.
+    """
+
+    def _errors(self, rows, column, rule, values):
+        return pd.DataFrame({
+            'ligne': rows,
+            'colonne': column,
+            'regle': rule,
+            'valeur': values,
+        })
+
+    def check_references(self, df, column, index, rule, required=True):
+        """
+        Retourne les erreurs d'une colonne comparée à un index de référence : valeurs vides
+        (si la colonne est obligatoire) et valeurs absentes de l'index.
+        """
+        values = df[column]
+        empty = values.isna() | (values.astype(str).str.strip() == '')
+        normalized = values[~empty].astype(str).str.strip().str.lower()
+        unknown = normalized[~index.contains(normalized)]
+        errors = [self._errors(unknown.index + 2, column, rule, values[unknown.index].to_numpy())]
+        if required and empty.any():
+            rows = values.index[empty]
+            errors.append(self._errors(rows + 2, column, 'valeur_vide', values[rows].to_numpy()))
+        return errors
+
+    def check_dates(self, df, column):
+        """Retourne les erreurs des dates renseignées qui ne sont pas au format JJMMAA."""
+        values = df[column]
+        filled = values.notna() & (values.astype(str).str.strip() != '')
+        parsed = pd.to_datetime(values[filled], format="%d%m%y", errors='coerce')
+        invalid = parsed.index[parsed.isna()]
+        return [self._errors(invalid + 2, column, 'date_invalide', values[invalid].to_numpy())]
+
+    def check_frame(self, df, checks, missing, date_columns, config, datasets):
+        """
+        Retourne les erreurs d'un DataFrame (fichier entier ou bloc) : correspondances avec
+        les données de référence puis dates. Les numéros de ligne suivent l'index du DataFrame.
+        """
+        errors = []
+        for column, comparison in checks:
+            if column in missing:
+                continue
+            try:
+                if comparison is None:
+                    index = datasets.lookup(config["analytique"], 'code', sep=";")
+                    errors += self.check_references(df, column, index, 'analytique_inconnu', required=False)
+                else:
+                    index = datasets.lookup(comparison["file"], comparison["colonne1"], sep=";")
+                    errors += self.check_references(df, column, index, comparison["regle"])
+            except KeyError as e:
+                # Colonne absente d'un fichier de référence : la comparaison fautive accompagne l'erreur
+                e.reference = comparison or config["analytique"]
+                raise
+        for column in date_columns:
+            if column not in missing:
+                errors += self.check_dates(df, column)
+        return errors
+
+    def validate(self, file_configs, move, datasets, date_columns=(), progress=None, rename=None):
+        """
+        Vérifie toutes les règles sur chaque fichier de l'import.
+
+        :param file_configs: Configuration de l'import (fichier, comparaisons, référentiel analytique).
+        :param move: Libellé du mouvement ('Client', 'Fournisseur', 'Petroci', ...).
+        :param datasets: Registre des fichiers de l'import.
+        :param date_columns: Colonnes de date à contrôler (format JJMMAA).
+        :param progress: Fonction optionnelle progress(etape, pourcentage).
+        :param rename: Correspondances colonne du fichier chargé -> champ du mouvement appliquées
+                       au nettoyage : les colonnes du rapport portent les noms du fichier chargé.
+        :return: Succès, ou erreur avec le chemin du rapport, le nombre d'erreurs par règle et un aperçu.
+        """
+        progress = progress or (lambda stage, value: None)
+        progress('validation', 0)
+        chunk_size = current_app.config.get('IMPORT_CHUNK_SIZE', 0)
+        errors = []
+        total_rows = 0
+        for number, config in enumerate(file_configs, start=1):
+            checks = [(comparison['colonne2'], comparison) for comparison in config.get("comparaison", [])]
+            if config.get("analytique") and move in ('Client', 'Petroci'):
+                checks.append(('Analytique', None))
+            columns = [column for column, _ in checks] + list(date_columns)
+            header = datasets.header(config["file"])
+            missing = [column for column in dict.fromkeys(columns) if column not in header]
+            errors += [self._errors([1], column, 'colonne_absente', [None]) for column in missing]
+
+            columns = [column for column in columns if column in header]
+            if chunk_size:
+                # Lecture par blocs : les index de référence sont partagés, un seul bloc en mémoire
+                frames = datasets.iter_chunks(config["file"], chunk_size, columns=columns)
+            else:
+                frames = [datasets.load(config["file"], columns=columns)]
+            for df in frames:
+                total_rows += len(df)
+                try:
+                    errors += self.check_frame(df, checks, missing, date_columns, config, datasets)
+                except KeyError as e:
+                    return tool.response_function(0, f"Colonne absente des données de référence : {e}", e.reference)
+            progress('validation', 100 * number / len(file_configs))
+
+        errors = pd.concat(errors, ignore_index=True) if errors else pd.DataFrame()
+        if errors.empty:
+            return tool.response_function(1, "Données validées", 200)
+
+        if rename:
+            errors['colonne'] = errors['colonne'].replace({field: source for source, field in rename.items()})
+        errors = errors.sort_values(['ligne', 'colonne'], kind='stable')
+        report = self.write_report(errors, move)
+        summary = errors['regle'].value_counts().reindex(list(RULES)).dropna().astype(int).to_dict()
+        print(f"Validation : {len(errors)} erreur(s) {summary}, rapport {report}")
+        preview = errors.head(PREVIEW_SIZE).astype(object)
+        preview = preview.where(preview.notna(), None)
+        return tool.response_function(
+            0,
+            f"{len(errors)} erreur(s) sur {errors['ligne'].nunique()} ligne(s) du fichier ({total_rows} lignes) : "
+            + ", ".join(f"{count} {RULES[rule]}" for rule, count in summary.items()),
+            {
+                "rapport": report,
+                "erreurs": summary,
+                "apercu": preview.to_dict(orient='records'),
+            }
+        )
+
+    def write_report(self, errors, move):
+        """
+        Enregistre l'index des erreurs (ligne, colonne, règle, libellé, valeur) dans
+        Validation_du_<date>/Erreurs_<id>_<mouvement>_<horodatage>.csv et retourne son chemin relatif.
+        """
+        download_folder = current_app.config['DOWNLOAD_FOLDER']
+        path_name = file_manager.generate_unique_filename('Validation_du')
+        os.makedirs(os.path.join(download_folder, path_name), exist_ok=True)
+        # Plusieurs rapports peuvent être produits dans la même minute (imports par lot)
+        report = f"{path_name}/{file_manager.generate_unique_filename(f'Erreurs_{uuid.uuid4().hex[:6]}', 'csv', extract=move)}"
+        output_path = os.path.join(download_folder, report)
+
+        errors = errors.assign(libelle=errors['regle'].map(RULES))[['ligne', 'colonne', 'regle', 'libelle', 'valeur']]
+        errors.to_csv(f"{output_path}.tmp", index=False, sep=",", encoding="utf-8-sig")
+        os.replace(f"{output_path}.tmp", output_path)
+        file_manager.precompress(output_path)
+        return report
@@ -0,0 +1,132 @@
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# Les tests importent les contrôleurs depuis la racine du dépôt
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from controllers import OdooRpcController as odoo_rpc_module  # noqa: E402
+
+
+class StubOdoo(ThreadingHTTPServer):
+    """
+    Serveur JSON-RPC minimal : common.login et object.execute_kw (search, search_read, export_data)
+    sur les enregistrements de `models` ({modèle: [{champ: valeur}]}, 'id' entier obligatoire).
+    Les domaines de recherche acceptent les conditions (champ, '=' ou '>', valeur).
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.models = {}
+        self.calls = []
+        self.connections = set()
+        self.drop_after = None
+        self.delay = 0
+        self.lock = threading.Lock()
+
+    def matches(self, record, domain):
+        for field, operator, value in domain:
+            current = record.get(field)
+            if operator == '=' and current != value:
+                return False
+            if operator == '>' and (current is None or not current > value):
+                return False
+        return True
+
+    def dispatch(self, service, method, args):
+        if service == 'common' and method == 'login':
+            return 7 if args[2] == 'secret' else False
+        if service == 'object' and method == 'execute_kw':
+            _, uid, _, model, model_method, model_args, kwargs = args
+            assert uid == 7
+            records = self.models.get(model, [])
+            if model_method == 'search':
+                return [record['id'] for record in records if self.matches(record, model_args[0])]
+            if model_method == 'search_read':
+                return [
+                    {'id': record['id'], **{field: record.get(field, False) for field in kwargs.get('fields', [])}}
+                    for record in records if self.matches(record, model_args[0])
+                ]
+            if model_method == 'export_data':
+                ids, fields = model_args
+                return {'datas': [
+                    [str(record[field]) if record.get(field) is not None else False for field in fields]
+                    for record in records if record['id'] in ids
+                ]}
+        raise ValueError(f"{service}.{method}")
+
+    def searches(self, model):
+        """Domaines des recherches reçues pour un modèle, dans l'ordre."""
+        return [args[5][0] for service, method, args in self.calls
+                if method == 'execute_kw' and args[3] == model and args[4] == 'search']
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        params = request['params']
+        server = self.server
+        with server.lock:
+            server.calls.append((params['service'], params['method'], params['args']))
+            server.connections.add(self.client_address)
+            count = len(server.calls)
+        if server.delay:
+            time.sleep(server.delay)
+        try:
+            payload = {'jsonrpc': '2.0', 'id': request['id'], 'result': server.dispatch(params['service'], params['method'], params['args'])}
+        except ValueError as e:
+            payload = {'jsonrpc': '2.0', 'id': request['id'], 'error': {'message': str(e)}}
+        body = json.dumps(payload).encode()
+        try:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except OSError:
+            # Client parti avant la réponse (délai dépassé)
+            self.close_connection = True
+            return
+        # Fermeture silencieuse de la connexion (sans « Connection: close »), comme un délai d'inactivité
+        if server.drop_after is not None and count == server.drop_after:
+            self.close_connection = True
+
+
+@pytest.fixture
+def stub():
+    server = StubOdoo()
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    thread.start()
+    odoo_rpc_module._pools.clear()
+    yield server
+    server.shutdown()
+    server.server_close()
+    odoo_rpc_module._pools.clear()
+
+
+@pytest.fixture
+def conf_file(stub, tmp_path):
+    path = tmp_path / 'connection.conf'
+    path.write_text(
+        "[Connection]\n"
+        "hostname = 127.0.0.1\n"
+        f"port = {stub.server_address[1]}\n"
+        "protocol = jsonrpc\n"
+        "database = test\n"
+        "login = admin\n"
+        "password = secret\n",
+        encoding='utf-8'
+    )
+    return str(path)
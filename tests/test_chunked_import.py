@@ -0,0 +1,105 @@
+import contextlib
+import io
+import os
+
+import pandas as pd
+import pytest
+from flask import Flask
+
+from controllers.FileConfigController import FileConfigController
+from controllers.LookupIndexController import LookupIndexController
+from controllers.ReferenceCacheController import ReferenceCacheController
+
+file_config = FileConfigController()
+fields = file_config.get_fiedls_odoo('Clt')
+
+# Factures de 3, 2 et 3 lignes : avec des blocs de 2 lignes, F1 et F3 sont à cheval sur deux blocs
+ROWS = [
+    ('F1', 'C1', 'P1'), ('F1', 'C1', 'P2'), ('F1', 'C1', 'P1'),
+    ('F2', 'C2', 'P2'), ('F2', 'C2', 'P1'),
+    ('F3', 'C1', 'P2'), ('F3', 'C1', 'P2'), ('F3', 'C1', 'P1'),
+]
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config.update(DOWNLOAD_FOLDER=str(tmp_path / 'download'), IMPORT_PARALLEL_WORKERS=0, IMPORT_CHUNK_SIZE=2)
+    os.makedirs(app.config['DOWNLOAD_FOLDER'])
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def file_configs(tmp_path):
+    snapshots = {
+        'res_partner': pd.DataFrame({'id': ['__export__.res_partner_1', '__export__.res_partner_2'], 'ref': ['C1', 'C2']}),
+        'product_template': pd.DataFrame({'display_name': ['[P1] Article 1', '[P2] Article 2'], 'old_default_code': ['P1', 'P2']}),
+        'account_analytic_account': pd.DataFrame({'id.id': ["(1, 'AN1')"], 'code': ['AN1']}),
+    }
+    references = {}
+    for entity, df in snapshots.items():
+        path = str(tmp_path / f"{entity}.csv")
+        df.to_csv(path, index=False, sep=';', encoding='utf-8-sig')
+        LookupIndexController().build(path, ReferenceCacheController.ENTITIES[entity]['lookups'], df)
+        references[entity] = path
+
+    path = str(tmp_path / 'Clients_nettoye.csv')
+    pd.DataFrame({
+        'Référence': [reference for reference, _, _ in ROWS],
+        'Date': '030125',
+        'Journal': 'VTE',
+        'Client': [client for _, client, _ in ROWS],
+        'Produit': [product for _, _, product in ROWS],
+        'Description': 'Ligne',
+        'Prix unitaire': '100',
+        'Quantité': '1',
+        'Remise': '0',
+        'Analytique': 'AN1',
+    }).to_csv(path, index=False, encoding='utf-8-sig')
+    return file_config.build_file_configs(path, 'Clt', references)
+
+
+def generate(file_configs, output_path):
+    datasets = file_config.declare_datasets(file_configs, fields['Column'])
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert file_config.validate_import(file_configs, 'Clt', datasets)['Type'] == 'Succes'
+        result = file_config.process_import_files(
+            file_configs, output_path, fields['Column'], fields['Entete'], fields['Mapping'], 'import.csv', 'Client', datasets
+        )
+    assert result['Type'] == 'Succes'
+    # Rien n'est conservé dans le registre : les blocs sont relus depuis le fichier
+    return datasets
+
+
+def test_duplicates_detected_across_chunk_boundaries(app, file_configs, tmp_path):
+    chunked = str(tmp_path / 'chunked.csv')
+    datasets = generate(file_configs, chunked)
+    assert datasets.datasets == {}
+
+    df = pd.read_csv(chunked, dtype=str, keep_default_na=False, encoding='utf-8-sig')
+    # Seule la première ligne de chaque facture porte l'entête, y compris après une limite de bloc
+    assert df["Ref d'origine"].tolist() == ['F1', '', '', 'F2', '', 'F3', '', '']
+    assert (df['partner_id/id'] != '').tolist() == [True, False, False, True, False, True, False, False]
+
+    app.config['IMPORT_CHUNK_SIZE'] = 0
+    whole = str(tmp_path / 'whole.csv')
+    generate(file_configs, whole)
+    with open(chunked, 'rb') as first, open(whole, 'rb') as second:
+        assert first.read() == second.read()
+
+
+def test_chunked_validation_reports_file_line_numbers(app, file_configs):
+    df = pd.read_csv(file_configs[0]['file'], dtype=str, encoding='utf-8-sig')
+    df.loc[4, 'Client'] = 'C9'
+    df.loc[7, 'Produit'] = 'P9'
+    df.to_csv(file_configs[0]['file'], index=False, encoding='utf-8-sig')
+    datasets = file_config.declare_datasets(file_configs, fields['Column'])
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = file_config.validate_import(file_configs, 'Clt', datasets)
+
+    assert result['Type'] == 'Error'
+    assert result['Response']['erreurs'] == {'partenaire_inconnu': 1, 'produit_inconnu': 1}
+    assert [(error['ligne'], error['colonne']) for error in result['Response']['apercu']] == [(6, 'Client'), (9, 'Produit')]
+    assert datasets.datasets == {}
@@ -0,0 +1,143 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+from flask import Flask
+
+from controllers import JobController as job_module
+from controllers.JobController import JobController
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config.update(JOBS_FOLDER=str(tmp_path / 'jobs'), IMPORT_MAX_WORKERS=2)
+    os.makedirs(app.config['JOBS_FOLDER'])
+    with app.app_context():
+        yield app
+
+
+def wait_for(jobs, job_id, statuses, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = jobs.get(job_id)['Response']
+        if job['status'] in statuses:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"Tâche {job_id} toujours {job['status']}")
+
+
+def write_job(app, job_id, status='en cours', **fields):
+    job = {'id': job_id, 'status': status, 'files': ['/data/upload.csv'], 'result': None, **fields}
+    with open(os.path.join(app.config['JOBS_FOLDER'], f"{job_id}.json"), 'w', encoding='utf-8') as file:
+        json.dump(job, file)
+
+
+def test_submit_progress_and_result(app, tmp_path):
+    jobs = JobController()
+    started, release = threading.Event(), threading.Event()
+
+    def work(value, progress):
+        progress('nettoyage', 100)
+        progress('export', 50)
+        started.set()
+        release.wait(5)
+        progress('export', 100)
+        return {'Type': 'Succes', 'Response': value * 2}
+
+    job_id = jobs.submit('import', work, 21, files=[str(tmp_path / 'upload.csv')])['Response']
+    assert started.wait(5)
+
+    job = jobs.get(job_id)['Response']
+    assert job['status'] == 'en cours'
+    assert job['stage'] == 'export'
+    assert job['stages']['nettoyage'] == {'statut': 'terminé', 'progression': 100}
+    assert job['stages']['export'] == {'statut': 'en cours', 'progression': 50}
+    assert job['stages']['traitement'] == {'statut': 'en attente', 'progression': 0}
+    assert job['owner']['pid'] == os.getpid()
+    assert jobs.referenced_files() == {str(tmp_path / 'upload.csv')}
+
+    release.set()
+    job = wait_for(jobs, job_id, ('terminé',))
+    assert job['result'] == {'Type': 'Succes', 'Response': 42}
+    assert job['stages']['export']['statut'] == 'terminé'
+    assert jobs.referenced_files() == set()
+
+
+def test_error_result_and_exception(app):
+    jobs = JobController()
+
+    def failed(progress):
+        return {'Type': 'Error', 'Message': "Fichier invalide", 'Response': None}
+
+    def crashed(progress):
+        raise RuntimeError("panne")
+
+    assert wait_for(jobs, jobs.submit('import', failed)['Response'], ('erreur',))['result']['Message'] == "Fichier invalide"
+    job = wait_for(jobs, jobs.submit('import', crashed)['Response'], ('erreur',))
+    assert job['result']['Message'] == "Erreur imprévue"
+    assert job['result']['Response'] == "panne"
+
+
+def test_heartbeat_refreshes_running_jobs(app):
+    jobs = JobController()
+    release = threading.Event()
+    job_id = jobs.submit('import', lambda progress: release.wait(5) and {'Type': 'Succes', 'Response': None})['Response']
+    before = jobs.get(job_id)['Response']['heartbeat']
+
+    time.sleep(0.01)
+    jobs.heartbeat()
+
+    assert jobs.get(job_id)['Response']['heartbeat'] > before
+    release.set()
+    wait_for(jobs, job_id, ('terminé',))
+
+
+def test_job_of_another_live_process_is_not_interrupted(app):
+    # Processus parent : toujours actif, autre jeton (autre processus du serveur)
+    owner = {'host': socket.gethostname(), 'pid': os.getppid(), 'token': 'autre'}
+    write_job(app, 'vivant', owner=owner, heartbeat=time.time())
+    jobs = JobController()
+
+    assert jobs.get('vivant')['Response']['status'] == 'en cours'
+    assert jobs.referenced_files() == {'/data/upload.csv'}
+
+
+def test_job_of_another_host_follows_heartbeat(app):
+    owner = {'host': 'autre-hote', 'pid': 1, 'token': 'autre'}
+    write_job(app, 'recent', owner=owner, heartbeat=time.time())
+    write_job(app, 'ancien', owner=owner, heartbeat=time.time() - job_module.HEARTBEAT_TIMEOUT - 1)
+    jobs = JobController()
+
+    assert jobs.get('recent')['Response']['status'] == 'en cours'
+    job = jobs.get('ancien')['Response']
+    assert job['status'] == 'interrompu'
+    assert job['result']['Type'] == 'Error'
+
+
+def test_job_interrupted_when_owner_is_gone(app):
+    finished = subprocess.Popen([sys.executable, '-c', 'pass'])
+    finished.wait()
+    host = socket.gethostname()
+    # Processus terminé, processus redémarré avec le même pid, tâche de ce processus inconnue du pool
+    write_job(app, 'termine', owner={'host': host, 'pid': finished.pid, 'token': 'autre'}, heartbeat=time.time())
+    write_job(app, 'redemarre', owner={'host': host, 'pid': os.getpid(), 'token': 'ancien'}, heartbeat=time.time())
+    write_job(app, 'perdu', status='en attente', owner={'host': host, 'pid': os.getpid(), 'token': job_module._process_token},
+              heartbeat=time.time())
+    write_job(app, 'sansproprietaire')
+    jobs = JobController()
+
+    assert jobs.referenced_files() == set()
+    for job_id in ('termine', 'redemarre', 'perdu', 'sansproprietaire'):
+        assert jobs.get(job_id)['Response']['status'] == 'interrompu'
+
+
+def test_invalid_and_unknown_job(app):
+    jobs = JobController()
+    assert jobs.get('../x')['Type'] == 'Error'
+    assert jobs.get('inconnu')['Type'] == 'Error'
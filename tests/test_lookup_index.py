@@ -0,0 +1,89 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from controllers.LookupIndexController import LookupIndexController
+
+lookup_indexes = LookupIndexController()
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    df = pd.DataFrame({
+        'ref': ['C1', ' c2 ', 'C3', 'C2', None, 'Éa'],
+        'id': ['1', '2', '3', '2-bis', '5', ' 6 '],
+    })
+    path = str(tmp_path / 'res_partner.csv')
+    df.to_csv(path, index=False, sep=';', encoding='utf-8-sig')
+    lookup_indexes.build(path, [('ref', 'id')])
+    return path
+
+
+def test_keys_are_normalized(snapshot):
+    index = lookup_indexes.load(snapshot, 'ref', 'id')
+
+    # Clés sans espaces et en minuscules, valeurs sans espaces ; ordre des octets UTF-8
+    assert list(index.items()) == [('c1', '1'), ('c2', '2-bis'), ('c3', '3'), ('éa', '6')]
+    queries = pd.Series(['c1', 'éa', 'c3'], index=[10, 11, 12])
+    assert index.map(queries).tolist() == ['1', '6', '3']
+    assert index.map(queries).index.tolist() == [10, 11, 12]
+
+
+def test_duplicate_keys_keep_last_value(snapshot):
+    index = lookup_indexes.load(snapshot, 'ref', 'id')
+
+    # Comme dict(zip(clés, valeurs)) : la dernière occurrence l'emporte
+    assert index.map(pd.Series(['c2'])).tolist() == ['2-bis']
+    assert len(index) == 4
+
+
+def test_missing_keys(snapshot):
+    index = lookup_indexes.load(snapshot, 'ref', 'id')
+    queries = pd.Series(['c9', None, 'c1', '', 'zz', 'a'])
+
+    assert index.map(queries).tolist() == [None, None, '1', None, None, None]
+    assert index.contains(queries).tolist() == [False, False, True, False, False, False]
+    assert not lookup_indexes.from_frame(pd.DataFrame({'ref': [], 'id': []}), 'ref', 'id').contains(queries).any()
+
+
+def test_key_only_index(snapshot):
+    index = lookup_indexes.from_frame(pd.read_csv(snapshot, sep=';', dtype=str, encoding='utf-8-sig'), 'ref')
+
+    assert index.contains(pd.Series(['c2', 'c4'])).tolist() == [True, False]
+
+
+def test_index_rejected_after_snapshot_rewrite(snapshot):
+    assert lookup_indexes.load(snapshot, 'ref', 'id') is not None
+
+    # Index construit avant la dernière écriture de l'instantané
+    keys_path = os.path.join(lookup_indexes.index_folder(snapshot), 'ref.keys.npy')
+    os.utime(keys_path, (0, 0))
+    assert lookup_indexes.load(snapshot, 'ref', 'id') is None
+
+    lookup_indexes.build(snapshot, [('ref', 'id')])
+    assert lookup_indexes.load(snapshot, 'ref', 'id') is not None
+
+
+def test_index_of_previous_format_is_rejected(snapshot):
+    keys_path = os.path.join(lookup_indexes.index_folder(snapshot), 'ref.keys.npy')
+    np.save(keys_path, np.array(['c1', 'c2'], dtype=str))
+
+    assert lookup_indexes.load(snapshot, 'ref', 'id') is None
+
+
+def test_long_values_do_not_inflate_other_rows(tmp_path):
+    df = pd.DataFrame({
+        'old_default_code': [f"P{index}" for index in range(1000)],
+        'display_name': ['Article'] * 999 + ['x' * 10000],
+    })
+    path = str(tmp_path / 'product_template.csv')
+    df.to_csv(path, index=False, sep=';', encoding='utf-8-sig')
+    folder = lookup_indexes.build(path, [('old_default_code', 'display_name')])
+
+    index = lookup_indexes.load(path, 'old_default_code', 'display_name')
+    assert index.map(pd.Series(['p999', 'p0'])).tolist() == ['x' * 10000, 'Article']
+    # Libellés stockés bout à bout : la taille suit la somme des longueurs, pas la plus longue
+    data_size = os.path.getsize(os.path.join(folder, 'old_default_code.display_name.data.npy'))
+    assert data_size < 999 * len('Article') + 10000 + 1000
@@ -0,0 +1,92 @@
+import pytest
+
+from controllers import OdooRpcController as odoo_rpc_module
+from controllers.OdooRpcController import OdooRpcController
+
+RECORDS = [{'id': index, 'ref': f"REF{index}"} for index in range(1, 24)]
+
+
+@pytest.fixture(autouse=True)
+def partners(stub):
+    stub.models['res.partner'] = RECORDS
+
+
+def export_calls(stub):
+    return [args for service, method, args in stub.calls if method == 'execute_kw' and args[4] == 'export_data']
+
+
+def test_export_batches_by_size(stub, conf_file):
+    result = OdooRpcController().export_data(conf_file, 'res.partner', 'id,ref', size=5, worker=1)
+
+    assert result['Type'] == 'Succes'
+    export = result['Response']
+    assert export['columns'] == ['id', 'ref']
+    assert export['data']['ref'] == [record['ref'] for record in RECORDS]
+    assert export['stats']['rows'] == len(RECORDS)
+    assert export['stats']['batches'] == 5
+    assert [len(args[5][0]) for args in export_calls(stub)] == [5, 5, 5, 5, 3]
+
+
+def test_export_with_workers_keeps_order(stub, conf_file):
+    result = OdooRpcController().export_data(conf_file, 'res.partner', 'id,ref', size=2, worker=4)
+
+    assert result['Response']['data']['id'] == [str(record['id']) for record in RECORDS]
+    assert len(export_calls(stub)) == 12
+
+
+def test_login_once_and_connections_reused(stub, conf_file):
+    controller = OdooRpcController()
+    controller.export_data(conf_file, 'res.partner', 'id,ref', size=5, worker=1)
+    controller.export_data(conf_file, 'res.partner', 'id,ref', size=5, worker=1)
+
+    assert [method for service, method, args in stub.calls if service == 'common'] == ['login']
+    # Un seul travailleur : toutes les requêtes passent par la même connexion HTTP
+    assert len(stub.connections) == 1
+    assert len(stub.calls) == 1 + 2 * (1 + 5)
+
+
+def test_call_reconnects_when_server_closed_connection(stub, conf_file):
+    controller = OdooRpcController()
+    params = controller.read_connection(conf_file)
+    stub.drop_after = 2
+
+    assert controller.execute_kw(params, 'res.partner', 'search_read', [[]], {'fields': ['ref']})[0]['ref'] == 'REF1'
+    # La connexion conservée dans la réserve a été fermée par le serveur : nouvelle connexion
+    assert len(controller.execute_kw(params, 'res.partner', 'search', [[]])) == len(RECORDS)
+    assert len(stub.connections) == 2
+
+
+def test_rpc_errors_are_reported(stub, conf_file):
+    result = OdooRpcController().export_data(conf_file, 'res.partner', 'id,ref', domain='[', size=5)
+    assert result['Type'] == 'Error'
+
+    params = OdooRpcController().read_connection(conf_file)
+    with pytest.raises(odoo_rpc_module.OdooRpcError):
+        OdooRpcController()._call(params, 'object', 'unknown')
+
+
+def test_login_refused(stub, conf_file, tmp_path):
+    bad_conf = tmp_path / 'bad.conf'
+    bad_conf.write_text(open(conf_file, encoding='utf-8').read().replace('secret', 'wrong'), encoding='utf-8')
+
+    result = OdooRpcController().export_data(str(bad_conf), 'res.partner', 'id,ref')
+    assert result['Type'] == 'Error'
+    assert 'Authentification' in result['Response']
+
+
+def test_timeout_is_not_retried(stub, conf_file):
+    controller = OdooRpcController()
+    params = controller.read_connection(conf_file)
+    stub.delay = 1
+
+    # Nouvelle connexion puis connexion de la réserve : le délai dépassé remonte sans nouvel envoi
+    with pytest.raises(TimeoutError):
+        controller._call(params, 'common', 'login', 'test', 'admin', 'secret', timeout=0.2)
+    assert len(stub.calls) == 1
+
+    stub.delay = 0
+    assert controller._call(params, 'common', 'login', 'test', 'admin', 'secret', timeout=0.2) == 7
+    stub.delay = 1
+    with pytest.raises(TimeoutError):
+        controller._call(params, 'common', 'login', 'test', 'admin', 'secret', timeout=0.2)
+    assert len(stub.calls) == 3
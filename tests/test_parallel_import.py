@@ -0,0 +1,56 @@
+import pandas as pd
+import pytest
+
+import controllers.FileConfigController as file_config_module
+from controllers.FileConfigController import FileConfigController
+
+file_config = FileConfigController()
+
+
+def assert_aligned(keys, bounds):
+    assert bounds[0][0] == 0 and bounds[-1][1] == len(keys)
+    assert all(stop == start for (_, stop), (start, _) in zip(bounds, bounds[1:]))
+    for start, stop in bounds:
+        assert start < stop
+        # Une référence n'est jamais partagée entre deux partitions
+        if start:
+            assert keys[start] != keys[start - 1]
+
+
+@pytest.mark.parametrize('partitions', [1, 2, 3, 4, 7, 50])
+def test_partition_bounds_follow_references(partitions):
+    keys = pd.Series(['F1'] * 3 + ['F2'] * 2 + ['F3'] * 3 + ['F4'] + ['F5'] * 4 + ['F6'] * 2)
+
+    bounds = file_config.partition_bounds(keys, partitions)
+
+    assert len(bounds) <= partitions
+    assert_aligned(keys.tolist(), bounds)
+
+
+def test_partition_bounds_sizes():
+    keys = pd.Series([f"F{index // 2}" for index in range(100)])
+
+    bounds = file_config.partition_bounds(keys, 4)
+
+    assert bounds == [(0, 26), (26, 50), (50, 76), (76, 100)]
+
+
+def test_partition_bounds_single_reference():
+    keys = pd.Series(['F1'] * 10)
+
+    assert file_config.partition_bounds(keys, 4) == [(0, 10)]
+    assert file_config.partition_bounds(pd.Series([], dtype=str), 4) == [(0, 0)]
+
+
+def test_pool_recreated_when_workers_change():
+    try:
+        pool = file_config._pool(2)
+        assert file_config._pool(2) is pool
+
+        resized = file_config._pool(3)
+        assert resized is not pool
+        assert resized._max_workers == 3
+        assert pool._shutdown_thread
+    finally:
+        file_config_module._shutdown_process_pool()
+    assert file_config_module._process_pool is None
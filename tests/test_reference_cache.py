@@ -0,0 +1,150 @@
+import os
+import shutil
+
+import pandas as pd
+import pytest
+from flask import Flask
+
+from controllers import OdooRpcController as odoo_rpc_module
+from controllers.LookupIndexController import LookupIndexController
+from controllers.ReferenceCacheController import ReferenceCacheController
+
+OLD = '2000-01-01 00:00:00'
+# Date de modification postérieure à toute synchronisation : enregistrement modifié depuis
+NEW = '2999-01-01 00:00:00'
+
+
+@pytest.fixture
+def app(stub, conf_file, tmp_path):
+    stub.models['res.partner'] = [
+        {'id': index, 'ref': f"C{index}", 'customer_rank': '1', 'supplier_rank': '0', 'write_date': OLD}
+        for index in range(1, 6)
+    ]
+    app = Flask(__name__)
+    app.config.update(
+        CONFIG=str(tmp_path / 'config'),
+        ODOO=str(tmp_path / 'odoo'),
+        ODOO_EXPORT_BACKEND='rpc',
+        REFERENCE_CACHE_TTL=900,
+        REFERENCE_CACHE_FULL_TTL=86400,
+    )
+    os.makedirs(app.config['CONFIG'])
+    shutil.copy(conf_file, os.path.join(app.config['CONFIG'], 'connection.conf'))
+    with app.app_context():
+        yield app
+
+
+def snapshot(cache):
+    return pd.read_csv(cache.snapshot_path('res_partner'), sep=';', dtype=str, encoding='utf-8-sig')
+
+
+def test_snapshot_reused_within_ttl(stub, app):
+    cache = ReferenceCacheController()
+
+    assert cache.get_snapshot('res_partner')['Type'] == 'Succes'
+    assert cache.get_snapshot('res_partner')['Response'] == cache.snapshot_path('res_partner')
+
+    # Un seul export complet : le second appel sert l'instantané en cache
+    assert stub.searches('res.partner') == [[]]
+    assert snapshot(cache)['ref'].tolist() == ['C1', 'C2', 'C3', 'C4', 'C5']
+
+
+def test_incremental_refresh_merges_on_key(stub, app):
+    cache = ReferenceCacheController()
+    cache.get_snapshot('res_partner')
+    full_sync_at = cache.read_meta('res_partner')['full_sync_at']
+
+    records = stub.models['res.partner']
+    records[1].update(ref='C2-modifié', write_date=NEW)
+    records.append({'id': 9, 'ref': 'C9', 'customer_rank': '1', 'supplier_rank': '0', 'write_date': NEW})
+    app.config['REFERENCE_CACHE_TTL'] = 0
+
+    assert cache.get_snapshot('res_partner')['Type'] == 'Succes'
+
+    # Seuls les enregistrements modifiés depuis la dernière synchronisation sont exportés
+    last_search = stub.searches('res.partner')[-1]
+    assert last_search == [['write_date', '>', last_search[0][2]]] and last_search[0][2] != NEW
+    df = snapshot(cache)
+    # Une seule ligne par identifiant : la version modifiée remplace l'ancienne, la nouvelle est ajoutée
+    assert sorted(df['id'].tolist()) == ['1', '2', '3', '4', '5', '9']
+    assert df.loc[df['id'] == '2', 'ref'].tolist() == ['C2-modifié']
+    assert cache.read_meta('res_partner')['full_sync_at'] == full_sync_at
+    # Index reconstruits avec la fusion
+    index = LookupIndexController().load(cache.snapshot_path('res_partner'), 'ref', 'id')
+    assert index.map(pd.Series(['c2-modifié', 'c9'])).tolist() == ['2', '9']
+    assert not index.contains(pd.Series(['c2'])).any()
+
+
+def test_incremental_refresh_without_changes_keeps_snapshot(stub, app):
+    cache = ReferenceCacheController()
+    cache.get_snapshot('res_partner')
+    before = snapshot(cache)
+    app.config['REFERENCE_CACHE_TTL'] = 0
+
+    assert cache.get_snapshot('res_partner')['Type'] == 'Succes'
+    assert [domain[0][0] for domain in stub.searches('res.partner')[1:]] == ['write_date']
+    assert snapshot(cache).equals(before)
+
+
+def test_full_ttl_expiry_reexports_everything(stub, app):
+    cache = ReferenceCacheController()
+    cache.get_snapshot('res_partner')
+
+    # Une suppression dans Odoo n'est vue que par un export complet
+    del stub.models['res.partner'][0]
+    app.config.update(REFERENCE_CACHE_TTL=0, REFERENCE_CACHE_FULL_TTL=0)
+
+    assert cache.get_snapshot('res_partner')['Type'] == 'Succes'
+    assert stub.searches('res.partner') == [[], []]
+    assert snapshot(cache)['ref'].tolist() == ['C2', 'C3', 'C4', 'C5']
+
+
+def test_invalidate_full_removes_snapshot(stub, app):
+    cache = ReferenceCacheController()
+    cache.get_snapshot('res_partner')
+    path = cache.snapshot_path('res_partner')
+
+    assert cache.invalidate('res_partner')['Type'] == 'Succes'
+
+    assert not os.path.exists(path)
+    assert cache.read_meta('res_partner') is None
+    assert not os.path.exists(LookupIndexController().index_folder(path))
+    assert cache.get_snapshot('res_partner')['Type'] == 'Succes'
+    assert stub.searches('res.partner') == [[], []]
+
+
+def test_invalidate_partial_forces_incremental_refresh(stub, app):
+    cache = ReferenceCacheController()
+    cache.get_snapshot('res_partner')
+
+    cache.invalidate('res_partner', full=False)
+
+    assert os.path.exists(cache.snapshot_path('res_partner'))
+    assert cache.get_snapshot('res_partner')['Type'] == 'Succes'
+    assert [domain[0][0] for domain in stub.searches('res.partner')[1:]] == ['write_date']
+
+
+def test_invalidate_unknown_entity(app):
+    assert ReferenceCacheController().invalidate('sale_order')['Type'] == 'Error'
+
+
+def test_previous_snapshot_kept_when_odoo_fails(stub, app):
+    cache = ReferenceCacheController()
+    cache.get_snapshot('res_partner')
+    meta = cache.read_meta('res_partner')
+    app.config['REFERENCE_CACHE_TTL'] = 0
+    # Authentification refusée au rafraîchissement suivant
+    conf = os.path.join(app.config['CONFIG'], 'connection.conf')
+    with open(conf, encoding='utf-8') as file:
+        content = file.read()
+    with open(conf, 'w', encoding='utf-8') as file:
+        file.write(content.replace('secret', 'wrong'))
+    odoo_rpc_module._pools.clear()
+
+    result = cache.get_snapshot('res_partner')
+
+    assert result['Type'] == 'Succes'
+    assert result['Response'] == cache.snapshot_path('res_partner')
+    assert len(snapshot(cache)) == 5
+    # Synchronisation non enregistrée : le prochain rafraîchissement reprend à la même date
+    assert cache.read_meta('res_partner') == meta
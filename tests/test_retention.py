@@ -0,0 +1,156 @@
+import os
+import time
+
+import pytest
+from flask import Flask
+
+from controllers import RetentionController as retention_module
+from controllers.RetentionController import RetentionController, DEFAULT_POLICIES, LOCK_FILE
+
+NOW = time.time()
+DAY = 86400
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config.update(
+        UPLOAD_FOLDER=str(tmp_path / 'uploads'),
+        CONFIG=str(tmp_path / 'config'),
+        JOBS_FOLDER=str(tmp_path / 'jobs'),
+        RETENTION_INTERVAL=3600,
+    )
+    for key in ('UPLOAD_FOLDER', 'CONFIG', 'JOBS_FOLDER'):
+        os.makedirs(app.config[key])
+    with app.app_context():
+        yield app
+
+
+def make(folder, name, age_days, size=10):
+    path = os.path.join(folder, name)
+    with open(path, 'wb') as file:
+        file.write(b'x' * size)
+    mtime = NOW - age_days * DAY
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+def sweep(folder, key='UPLOAD_FOLDER', referenced=(), **policy):
+    policy = dict({'max_age_days': None, 'max_size_mb': None, 'keep_last': 0, 'compress_after_days': None}, **policy)
+    return RetentionController().sweep_folder(key, folder, policy, now=NOW, referenced=referenced)
+
+
+def test_entries_older_than_max_age_are_removed(tmp_path):
+    make(tmp_path, 'ancien.csv', 40)
+    make(tmp_path, 'recent.csv', 5)
+
+    report = sweep(tmp_path, max_age_days=30)
+
+    assert report['supprimes'] == ['ancien.csv']
+    assert report['octets_liberes'] == 10
+    assert sorted(os.listdir(tmp_path)) == ['recent.csv']
+
+
+def test_keep_last_entries_are_kept_whatever_their_age(tmp_path):
+    for number in range(5):
+        make(tmp_path, f"f{number}.csv", 40 + number)
+
+    sweep(tmp_path, max_age_days=30, keep_last=2)
+
+    assert sorted(os.listdir(tmp_path)) == ['f0.csv', 'f1.csv']
+
+
+def test_size_cap_removes_oldest_first(tmp_path):
+    for number in range(4):
+        make(tmp_path, f"f{number}.csv", 1 + number, size=400 * 1024)
+
+    report = sweep(tmp_path, max_size_mb=1)
+
+    # 1600 Ko pour 1024 Ko autorisés : les deux plus anciens sont supprimés
+    assert report['supprimes'] == ['f3.csv', 'f2.csv']
+    assert sorted(os.listdir(tmp_path)) == ['f0.csv', 'f1.csv']
+
+
+def test_recent_entries_are_never_candidates(tmp_path):
+    make(tmp_path, 'en_cours.csv', 0, size=2 * 1024 * 1024)
+
+    assert sweep(tmp_path, max_size_mb=1, max_age_days=0)['supprimes'] == []
+
+
+def test_files_of_running_jobs_and_their_derived_files_are_kept(tmp_path):
+    upload = make(tmp_path, 'abc123.csv', 40)
+    make(tmp_path, 'abc123_xlsx.parquet', 40)
+    make(tmp_path, 'abc123_0123456789ab_cleaned.parquet', 40)
+    make(tmp_path, 'abc1234.csv', 40)
+
+    report = sweep(tmp_path, max_age_days=30, referenced={os.path.abspath(upload)})
+
+    assert report['supprimes'] == ['abc1234.csv']
+    assert len(os.listdir(tmp_path)) == 3
+
+
+def test_protected_entries_are_kept(tmp_path):
+    make(tmp_path, 'connection.conf', 40)
+    make(tmp_path, 'export_stats.json', 40)
+    os.makedirs(tmp_path / 'reference')
+    make(tmp_path, 'transitoire.csv', 40)
+
+    report = sweep(tmp_path, key='CONFIG', max_age_days=7, compress_after_days=1)
+
+    assert report['supprimes'] == ['transitoire.csv']
+    assert sorted(os.listdir(tmp_path)) == ['connection.conf', 'export_stats.json', 'reference']
+
+
+def test_old_files_are_compressed(tmp_path):
+    make(tmp_path, 'ancien.csv', 3, size=1000)
+    make(tmp_path, 'deja.csv.gz', 3)
+
+    report = sweep(tmp_path, key='CONFIG', compress_after_days=1)
+
+    assert report['compresses'] == ['ancien.csv']
+    assert sorted(os.listdir(tmp_path)) == ['ancien.csv.gz', 'deja.csv.gz']
+    # Date de modification conservée : l'âge de l'entrée reste celui du fichier d'origine
+    assert os.path.getmtime(tmp_path / 'ancien.csv.gz') == pytest.approx(NOW - 3 * DAY)
+
+
+def test_uploads_and_derived_caches_are_never_compressed(app):
+    folder = app.config['UPLOAD_FOLDER']
+    make(folder, 'abc123.xlsx', 10)
+    make(folder, 'abc123_xlsx.parquet', 10)
+
+    report = RetentionController().sweep_folder('UPLOAD_FOLDER', folder, DEFAULT_POLICIES['UPLOAD_FOLDER'], now=NOW)
+
+    assert report['compresses'] == []
+    assert sorted(os.listdir(folder)) == ['abc123.xlsx', 'abc123_xlsx.parquet']
+
+
+def test_sweep_skipped_while_another_process_holds_the_lock(app):
+    app.config['RETENTION_POLICIES'] = {'UPLOAD_FOLDER': {'keep_last': 0}}
+    make(app.config['UPLOAD_FOLDER'], 'ancien.csv', 40)
+    retention = RetentionController()
+    # Verrou pris par un autre processus (autre ouverture du fichier verrou)
+    handle = retention._lock()
+    try:
+        result = retention.sweep()
+    finally:
+        handle.close()
+
+    assert result['Type'] == 'Error'
+    assert os.listdir(app.config['UPLOAD_FOLDER']) == ['ancien.csv']
+    assert retention.sweep()['Response']['UPLOAD_FOLDER']['supprimes'] == ['ancien.csv']
+    assert LOCK_FILE in os.listdir(app.config['CONFIG'])
+
+
+def test_sweeper_started_by_first_request(app, monkeypatch):
+    monkeypatch.setattr(retention_module, '_sweeper', None)
+    RetentionController().start(app)
+
+    # Processus de surveillance du rechargement automatique : aucune requête, aucun balayage
+    assert retention_module._sweeper is None
+
+    app.test_client().get('/')
+    sweeper = retention_module._sweeper
+    assert sweeper is not None and sweeper.is_alive()
+
+    app.test_client().get('/')
+    assert retention_module._sweeper is sweeper
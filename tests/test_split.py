@@ -0,0 +1,165 @@
+import csv
+import io
+import os
+import zipfile
+
+import pytest
+from flask import Flask
+
+from controllers import FileManagerController as file_manager_module
+from controllers import SpreadsheetController as spreadsheet_module
+from controllers.FileManagerController import FileManagerController, SPLIT_META_SUFFIX
+from controllers.SplitController import SplitController
+
+HEADER = ['partner_id/id', 'Lignes de facture / Libellé', 'Lignes de facture / Quantité']
+
+
+def write_csv(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8-sig') as file:
+        writer = csv.writer(file)
+        writer.writerow(HEADER)
+        writer.writerows(rows)
+    return str(path)
+
+
+def document(partner, lines, label='ligne'):
+    """Pièce de `lines` lignes : la première porte le partenaire, les suivantes non."""
+    return [[partner if number == 0 else '', f"{label} {number}", '1'] for number in range(lines)]
+
+
+def read_parts(archive_path):
+    """Contenu de chaque partie d'une archive, dans l'ordre : (nom, octets, lignes sans entête)."""
+    parts = []
+    with zipfile.ZipFile(archive_path) as archive:
+        for name in sorted(archive.namelist(), key=lambda name: int(name.rsplit('_', 1)[1][:-4])):
+            content = archive.read(name)
+            rows = list(csv.reader(io.StringIO(content.decode('utf-8-sig'))))
+            assert rows[0] == HEADER
+            parts.append((name, content, rows[1:]))
+    return parts
+
+
+def partners(rows):
+    return [row[0] for row in rows if row[0]]
+
+
+def test_documents_are_never_split(tmp_path):
+    rows = document('P1', 3) + document('P2', 2) + document('P3', 4) + document('P4', 2)
+    input_path = write_csv(tmp_path / 'factures.csv', rows)
+    output = tmp_path / 'factures.zip'
+
+    count = SplitController().split(input_path, {'zip': str(output)}, max_rows=5)
+
+    parts = read_parts(output)
+    assert count == len(parts) == 3
+    assert [partners(part_rows) for _, _, part_rows in parts] == [['P1', 'P2'], ['P3'], ['P4']]
+    assert [row for _, _, part_rows in parts for row in part_rows] == rows
+
+
+def test_document_larger_than_limit_forms_its_own_part(tmp_path):
+    rows = document('P1', 2) + document('P2', 7) + document('P3', 2)
+    input_path = write_csv(tmp_path / 'factures.csv', rows)
+    output = tmp_path / 'factures.zip'
+
+    count = SplitController().split(input_path, {'zip': str(output)}, max_rows=4)
+
+    parts = read_parts(output)
+    assert count == 3
+    assert [len(part_rows) for _, _, part_rows in parts] == [2, 7, 2]
+    assert partners(parts[1][2]) == ['P2']
+
+
+def test_byte_limit_counts_quoted_values(tmp_path):
+    # Libellés avec virgules, guillemets et sauts de ligne : écrits entre guillemets, avec échappements
+    label = 'Article "spécial", 2\nlignes'
+    rows = [row for number in range(12) for row in document(f"P{number:02d}", 2, label)]
+    input_path = write_csv(tmp_path / 'factures.csv', rows)
+    output = tmp_path / 'factures.zip'
+    max_bytes = 400
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(document('P00', 2, label))
+    document_bytes = len(buffer.getvalue().encode('utf-8'))
+
+    SplitController().split(input_path, {'zip': str(output)}, max_rows=None, max_bytes=max_bytes)
+
+    parts = read_parts(output)
+    assert len(parts) > 1
+    assert all(len(content) <= max_bytes for _, content, _ in parts)
+    # Chaque partie est remplie au plus près de la limite : la pièce suivante l'aurait dépassée
+    assert all(len(content) + document_bytes > max_bytes for _, content, _ in parts[:-1])
+    assert [row for _, _, part_rows in parts for row in part_rows] == rows
+
+
+def test_single_part_writes_nothing_without_force(tmp_path):
+    input_path = write_csv(tmp_path / 'factures.csv', document('P1', 3) + document('P2', 2))
+    output = tmp_path / 'factures.zip'
+    splitter = SplitController()
+
+    assert splitter.split(input_path, {'zip': str(output)}, max_rows=10) == 1
+    assert not os.path.exists(output)
+    assert os.listdir(tmp_path) == ['factures.csv']
+
+    assert splitter.split(input_path, {'zip': str(output)}, max_rows=10, force=True) == 1
+    assert [partners(part_rows) for _, _, part_rows in read_parts(output)] == [['P1', 'P2']]
+
+
+def test_missing_key_column_is_rejected(tmp_path):
+    input_path = write_csv(tmp_path / 'factures.csv', document('P1', 2))
+
+    with pytest.raises(ValueError):
+        SplitController().split(input_path, {'zip': str(tmp_path / 'factures.zip')}, key_columns=['move_id'])
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config.update(DOWNLOAD_FOLDER=str(tmp_path))
+    with app.test_request_context():
+        yield app
+
+
+@pytest.fixture
+def split_calls(monkeypatch):
+    calls = []
+    split = file_manager_module.splitter.split
+
+    def counted(*args, **kwargs):
+        calls.append(args[0])
+        return split(*args, **kwargs)
+
+    monkeypatch.setattr(file_manager_module.splitter, 'split', counted)
+    return calls
+
+
+def test_split_memoized_until_source_changes(app, tmp_path, split_calls):
+    input_path = write_csv(tmp_path / 'factures.csv', document('P1', 3) + document('P2', 2) + document('P3', 4))
+    file_manager = FileManagerController()
+
+    first = file_manager.subdivide_csv_sheet('factures.csv', fmt='zip', max_rows=5)
+    assert first.status_code == 200
+    first.close()
+    assert os.path.exists(f"{input_path}{SPLIT_META_SUFFIX}")
+
+    # Même CSV, mêmes paramètres : découpage mémorisé réutilisé
+    second = file_manager.subdivide_csv_sheet('factures.csv', fmt='zip', max_rows=5)
+    second.close()
+    assert split_calls == [input_path]
+    # Aucun verrou conservé une fois les demandes terminées
+    assert len(file_manager_module._split_locks) == 0
+
+    # Autres paramètres, puis CSV modifié : nouveau découpage
+    file_manager.subdivide_csv_sheet('factures.csv', fmt='zip', max_rows=4).close()
+    assert len(split_calls) == 2
+    write_csv(tmp_path / 'factures.csv', document('P1', 3) + document('P2', 2))
+    file_manager.subdivide_csv_sheet('factures.csv', fmt='zip', max_rows=4).close()
+    assert len(split_calls) == 3
+    assert [partners(rows) for _, _, rows in read_parts(tmp_path / 'factures.zip')] == [['P1'], ['P2']]
+
+
+def test_conversion_locks_released(tmp_path):
+    path = str(tmp_path / 'absent.xlsx')
+
+    with pytest.raises(Exception):
+        spreadsheet_module.SpreadsheetController().convert(path)
+
+    assert len(spreadsheet_module._locks) == 0
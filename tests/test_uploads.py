@@ -0,0 +1,95 @@
+import io
+import os
+
+import pytest
+from flask import Flask
+from werkzeug.datastructures import FileStorage
+
+from controllers.FileConfigController import FileConfigController
+from controllers.FileManagerController import FileManagerController
+
+CONTENT = (
+    "REF;DT;JRN;CLI;ART;DESC;PU;QTE;REM;ANA\n"
+    "F1;030125;VTE;C1;P1;ligne;10;1;0;AN1\n"
+    "F1;030125;VTE;C1;P2;ligne;10;1;0;AN1\n"
+).encode('utf-8')
+
+COLUMNS = {
+    'Référence': 'REF', 'Date': 'DT', 'Journal': 'JRN', 'Client': 'CLI', 'Produit': 'ART',
+    'Description': 'DESC', 'Prix unitaire': 'PU', 'Quantité': 'QTE', 'Remise': 'REM', 'Analytique': 'ANA',
+}
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config.update(UPLOAD_FOLDER=str(tmp_path / 'uploads'))
+    with app.app_context():
+        yield app
+
+
+def upload(content=CONTENT, filename='Export Clients.csv'):
+    return FileManagerController().upload_file(FileStorage(io.BytesIO(content), filename=filename))
+
+
+def age(*paths):
+    """Vieillit des fichiers d'un jour."""
+    for path in paths:
+        old = os.path.getmtime(path) - 86400
+        os.utime(path, (old, old))
+
+
+def clean(path, capsys, **data):
+    result = FileConfigController().cleaning_data(dict(COLUMNS, uploaded_file=path, extract='Clt', sep=';', **data))
+    assert result['Type'] == 'Succes'
+    return result['Response'], 'déjà disponible' in capsys.readouterr().out
+
+
+def test_same_content_is_stored_once(app):
+    first = upload()
+    second = upload(filename='autre nom.csv')
+
+    assert first['Type'] == second['Type'] == 'Succes'
+    assert first['Response'] == second['Response']
+    assert os.path.basename(first['Response']).endswith('.csv')
+    assert len(os.listdir(app.config['UPLOAD_FOLDER'])) == 1
+    assert upload(CONTENT + b"F2;030125;VTE;C1;P1;ligne;10;1;0;AN1\n")['Response'] != first['Response']
+
+
+def test_dedup_refreshes_upload_and_converted_copy(app):
+    path = upload(filename='Export.xlsx')['Response']
+    base_name = os.path.splitext(path)[0]
+    converted = f"{base_name}_xlsx.parquet"
+    unrelated = f"{base_name}_autre.csv"
+    for name in (converted, unrelated):
+        open(name, 'wb').close()
+    age(path, converted, unrelated)
+    before = os.path.getmtime(unrelated)
+
+    assert upload(filename='Export.xlsx')['Response'] == path
+
+    assert os.path.getmtime(path) > before
+    # Copie convertie marquée après le fichier chargé : elle reste à jour
+    assert os.path.getmtime(converted) >= os.path.getmtime(path)
+    assert os.path.getmtime(unrelated) == before
+
+
+def test_cleaned_file_reused_until_settings_change(app, capsys):
+    path = upload()['Response']
+
+    cleaned, hit = clean(path, capsys)
+    assert not hit and os.path.exists(cleaned)
+    assert os.path.basename(cleaned).startswith(os.path.splitext(os.path.basename(path))[0] + '_')
+
+    age(path, cleaned)
+    assert clean(path, capsys) == (cleaned, True)
+    assert os.path.getmtime(cleaned) >= os.path.getmtime(path)
+
+    # Nouveau chargement du même contenu : le fichier nettoyé reste valable
+    upload()
+    assert clean(path, capsys) == (cleaned, True)
+
+    # Autres correspondances de colonnes : autre fichier nettoyé
+    other, hit = clean(path, capsys, Description='REF')
+    assert not hit and other != cleaned
+    assert clean(path, capsys) == (cleaned, True)
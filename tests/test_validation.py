@@ -0,0 +1,126 @@
+import contextlib
+import io
+import os
+
+import pandas as pd
+import pytest
+from flask import Flask
+
+from controllers.FileConfigController import FileConfigController
+from controllers.LookupIndexController import LookupIndexController
+from controllers.ReferenceCacheController import ReferenceCacheController
+from controllers.ValidationController import ValidationController, RULES
+
+file_config = FileConfigController()
+fields = file_config.get_fiedls_odoo('Clt')
+
+# Colonnes du fichier chargé -> champs du mouvement (nettoyage)
+RENAME = {'CLI': 'Client', 'ART': 'Produit', 'ANA': 'Analytique', 'DT': 'Date', 'REF': 'Référence'}
+
+# Lignes du fichier nettoyé (ligne 2 du fichier = première ligne de données)
+ROWS = [
+    # Référence, Date, Client, Produit, Analytique
+    ('F1', '030125', 'C1', 'P1', 'AN1'),     # ligne 2 : valide
+    ('F1', '030125', ' c1 ', 'p2', ''),      # ligne 3 : valide (normalisation, analytique facultatif)
+    ('F2', '310225', 'C9', 'P1', 'AN1'),     # ligne 4 : partenaire inconnu, date invalide
+    ('F3', '010325', '', 'P9', 'AN7'),       # ligne 5 : partenaire vide, produit et analytique inconnus
+    ('F4', '', 'C2', '', None),              # ligne 6 : produit vide (date vide non contrôlée)
+]
+
+
+@pytest.fixture(params=[0, 2], ids=['fichier', 'blocs'])
+def app(request, tmp_path):
+    app = Flask(__name__)
+    app.config.update(DOWNLOAD_FOLDER=str(tmp_path / 'download'), IMPORT_CHUNK_SIZE=request.param)
+    os.makedirs(app.config['DOWNLOAD_FOLDER'])
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def references(tmp_path):
+    snapshots = {
+        'res_partner': pd.DataFrame({'id': ['__export__.res_partner_1', '__export__.res_partner_2'], 'ref': ['C1', 'C2']}),
+        'product_template': pd.DataFrame({'display_name': ['[P1] Article 1', '[P2] Article 2'], 'old_default_code': ['P1', 'P2']}),
+        'account_analytic_account': pd.DataFrame({'id.id': ["(1, 'AN1')"], 'code': ['AN1']}),
+    }
+    paths = {}
+    for entity, df in snapshots.items():
+        path = str(tmp_path / f"{entity}.csv")
+        df.to_csv(path, index=False, sep=';', encoding='utf-8-sig')
+        LookupIndexController().build(path, ReferenceCacheController.ENTITIES[entity]['lookups'], df)
+        paths[entity] = path
+    return paths
+
+
+def cleaned_file(tmp_path, rows=ROWS, drop=()):
+    df = pd.DataFrame(rows, columns=['Référence', 'Date', 'Client', 'Produit', 'Analytique'])
+    path = str(tmp_path / 'Clients_nettoye.csv')
+    df.drop(columns=list(drop)).to_csv(path, index=False, encoding='utf-8-sig')
+    return path
+
+
+def validate(path, references, rename=RENAME):
+    file_configs = file_config.build_file_configs(path, 'Clt', references)
+    datasets = file_config.declare_datasets(file_configs, fields['Column'])
+    with contextlib.redirect_stdout(io.StringIO()):
+        return ValidationController().validate(file_configs, 'Client', datasets, ['Date'], rename=rename)
+
+
+def test_valid_file(app, references, tmp_path):
+    assert validate(cleaned_file(tmp_path, ROWS[:2]), references) == {'Type': 'Succes', 'Response': 200}
+
+
+def test_each_rule_reports_its_rows_and_columns(app, references, tmp_path):
+    result = validate(cleaned_file(tmp_path), references)
+
+    assert result['Type'] == 'Error'
+    assert result['Response']['erreurs'] == {
+        'valeur_vide': 2,
+        'partenaire_inconnu': 1,
+        'produit_inconnu': 1,
+        'analytique_inconnu': 1,
+        'date_invalide': 1,
+    }
+    assert result['Message'].startswith("6 erreur(s) sur 3 ligne(s) du fichier (5 lignes)")
+    # Triées par ligne puis par colonne, avec les noms de colonnes du fichier chargé
+    assert [(error['ligne'], error['colonne'], error['regle'], error['valeur']) for error in result['Response']['apercu']] == [
+        (4, 'CLI', 'partenaire_inconnu', 'C9'),
+        (4, 'DT', 'date_invalide', '310225'),
+        (5, 'ANA', 'analytique_inconnu', 'AN7'),
+        (5, 'ART', 'produit_inconnu', 'P9'),
+        (5, 'CLI', 'valeur_vide', None),
+        (6, 'ART', 'valeur_vide', None),
+    ]
+
+
+def test_report_contents(app, references, tmp_path):
+    result = validate(cleaned_file(tmp_path), references)
+
+    report = os.path.join(app.config['DOWNLOAD_FOLDER'], result['Response']['rapport'])
+    assert os.path.basename(os.path.dirname(report)).startswith('Validation_du_')
+    with open(report, 'rb') as file:
+        assert file.read(3) == b'\xef\xbb\xbf'
+    df = pd.read_csv(report, dtype=str, keep_default_na=False, encoding='utf-8-sig')
+    assert df.columns.tolist() == ['ligne', 'colonne', 'regle', 'libelle', 'valeur']
+    assert df['ligne'].tolist() == ['4', '4', '5', '5', '5', '6']
+    assert df['colonne'].tolist() == ['CLI', 'DT', 'ANA', 'ART', 'CLI', 'ART']
+    assert (df['libelle'] == df['regle'].map(RULES)).all()
+    assert df['valeur'].tolist() == ['C9', '310225', 'AN7', 'P9', '', '']
+
+
+def test_missing_columns_reported_once_on_header_line(app, references, tmp_path):
+    result = validate(cleaned_file(tmp_path, ROWS[:2], drop=['Date', 'Analytique']), references, rename=None)
+
+    assert result['Response']['erreurs'] == {'colonne_absente': 2}
+    assert [(error['ligne'], error['colonne']) for error in result['Response']['apercu']] == [(1, 'Analytique'), (1, 'Date')]
+
+
+def test_reference_snapshot_without_key_column(app, references, tmp_path):
+    pd.DataFrame({'id': ['1'], 'name': ['C1']}).to_csv(references['res_partner'], index=False, sep=';', encoding='utf-8-sig')
+
+    result = validate(cleaned_file(tmp_path, ROWS[:2]), references)
+
+    assert result['Type'] == 'Error'
+    assert result['Message'].startswith("Colonne absente des données de référence")
+    assert result['Response']['file'] == references['res_partner']
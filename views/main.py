@@ -1,13 +1,24 @@
 from flask import (
     Flask, Blueprint, request, render_template, redirect, 
-    url_for, jsonify, abort
+    url_for, jsonify, abort, current_app
 )
 from controllers.FileManagerController import FileManagerController
 from controllers.FileConfigController import FileConfigController
+from controllers.ReferenceCacheController import ReferenceCacheController
+from controllers.JobController import JobController
+from controllers.ExportSchedulerController import ExportSchedulerController
+from controllers.BatchImportController import BatchImportController
+from controllers.RetentionController import RetentionController
+from controllers.SplitController import SPLIT_FORMATS
 
 main_blueprint = Blueprint('main', __name__)
 file_manager = FileManagerController()
 file_config = FileConfigController()
+reference_cache = ReferenceCacheController()
+job_controller = JobController()
+export_scheduler = ExportSchedulerController()
+batch_import = BatchImportController()
+retention = RetentionController()
 
 # Fonction pour gérer les erreurs
 def template_error(message, error):
@@ -34,20 +45,83 @@ def form():
             erreur="Aucun fichier trouvé."
         )
     
-    file_path_result = file_config.cleaning_data(request_dict)
-    if file_path_result['Type'] == 'Error':
-        return render_template(
-            'form.html', 
-            page="Nouvel import", 
-            erreur=template_error(file_path_result['Message'], file_path_result['Response'])
-        )
-    
-    resultat = file_config.transition(file_path_result['Response'], request_dict.get('extract'))
+    # L'import est exécuté en arrière-plan ; la page suit sa progression
+    job = job_controller.submit('import', file_config.run_import, request_dict, files=[file_path])
+    return render_template(
+        'form.html', 
+        page="Nouvel import", 
+        job_id=job['Response']
+    )
+
+@main_blueprint.route('/jobs', methods=['POST'])
+def submit_job():
+    request_dict = {key: value for key, value in request.form.items()}
+    if not request_dict.get('uploaded_file'):
+        return jsonify({"error": "Aucun fichier trouvé."}), 400
+
+    job = job_controller.submit('import', file_config.run_import, request_dict, files=[request_dict['uploaded_file']])
+    return jsonify({
+        "job_id": job['Response'],
+        "status_url": url_for('main.job_status', job_id=job['Response']),
+        "result_url": url_for('main.job_result', job_id=job['Response'])
+    }), 202
+
+@main_blueprint.route('/processing/batch', methods=['POST'])
+def submit_batch():
+    files = [file for file in request.files.getlist('files') if file and file.filename]
+    if not files:
+        return jsonify({"error": "Aucun fichier trouvé."}), 400
+
+    uploaded_files = []
+    for file in files:
+        uploaded_file = file_manager.upload_file(file)
+        if uploaded_file['Type'] == 'Error':
+            return jsonify({"error": uploaded_file['Message'], "fichier": file.filename}), 400
+        uploaded_files.append(uploaded_file['Response'])
+
+    # Mêmes champs que /processing (mouvement, séparateur, correspondances) et mode 'combine' ou 'separe'
+    request_dict = {key: value for key, value in request.form.items()}
+    job = job_controller.submit('import_lot', batch_import.run, request_dict, uploaded_files, [file.filename for file in files], files=uploaded_files)
+    return jsonify({
+        "job_id": job['Response'],
+        "files": len(uploaded_files),
+        "status_url": url_for('main.job_status', job_id=job['Response']),
+        "result_url": url_for('main.job_result', job_id=job['Response'])
+    }), 202
+
+@main_blueprint.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = job_controller.get(job_id)
+    if job['Type'] == 'Error':
+        return jsonify({"error": job['Message']}), 404
+
+    state = job['Response']
+    return jsonify({key: state[key] for key in ('id', 'status', 'stage', 'stages', 'created_at', 'updated_at')})
+
+@main_blueprint.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    job = job_controller.get(job_id)
+    if job['Type'] == 'Error':
+        abort(404, description="Tâche introuvable.")
+
+    state = job['Response']
+    if state['status'] in ('en attente', 'en cours'):
+        return jsonify({"status": state['status'], "stage": state['stage']}), 202
+
+    resultat = state['result']
+    # Rapport des erreurs de validation : lien de téléchargement
+    rapport = None
+    if resultat['Type'] == 'Error' and isinstance(resultat['Response'], dict) and resultat['Response'].get('rapport'):
+        rapport = url_for('main.download_file', filename=resultat['Response']['rapport'])
+        resultat = dict(resultat, Response=dict(resultat['Response'], lien=rapport))
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify(resultat)
     if resultat['Type'] == 'Error':
         return render_template(
             'form.html', 
             page="Nouvel import", 
-            erreur=template_error(resultat['Message'], resultat['Response'])
+            erreur=resultat['Message'] if rapport else template_error(resultat['Message'], resultat['Response']),
+            rapport=rapport
         )
     
     return browse_directory(message=f"Fichier d’importation : \n {resultat['Response']}")
@@ -95,17 +169,24 @@ def check_form():
 @main_blueprint.route('/browse')
 @main_blueprint.route('/browse/<path:path>')
 def browse_directory(path="", message=None):
-    result = file_manager.list_files(path)
-    directories = result.get("directories", [])
-    files = result.get("files", [])
-    current_path = result.get("current_path", "")
+    result = file_manager.list_files(
+        path,
+        page=request.args.get('page', 1, type=int),
+        per_page=request.args.get('per_page', 20, type=int),
+        sort=request.args.get('sort', 'last_modified'),
+        order=request.args.get('order', 'desc'),
+        search=request.args.get('q', '').strip()
+    )
+    if isinstance(result, tuple):
+        abort(result[1], description=result[0].get("error"))
 
     return render_template(
         'browse.html',
         page="Fichiers d'import",
-        directories=directories,
-        files=files,
-        current_path=current_path,
+        directories=result["directories"],
+        files=result["files"],
+        current_path=result["current_path"],
+        listing=result,
         enumerate=enumerate,
         message=message
     )
@@ -120,7 +201,17 @@ def download_file(filename):
 def download_file_import(filename):
     if file_manager.file_exists(filename)['Type'] == 'Error':
         abort(404, description="Fichier introuvable.")
-    return file_manager.subdivide_csv_sheet(filename)
+    # Paramètres du découpage : ?format=xlsx|zip|dir&max_rows=5000&max_bytes=0&key=partner_id/id
+    config = current_app.config
+    fmt = request.args.get('format', config.get('SPLIT_FORMAT', 'xlsx'))
+    if fmt not in SPLIT_FORMATS:
+        abort(400, description=f"Format de découpage inconnu : {fmt}")
+    max_rows = request.args.get('max_rows', config.get('SPLIT_MAX_ROWS', 5000), type=int)
+    max_bytes = request.args.get('max_bytes', config.get('SPLIT_MAX_BYTES', 0), type=int)
+    key_columns = request.args.get('key', type=lambda value: value.split(',')) or config.get('SPLIT_KEY_COLUMNS')
+    if not max_rows and not max_bytes:
+        abort(400, description="Une limite de lignes ou de taille est requise.")
+    return file_manager.subdivide_csv_sheet(filename, fmt, max_rows or None, max_bytes or None, key_columns)
 
 @main_blueprint.route('/delete/<path:filename>', methods=['POST'])
 def delete_file(filename):
@@ -151,6 +242,35 @@ def get_fields_odoo_route():
 
     return jsonify(file_config.get_fiedls_odoo(move))
 
+@main_blueprint.route('/reference_cache/invalidate', methods=['POST'])
+def invalidate_reference_cache():
+    data = request.get_json(silent=True) or request.form
+    entity = data.get('entity') or None
+    full = str(data.get('full', 'true')).lower() not in ('0', 'false', 'non')
+
+    resultat = reference_cache.invalidate(entity, full=full)
+    if resultat['Type'] == 'Error':
+        return jsonify({"error": resultat['Message'], "entities": resultat['Response']}), 400
+    return jsonify({"invalidated": resultat['Response'], "full": full})
+
+@main_blueprint.route('/export_stats')
+def export_stats():
+    return jsonify(export_scheduler.read_stats())
+
+@main_blueprint.route('/storage_stats')
+def storage_stats():
+    return jsonify(retention.stats()['Response'])
+
+@main_blueprint.route('/retention/sweep', methods=['POST'])
+def retention_sweep():
+    data = request.get_json(silent=True) or request.form
+    dry_run = str(data.get('dry_run', 'false')).lower() in ('1', 'true', 'oui')
+
+    resultat = retention.sweep(dry_run=dry_run)
+    if resultat['Type'] == 'Error':
+        return jsonify({"error": resultat['Message']}), 409
+    return jsonify({"dry_run": dry_run, "rapport": resultat['Response']})
+
 @main_blueprint.route('/admin@admin', methods=['POST', 'GET'])
 def admin_action():
     if request.method == 'GET':